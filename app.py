@@ -2,19 +2,29 @@ import os
 import datetime
 
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 
 import config.settings as settings
+from lib.catalog import catalog
+from lib.database import RoutingSQLAlchemy, REPLICA
+from lib.query_stats import query_stats
+from lib.timing import timings
+from lib.profiler import profiler
+from lib.memory import memory
+from lib.slow_queries import slow_queries
+from lib.compression import compression
 
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_DATABASE_URI'] = settings.DATABASE_URI
+if settings.DATABASE_REPLICA_URI:
+    app.config['SQLALCHEMY_BINDS'] = {REPLICA: settings.DATABASE_REPLICA_URI}
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = datetime.timedelta(weeks=2)
+app.config['BCRYPT_LOG_ROUNDS'] = settings.BCRYPT_LOG_ROUNDS
 app.secret_key = 'settings.SECRET_KEY'
 
 migrate = Migrate(compare_type=True)
@@ -29,8 +39,26 @@ app_ids = {
 def my_expired_token_callback(expired_token):
     pass
 
-db = SQLAlchemy(app)
+db = RoutingSQLAlchemy(app, pool_options={
+    'pool_size': settings.DATABASE_POOL_SIZE,
+    'max_overflow': settings.DATABASE_MAX_OVERFLOW,
+    'pool_timeout': settings.DATABASE_POOL_TIMEOUT,
+    'pool_recycle': settings.DATABASE_POOL_RECYCLE,
+    'pool_pre_ping': settings.DATABASE_POOL_PRE_PING,
+})
 CORS(app, resources={r'/*': {'origins': '*'}})
+catalog.init_app(app, watch_interval=settings.CATALOG_WATCH_INTERVAL)
+timings.init_app(app)
+profiler.init_app(app)
+memory.init_app(app)
+if settings.QUERY_STATS:
+    query_stats.init_app(app, headers=settings.DEBUG,
+                         n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+                         log_queries=settings.QUERY_STATS_LOG_QUERIES)
+slow_queries.init_app(app, threshold_ms=settings.SLOW_QUERY_MS, explain_rate=settings.SLOW_QUERY_EXPLAIN_RATE,
+                      params=settings.SLOW_QUERY_PARAMS, path=settings.SLOW_QUERY_LOG,
+                      max_bytes=settings.SLOW_QUERY_LOG_BYTES, backups=settings.SLOW_QUERY_LOG_BACKUPS)
+compression.init_app(app, enabled=settings.COMPRESSION)
 
 
 
@@ -38,5 +66,6 @@ import views.admin
 import views.main
 import views.product
 import views.investor
+import commands
 
 migrate.init_app(app, db)
@@ -0,0 +1,328 @@
+"""
+times the main endpoints with the flask test client against generated
+(lib/synthetic) sqlite datasets of increasing size
+
+    python -m benchmarks.endpoints run --datasets small,medium --out after.json
+    python -m benchmarks.endpoints compare before.json after.json --threshold 0.2
+
+run writes the timings as json, compare exits 1 when an endpoint in both
+files got slower than the threshold (a fraction of the before median, and by
+at least --min-ms, so sub millisecond noise doesn't count). run --compare
+does both in one go. with --memory each endpoint gets one more (untimed)
+request under tracemalloc, for its peak python memory (peak_kb) and top
+allocation sites, compared the same way (--memory-threshold & --min-kb)
+
+the datasets are built once per seed, catalog version & schema into
+benchmarks/data/ (--fresh rebuilds them), the tester@futurefitbusiness.org
+company has a fixed number of products (the per benchmark endpoints are timed as the tester, so
+this sets the impacts per benchmark) and the rest a few each. run it in DEBUG
+(ie without APP_MODE), otherwise the setup endpoints sleep
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import platform
+import statistics
+import subprocess
+
+import click
+
+from app import app, db, settings
+from models import User, Product, Impact
+from lib.catalog import catalog
+from lib.memory import memory
+from lib.synthetic import generate_data, TESTER_EMAIL
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# tester_products is about 7 impacts each, so ~10, ~100 & ~1000 impacts per benchmark
+datasets = {
+    'small': {'companies': 10, 'tester_products': 2},
+    'medium': {'companies': 100, 'tester_products': 15},
+    'large': {'companies': 1000, 'tester_products': 150},
+}
+
+# name => method, url, {product_id} is the testers product with the most impacts
+endpoints = [
+    ('product', 'GET', '/product'),
+    ('product_impacts', 'GET', '/product/{product_id}/impacts'),
+    ('product_setup', 'GET', '/product/{product_id}/setup/2/'),
+    ('product_setup_preview', 'POST', '/product/{product_id}/setup/2/preview'),
+    ('product_setup_save', 'POST', '/product/{product_id}/setup/2/'),
+    ('be', 'GET', '/be'),
+    ('report_pp', 'GET', '/report/pp'),
+    ('report_be', 'GET', '/report/be'),
+    ('report_csv', 'GET', '/report/download/csv'),
+    ('investor_reports', 'GET', '/investor/reports'),
+    ('admin_company', 'GET', '/admin/company'),
+]
+
+PASSWORD = '123456'
+
+
+def schema_version():
+    """
+    changes with the models tables & columns, so a dataset from before a new column gets rebuilt
+    """
+    columns = sorted('{}.{}'.format(table.name, column.name)
+                     for table in db.Model.metadata.tables.values() for column in table.columns)
+    return hashlib.sha1(','.join(columns).encode('utf-8')).hexdigest()[:8]
+
+
+def dataset_path(name, seed):
+    return os.path.join(data_dir, '{}-{}-{}-{}.db'.format(name, seed, catalog.current().version, schema_version()))
+
+
+def use_database(path):
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///{}'.format(path)
+
+
+def build_dataset(name, seed, fresh=False):
+    path = dataset_path(name, seed)
+    if os.path.exists(path) and not fresh:
+        return path
+
+    os.makedirs(data_dir, exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+
+    spec = datasets[name]
+    click.echo('building {} dataset, {} companies'.format(name, spec['companies']), err=True)
+    use_database(path)
+    with app.app_context():
+        db.create_all()
+        generate_data(companies=1, products=spec['tester_products'], min_products=spec['tester_products'],
+                      seed=seed, password=PASSWORD)
+        generate_data(companies=spec['companies'] - 1, products=5, seed=seed + 1, tester=False, password=PASSWORD)
+        db.session.remove()
+
+    return path
+
+
+def time_request(client, method, url, repeat, trace_memory=False, **kwargs):
+    """
+    one untimed warm up request, then repeat timed ones (including reading
+    the body, the csv streams), then with trace_memory a traced one (tracing
+    slows everything down, so it's never timed)
+    """
+    response = client.open(url, method=method, **kwargs)
+    response.get_data()
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        size = len(response.get_data())
+        runs.append((time.perf_counter() - start) * 1000)
+
+    result = {
+        'status': response.status_code,
+        'bytes': size,
+        # from lib/query_stats, DEBUG only
+        'queries': int(response.headers.get('X-Query-Count', -1)),
+        'min_ms': round(min(runs), 3),
+        'median_ms': round(statistics.median(runs), 3),
+        'mean_ms': round(statistics.mean(runs), 3),
+        'runs_ms': [round(x, 3) for x in runs],
+    }
+
+    if trace_memory:
+        with memory.trace() as trace:
+            client.open(url, method=method, **kwargs).get_data()
+        result.update(trace.as_dict())
+
+    return result
+
+
+def tester_product():
+    """
+    => the testers product with the most impacts, its impacts & the testers benchmarks impacts
+    """
+    with app.app_context():
+        tester = User.query.filter_by(email=TESTER_EMAIL).one()
+        product_id, impact_count = db.session.query(Product.id, db.func.count(Impact.id)).\
+            join(Impact, Impact.product_id == Product.id).\
+            filter(Product.benchmark_id == tester.benchmark_id).\
+            group_by(Product.id).\
+            order_by(db.func.count(Impact.id).desc()).first()
+        benchmark_impacts = Impact.query.join(Product).filter(Product.benchmark_id == tester.benchmark_id).count()
+        db.session.remove()
+
+    return product_id, impact_count, benchmark_impacts
+
+
+def login(client):
+    """
+    => the testers auth headers
+    """
+    response = client.post('/login', json={'email': TESTER_EMAIL, 'password': PASSWORD, 'app': 'admin'})
+    return {'Authorization': 'Bearer {}'.format(response.get_json()['access_token'])}
+
+
+def run_dataset(name, seed, repeat, only=None, fresh=False, trace_memory=False):
+    use_database(build_dataset(name, seed, fresh=fresh))
+    client = app.test_client()
+
+    product_id, impact_count, benchmark_impacts = tester_product()
+    headers = login(client)
+
+    setup = client.get('/product/{}/setup/2/'.format(product_id), headers=headers).get_json()
+    # the products own answers, so saving changes nothing
+    checked_values = setup['data']['checked_values']
+
+    results = {}
+    for endpoint, method, url in endpoints:
+        if only and endpoint not in only:
+            continue
+
+        kwargs = {'headers': headers}
+        if method == 'POST':
+            kwargs['json'] = {'data': checked_values}
+
+        result = time_request(client, method, url.format(product_id=product_id), repeat,
+                              trace_memory=trace_memory, **kwargs)
+        result.update({
+            'dataset': name,
+            'endpoint': endpoint,
+            'companies': datasets[name]['companies'],
+            'benchmark_impacts': benchmark_impacts,
+            'product_impacts': impact_count,
+        })
+        results['{} {}'.format(name, endpoint)] = result
+
+        click.echo('{:8} {:24} {:>6} {:>10.1f}ms {:>10} bytes {:>6} queries{}'.format(
+            name, endpoint, result['status'], result['median_ms'], result['bytes'], result['queries'],
+            ' {:>10.1f}kb peak'.format(result['peak_kb']) if trace_memory else ''), err=True)
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(before, after, threshold, min_ms, field='median_ms'):
+    """
+    => [(key, before, after, change, regressed)] for the endpoints with field
+    in both, min_ms is in the fields units (peak_kb is kilobytes)
+    """
+    rows = []
+    for key, result in after['results'].items():
+        if field not in result or field not in before['results'].get(key, {}):
+            continue
+
+        old = before['results'][key][field]
+        new = result[field]
+        change = (new - old) / old if old else 0
+        regressed = change > threshold and new - old > min_ms
+        rows.append((key, old, new, change, regressed))
+
+    return rows
+
+
+def print_comparison(rows, unit='ms'):
+    for key, old, new, change, regressed in rows:
+        click.echo('{:40} {:>10.1f}{unit} {:>10.1f}{unit} {:>+8.0%}{}'.format(
+            key, old, new, change, '  REGRESSED' if regressed else '', unit=unit))
+
+    regressions = [x for x in rows if x[4]]
+    click.echo('{} compared, {} regressed'.format(len(rows), len(regressions)))
+    return regressions
+
+
+def compare_all(before, after, threshold, min_ms, memory_threshold, min_kb):
+    """
+    prints the timing & (when both have it) memory comparisons => regressed
+    """
+    regressions = print_comparison(compare_results(before, after, threshold, min_ms))
+    rows = compare_results(before, after, memory_threshold, min_kb, field='peak_kb')
+    if rows:
+        regressions += print_comparison(rows, unit='kb')
+    return regressions
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--datasets', 'names', default='small,medium', help='Comma separated, from {}.'.format(', '.join(datasets)))
+@click.option('--endpoints', 'only', default=None, help='Comma separated endpoint names, default all.')
+@click.option('--repeat', default=5, help='Timed requests per endpoint.')
+@click.option('--seed', default=1)
+@click.option('--fresh', is_flag=True, help='Rebuild the datasets.')
+@click.option('--out', type=click.Path(), default=None, help='Write the results json here.')
+@click.option('--compare', 'compare_with', type=click.Path(exists=True), default=None,
+              help='Compare with an earlier results json, exit 1 on a regression.')
+@click.option('--threshold', default=0.2, help='Slow down (fraction of the earlier median) that counts as a regression.')
+@click.option('--min-ms', default=5.0, help='Slow downs smaller than this never count.')
+@click.option('--memory', 'trace_memory', is_flag=True, help='Trace one more request per endpoint for its peak memory.')
+@click.option('--memory-threshold', default=0.2, help='Peak memory growth (fraction of the earlier peak) that counts as a regression.')
+@click.option('--min-kb', default=256.0, help='Peak memory growth smaller than this never counts.')
+def run(names, only, repeat, seed, fresh, out, compare_with, threshold, min_ms, trace_memory, memory_threshold, min_kb):
+    """
+    time the endpoints
+    """
+    if not settings.DEBUG:
+        raise click.UsageError('run it without APP_MODE, the setup endpoints sleep outside DEBUG')
+
+    # logins & the generated users, the hashing isn't what's being timed
+    app.config['BCRYPT_LOG_ROUNDS'] = 4
+    app.config['SQLALCHEMY_ECHO'] = False
+
+    results = {}
+    for name in names.split(','):
+        if name not in datasets:
+            raise click.BadParameter('unknown dataset {}'.format(name), param_hint='--datasets')
+        results.update(run_dataset(name, seed, repeat, only=only.split(',') if only else None, fresh=fresh,
+                                   trace_memory=trace_memory))
+
+    output = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'catalog_version': catalog.current().version,
+            'repeat': repeat,
+            'seed': seed,
+            'memory': trace_memory,
+        },
+        'results': results,
+    }
+
+    if out:
+        with open(out, 'w') as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+
+    if compare_with:
+        with open(compare_with) as f:
+            before = json.load(f)
+        if compare_all(before, output, threshold, min_ms, memory_threshold, min_kb):
+            sys.exit(1)
+
+
+@cli.command()
+@click.argument('before', type=click.File('r'))
+@click.argument('after', type=click.File('r'))
+@click.option('--threshold', default=0.2, help='Slow down (fraction of the before median) that counts as a regression.')
+@click.option('--min-ms', default=5.0, help='Slow downs smaller than this never count.')
+@click.option('--memory-threshold', default=0.2, help='Peak memory growth (fraction of the before peak) that counts as a regression.')
+@click.option('--min-kb', default=256.0, help='Peak memory growth smaller than this never counts.')
+def compare(before, after, threshold, min_ms, memory_threshold, min_kb):
+    """
+    compare two results files, exit 1 on a regression
+    """
+    if compare_all(json.load(before), json.load(after), threshold, min_ms, memory_threshold, min_kb):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,124 @@
+"""
+times the json serialisation of the real payloads, flask's json against
+orjson (lib/json_provider)
+
+    python -m benchmarks.serialization --dataset medium
+
+the catalog payloads come straight from the loaded catalog, the report,
+investor & impacts ones are fetched from a benchmarks/endpoints dataset (so
+built the same way) and parsed back, which gives the same structures the
+views serialise
+"""
+
+import json
+import time
+
+import click
+
+from flask import json as flask_json
+
+from app import app, settings
+from lib.catalog import catalog
+import lib.json_provider as json_provider
+from benchmarks.endpoints import datasets, build_dataset, use_database, tester_product, login
+
+# name => url, {product_id} is the testers product with the most impacts
+endpoint_payloads = [
+    ('product_impacts', '/product/{product_id}/impacts'),
+    ('be', '/be'),
+    ('report_pp', '/report/pp'),
+    ('investor_reports', '/investor/reports'),
+    ('admin_company', '/admin/company'),
+]
+
+
+def catalog_payloads():
+    payloads = catalog.current().payloads
+    return [('survey ' + name, payloads.source(name)) for name in payloads.names()]
+
+
+def fetched_payloads(client, headers, product_id):
+    payloads = []
+    for name, url in endpoint_payloads:
+        response = client.get(url.format(product_id=product_id), headers=headers)
+        payloads.append((name, json.loads(response.get_data())))
+    return payloads
+
+
+def best_seconds(fn, repeat):
+    """
+    the quickest of repeat rounds, each long enough (~20ms) to time a small payload
+    """
+    start = time.perf_counter()
+    fn()
+    once = max(time.perf_counter() - start, 1e-6)
+    number = max(1, int(0.02 / once))
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        seconds = (time.perf_counter() - start) / number
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def time_payload(data, repeat):
+    with app.app_context():
+        flask_bytes = flask_json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        result = {
+            'bytes': len(flask_bytes),
+            'json_ms': best_seconds(lambda: flask_json.dumps(data, sort_keys=True, separators=(',', ':')), repeat) * 1000,
+        }
+
+        if json_provider.orjson is not None:
+            provider = json_provider.provider
+            json_provider.provider = 'orjson'
+            try:
+                # the same json, bar the escaping of non ascii
+                assert json.loads(json_provider.dumps(data)) == json.loads(flask_bytes)
+                result['orjson_ms'] = best_seconds(lambda: json_provider.dumps(data), repeat) * 1000
+            finally:
+                json_provider.provider = provider
+
+    return result
+
+
+@click.command()
+@click.option('--dataset', default='small', help='One of {}.'.format(', '.join(datasets)))
+@click.option('--seed', default=1)
+@click.option('--repeat', default=5)
+def run(dataset, seed, repeat):
+    """
+    time serialising the catalog, report & listing payloads
+    """
+    if not settings.DEBUG:
+        raise click.UsageError('run it without APP_MODE, like benchmarks.endpoints')
+    if json_provider.orjson is None:
+        click.echo('orjson is not installed, timing json only', err=True)
+
+    app.config['BCRYPT_LOG_ROUNDS'] = 4
+    app.config['SQLALCHEMY_ECHO'] = False
+    use_database(build_dataset(dataset, seed))
+    client = app.test_client()
+    product_id, _, _ = tester_product()
+
+    payloads = catalog_payloads() + fetched_payloads(client, login(client), product_id)
+
+    totals = {'json_ms': 0, 'orjson_ms': 0}
+    for name, data in payloads:
+        result = time_payload(data, repeat)
+        for key in totals:
+            totals[key] += result.get(key, 0)
+        click.echo('{:28} {:>10} bytes {:>9.3f}ms json {:>9}'.format(
+            name[:28], result['bytes'], result['json_ms'],
+            '{:.3f}ms orjson {:.1f}x'.format(result['orjson_ms'], result['json_ms'] / result['orjson_ms'])
+            if 'orjson_ms' in result else ''))
+
+    click.echo('{:28} {:>16} {:>9.3f}ms json {:>9.3f}ms orjson'.format(
+        'total', '', totals['json_ms'], totals['orjson_ms']))
+
+
+if __name__ == '__main__':
+    run()
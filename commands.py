@@ -0,0 +1,66 @@
+import click
+from flask_migrate import stamp
+
+from app import app, db
+from lib.email import get_transport, run_mail_worker
+from lib.onboarding import read_onboarding_csv, onboard_users
+from lib.synthetic import generate_data
+
+
+@app.cli.command('send-emails')
+@click.option('--once', is_flag=True, help='Send one batch and exit.')
+@click.option('--transport', default=None, help='sendgrid or local, defaults to MAIL_TRANSPORT.')
+def send_emails(once, transport):
+    """
+    the mail worker, sends the queued outbound emails
+    """
+    sent = run_mail_worker(get_transport(transport), once=once)
+    if once:
+        click.echo('sent {}'.format(sent))
+
+
+@app.cli.command('onboard-users')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--no-welcome', is_flag=True, help="Don't queue the welcome emails.")
+@click.option('--dry-run', is_flag=True, help='Only check the csv.')
+def onboard_users_command(csv_file, no_welcome, dry_run):
+    """
+    bulk create users & their companies from a csv, see lib/onboarding
+    """
+    result = onboard_users(read_onboarding_csv(csv_file.read()), send_welcome=not no_welcome, dry_run=dry_run)
+
+    for error in result['errors']:
+        click.echo('line {}: {}'.format(error['line'], error['message']), err=True)
+    for email in result['skipped']:
+        click.echo('skipped {}, already a user'.format(email))
+
+    click.echo('{} users, {} new companies, {} existing companies{}'.format(
+        result['users'], result['companies'], result['existing_companies'], ' (dry run)' if dry_run else ''))
+
+
+@app.cli.command('create-db')
+def create_db():
+    """
+    create the tables from the models & stamp them as the latest migration,
+    for a new local (ie sqlite) database, flask db upgrade from the start
+    needs mysql
+    """
+    db.create_all()
+    stamp()
+    click.echo('created {}'.format(db.engine.url))
+
+
+@app.cli.command('generate-data')
+@click.option('--companies', default=10, help='How many companies to add.')
+@click.option('--products', default=5, help='Most products per company.')
+@click.option('--fill', default=0.7, help='Chance of each impact / break even being answered.')
+@click.option('--seed', default=1, help='The same seed gives the same data.')
+@click.option('--no-tester', is_flag=True, help="Don't add the tests tester@futurefitbusiness.org user.")
+@click.option('--password', default='123456', help='Password for the added users.')
+def generate_data_command(companies, products, fill, seed, no_tester, password):
+    """
+    add synthetic companies for local runs & benchmarks, see lib/synthetic
+    """
+    counts = generate_data(companies=companies, products=products, fill=fill, seed=seed,
+                           tester=not no_tester, password=password)
+    click.echo(', '.join('{} {}'.format(v, k.replace('_', ' ')) for k, v in counts.items()))
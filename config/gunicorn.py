@@ -0,0 +1,62 @@
+"""
+the production server
+
+    gunicorn -c config/gunicorn.py app:app
+
+the app is loaded once in the master (preload_app) and the catalog parsed &
+its payloads built there (lib/warmup), then gc.freeze() moves all of that
+out of the collectors reach, so the workers share those pages copy on write
+rather than each parsing the csvs and the gc touching (so copying) them.
+each worker drops the masters db connections, fills its pool and runs one
+request before it accepts any, so its first real request isn't the slow one
+
+tuned from the environment, GUNICORN_WORKERS (default 2 per cpu + 1),
+GUNICORN_THREADS (more than 1 uses the threaded worker), GUNICORN_TIMEOUT,
+GUNICORN_MAX_REQUESTS (recycle a worker after this many, 0 never) &
+GUNICORN_BIND. the catalog watcher (CATALOG_WATCH_INTERVAL) reloads per
+worker, a reloaded version isn't shared
+"""
+
+import os
+import gc
+import multiprocessing
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+preload_app = True
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# no collections while the app & catalog load, they'd only walk what gets frozen
+gc.disable()
+
+
+def when_ready(server):
+    # after the preload, before the first fork
+    from app import app
+    from lib.warmup import warm_master
+
+    warm_master(app)
+    gc.freeze()
+    server.log.info('catalog warmed, %s objects frozen', gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    from app import app, db
+    from lib.warmup import warm_worker
+
+    connections = warm_worker(app, db, threads=threads)
+    worker.log.info('worker %s warmed, %s db connections', worker.pid, connections)
@@ -17,3 +17,104 @@ if MODE == 'PROD':
 
 if MODE == 'STAGE':
     DATABASE_URI = 'mysql://ffuser:{}@{}/ff'.format(secrets.DATABASE_STAGE_PASSWORD, secrets.DATABASE_STAGE_IP)
+
+# overrides the above, eg sqlite:////tmp/ibt.db (or sqlite:// in memory) to run
+# locally without mysql, see flask create-db & flask generate-data
+DATABASE_URI = os.environ.get('DATABASE_URI', DATABASE_URI)
+
+# seconds between checks of data/ for changed csvs, 0 turns the watcher off
+CATALOG_WATCH_INTERVAL = int(os.environ.get('CATALOG_WATCH_INTERVAL', 0))
+
+# outbound email, 'sendgrid' or 'local' (kept in memory, for tests & dev)
+MAIL_TRANSPORT = os.environ.get('MAIL_TRANSPORT', 'sendgrid')
+MAIL_BATCH_SIZE = 50
+MAIL_POLL_SECONDS = 5
+MAIL_MAX_ATTEMPTS = 5
+# doubled after each failed attempt
+MAIL_RETRY_SECONDS = 30
+
+# bcrypt cost for new hashes, existing ones are rehashed on login when it changes
+BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+# per web worker, the login & password change hashing runs in these processes (0 = inline)
+PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', 2))
+# more waiting than this and logins get a 503 straight away
+PASSWORD_POOL_MAX_PENDING = int(os.environ.get('PASSWORD_POOL_MAX_PENDING', 16))
+PASSWORD_POOL_TIMEOUT = 10
+# /admin/onboard hashes in the request on the password pool, bigger csvs go through 'flask onboard-users'
+ONBOARDING_REQUEST_MAX_ROWS = int(os.environ.get('ONBOARDING_REQUEST_MAX_ROWS', 20))
+
+# company logos, 'local' (files under BLOB_STORE_PATH) or 's3' (needs boto3)
+BLOB_STORE = os.environ.get('BLOB_STORE', 'local')
+BLOB_STORE_PATH = os.environ.get('BLOB_STORE_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'blobs'))
+BLOB_S3_BUCKET = os.environ.get('BLOB_S3_BUCKET')
+BLOB_S3_PREFIX = os.environ.get('BLOB_S3_PREFIX', 'logos/')
+# eg a cdn in front of the bucket, logos are redirected there when set
+BLOB_PUBLIC_URL = os.environ.get('BLOB_PUBLIC_URL')
+LOGO_MAX_BYTES = 2 * 1024 * 1024
+LOGO_THUMB_SIZE = (200, 200)
+
+# where the impact & break even answers are kept
+#   rows - the impact_answer/break_even_answer rows, as before answers_json
+#   dual - both, answers_json is read when it's there, the rows otherwise
+#   json - only answers_json, saves leave the old rows as they are (so no going back to rows)
+ANSWER_STORAGE = os.environ.get('ANSWER_STORAGE', 'dual')
+
+# per request query counts, see lib/query_stats, in the response headers in DEBUG,
+# otherwise requests with more queries than QUERY_STATS_LOG_QUERIES or a probable
+# n+1 (a statement run N_PLUS_ONE_THRESHOLD+ times) are logged
+QUERY_STATS = os.environ.get('QUERY_STATS', '1') == '1'
+QUERY_STATS_LOG_QUERIES = int(os.environ.get('QUERY_STATS_LOG_QUERIES', 50))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+
+# span & request timing histograms (lib/timing, /admin/metrics), 0 turns them off
+TIMING = os.environ.get('TIMING', '1') == '1'
+# a prometheus scrape sends this as its bearer token for /admin/metrics (admins can use their login)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# on demand profiles from /admin/profile (lib/profiler)
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'profiles'))
+PROFILE_MAX_REQUESTS = 20
+PROFILE_MAX_SECONDS = 60
+
+# per request tracemalloc peaks & allocation sites (lib/memory, /admin/metrics & the
+# logs) for this fraction of requests, 0 turns it off
+MEMORY_SAMPLE_RATE = float(os.environ.get('MEMORY_SAMPLE_RATE', 0))
+MEMORY_TOP_SITES = 5
+# traced requests peaking over this are logged as a warning
+MEMORY_LOG_MB = int(os.environ.get('MEMORY_LOG_MB', 50))
+
+# statements slower than this (ms, 0 turns it off) are logged with their parameters,
+# request & app code location (lib/slow_queries), and this fraction of the slow
+# selects with their EXPLAIN. SLOW_QUERY_LOG is a file for them, rotated at
+# SLOW_QUERY_LOG_BYTES, otherwise they go through the normal logging
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE', 0.1))
+SLOW_QUERY_PARAMS = os.environ.get('SLOW_QUERY_PARAMS', '1') == '1'
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')
+SLOW_QUERY_LOG_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# the connection pool per worker process (mysql, sqlite keeps its own), the size
+# should cover the gunicorn threads. recycled under the mysql wait_timeout, and
+# checked before use so a dropped connection doesn't fail a request
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 5))
+DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT', 10))
+DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', '1') == '1'
+
+# a read replica for the @read_replica views (lib/database), users who saved in
+# the last REPLICA_STICKY_SECONDS read from the primary
+DATABASE_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URI')
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 30))
+
+# the json for the responses & catalog payloads (lib/json_provider), 'orjson',
+# 'json' (flask's) or by default orjson when it's installed
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+
+# gzip/brotli for the responses (lib/compression), 0 turns it off, eg when the
+# proxy in front does it
+COMPRESSION = os.environ.get('COMPRESSION', '1') == '1'
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
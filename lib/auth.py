@@ -0,0 +1,102 @@
+from functools import wraps
+
+from flask import g
+from flask_jwt_extended import create_access_token, get_jwt_identity, get_jwt_claims
+from sqlalchemy.orm import joinedload
+
+from models import User
+from lib.json_provider import jsonify
+
+
+def create_user_access_token(user):
+    """
+    the token carries the ids & role flags, so views that only need those
+    can skip loading the user. they are as of login, ie moving a user to
+    another company (admin/user) only shows up once they log in again. the
+    admin flag is only a hint, current_user_is_admin checks the user row
+    """
+    return create_access_token(identity=user.email, user_claims={
+        'user_id': user.id,
+        'benchmark_id': user.benchmark_id,
+        'company_id': user.company_id,
+        'admin': bool(user.admin),
+        'investor': bool(user.investor),
+    })
+
+
+def get_current_user():
+    """
+    the logged in user, with their benchmark & company joined in,
+    loaded at most once per request
+    """
+    if 'current_user' not in g:
+        user_id = get_jwt_claims().get('user_id')
+        query = User.query.options(joinedload(User.benchmark), joinedload(User.company))
+
+        if user_id:
+            g.current_user = query.filter_by(id=user_id).first()
+        else:
+            # tokens from before the claims were added
+            g.current_user = query.filter_by(email=get_jwt_identity()).first()
+
+    return g.current_user
+
+
+def get_current_benchmark():
+    return get_current_user().benchmark
+
+
+def get_current_company():
+    return get_current_user().company
+
+
+def get_current_benchmark_id():
+    """
+    straight from the token, only hits the db when the user had no benchmark
+    at login (ie before the company intro) or for old tokens. the views that
+    save are @claims_checked, so there it's the users current benchmark
+    """
+    benchmark_id = get_jwt_claims().get('benchmark_id')
+    if benchmark_id is None:
+        benchmark_id = get_current_user().benchmark_id
+
+    return benchmark_id
+
+
+def current_user_is_admin():
+    """
+    a token saying not admin is taken at its word (saves the query for
+    everyone else), one saying admin is checked against the user, so taking
+    admin away applies straight away rather than once the token expires
+    """
+    if get_jwt_claims().get('admin') is False:
+        return False
+
+    user = get_current_user()
+    return bool(user and user.admin)
+
+
+def claims_checked(fn):
+    """
+    for the views that save, under @jwt_required. the token's benchmark &
+    company are checked against the user row (one query, the user is kept
+    for the view), so a deleted user or one moved to another company can't
+    keep saving on a token from before. the reads still go by the token
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        user = get_current_user()
+        claims = get_jwt_claims()
+
+        stale = user is None
+        for name in ['benchmark_id', 'company_id']:
+            # None when they had none at login, ie before the company intro
+            if not stale and claims.get(name) is not None and claims[name] != getattr(user, name):
+                stale = True
+
+        if stale:
+            return jsonify({'status': 'error', 'message': 'Please log in again'}), 401
+
+        return fn(*args, **kwargs)
+
+    return wrapper
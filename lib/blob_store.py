@@ -0,0 +1,133 @@
+"""
+content addressed blob storage (company logos), a blob is stored & fetched
+by the sha256 of its bytes, so the same file is only stored once and a
+stored blob never changes, ie it can be cached forever
+"""
+
+import os
+import hashlib
+import tempfile
+
+import config.settings as settings
+
+
+def blob_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalBlobStore():
+    """
+    blobs as files under root, fanned out by the first 2 hash chars
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def put(self, data, content_type=None):
+        key = blob_hash(data)
+        path = self.path(key)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written to the side & renamed, so a reader never sees half a file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+
+        return key
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                return f.read()
+        except (OSError, IndexError):
+            return None
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def delete(self, key):
+        try:
+            os.unlink(self.path(key))
+        except OSError:
+            pass
+
+    def url(self, key):
+        # served by the app
+        return None
+
+
+class S3BlobStore():
+    """
+    the same interface on an s3 (or s3 compatible) bucket, needs boto3,
+    with BLOB_PUBLIC_URL set (ie a cdn in front of the bucket) url()
+    gives the public url and the app redirects there instead of proxying
+    """
+    def __init__(self, bucket, prefix='', public_url=None, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('s3')
+
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url
+
+    def key(self, key):
+        return '{}{}/{}'.format(self.prefix, key[:2], key)
+
+    def put(self, data, content_type=None):
+        key = blob_hash(data)
+        if not self.exists(key):
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self.key(key),
+                Body=data,
+                ContentType=content_type or 'application/octet-stream',
+                CacheControl='public, max-age=31536000, immutable')
+        return key
+
+    def get(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key(key))['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(key))
+        except self.client.exceptions.ClientError:
+            return False
+        return True
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(key))
+
+    def url(self, key):
+        if self.public_url:
+            return '{}/{}'.format(self.public_url.rstrip('/'), self.key(key))
+        return None
+
+
+_store = None
+
+
+def get_blob_store():
+    global _store
+
+    if _store is None:
+        if settings.BLOB_STORE == 's3':
+            _store = S3BlobStore(settings.BLOB_S3_BUCKET,
+                                 prefix=settings.BLOB_S3_PREFIX,
+                                 public_url=settings.BLOB_PUBLIC_URL)
+        else:
+            _store = LocalBlobStore(settings.BLOB_STORE_PATH)
+
+    return _store
@@ -0,0 +1,339 @@
+import os
+import glob
+import gzip
+import time
+import hashlib
+import logging
+import threading
+
+from flask import g, has_app_context
+from werkzeug.local import LocalProxy
+
+from lib.csv_parser import Surveys, file_paths
+from lib.json_provider import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# the static catalog structures the frontend fetches as they are
+payload_sources = {
+    'pp_action': lambda surveys: surveys.pp_action,
+    'facets': lambda surveys: surveys.facets,
+    'properties': lambda surveys: surveys.properties,
+    'add_edit_product': lambda surveys: surveys.add_edit_product,
+}
+
+
+class CatalogError(Exception):
+    pass
+
+
+class CatalogManager():
+    """
+    holds the parsed csv catalog (a Surveys instance) behind a versioned reference
+
+    new versions get loaded & validated on the side and swapped in with a single
+    assignment, requests keep the version they started with (see get_surveys),
+    so an old version stays alive until the last request using it has finished
+    """
+    def __init__(self):
+        self._surveys = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._data_signature = None
+        self.loaded_at = None
+        self.last_error = None
+
+    def current(self):
+        if self._surveys is None:
+            self.reload()
+        return self._surveys
+
+    def reload(self):
+        """
+        build a new catalog from the csvs and swap it in,
+        if it doesn't load or validate the current one is kept
+        """
+        with self._reload_lock:
+            signature = data_signature()
+            try:
+                surveys = Surveys()
+                surveys.load()
+                validate_surveys(surveys)
+                surveys.payloads = CatalogPayloads(surveys)
+            except Exception as e:
+                self.last_error = '{}: {}'.format(type(e).__name__, e)
+                logger.exception('catalog reload failed')
+                if self._surveys is None:
+                    raise
+                raise CatalogError(self.last_error)
+
+            previous = self._surveys.version if self._surveys else None
+            self._surveys = surveys
+            self._data_signature = signature
+            self.loaded_at = time.time()
+            self.last_error = None
+
+            if previous and previous != surveys.version:
+                logger.info('catalog swapped %s -> %s', previous, surveys.version)
+
+            return surveys
+
+    def status(self):
+        return {
+            'version': self._surveys.version if self._surveys else None,
+            'loaded_at': self.loaded_at,
+            'last_error': self.last_error,
+            'watching': self._watcher is not None,
+        }
+
+    def watch(self, interval):
+        """
+        poll the data dir in a background thread and reload when a csv changes,
+        needs to be started in each worker process (threads don't survive a fork)
+        """
+        if self._watcher or interval <= 0:
+            return
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                if data_signature() != self._data_signature:
+                    try:
+                        self.reload()
+                    except Exception:
+                        # logged in reload, keep serving the current version
+                        pass
+
+        self._watcher = threading.Thread(target=poll, name='catalog-watcher', daemon=True)
+        self._watcher.start()
+
+    def init_app(self, app, watch_interval=0):
+        @app.before_first_request
+        def start_catalog_watcher():
+            self.watch(watch_interval)
+
+
+class CatalogPayload():
+    """
+    one catalog structure serialised to json once,
+    with gzip (and brotli if installed) versions made up front
+    """
+    def __init__(self, data):
+        self.body = dumps(data)
+        # strong etag, per encoding, as the bytes differ
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        self.encodings = {
+            'gzip': gzip.compress(self.body, compresslevel=9),
+        }
+        if brotli:
+            self.encodings['br'] = brotli.compress(self.body)
+
+    def etag_for(self, encoding=None):
+        if encoding:
+            return '{}-{}'.format(self.etag, encoding)
+        return self.etag
+
+    def all_etags(self):
+        return [self.etag] + [self.etag_for(x) for x in self.encodings]
+
+
+class CatalogPayloads():
+    """
+    serialised payloads for one catalog version, built on first use
+    and dropped along with the version
+    """
+    def __init__(self, surveys):
+        self.surveys = surveys
+        self._payloads = {}
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        name is one of payload_sources, or 'be/<code>' for a break even,
+        None if there is no such survey
+        """
+        if name not in self._payloads:
+            data = self.source(name)
+            if data is None:
+                return None
+
+            with self._lock:
+                if name not in self._payloads:
+                    self._payloads[name] = CatalogPayload(data)
+
+        return self._payloads[name]
+
+    def data(self, name):
+        """
+        the unserialised source of a payload, for views that send it inside
+        a bigger response (the lazy properties in setup), built once
+        """
+        if name not in self._data:
+            data = self.source(name)
+            with self._lock:
+                self._data.setdefault(name, data)
+
+        return self._data[name]
+
+    def warm(self):
+        for name in self.names():
+            self.get(name)
+
+    def names(self):
+        names = list(payload_sources.keys()) + ['properties/skeleton']
+        names += ['properties/' + x for x in property_tab_codes(self.surveys).values()]
+        names += ['be/' + x for x in self.surveys.be_tags]
+        return names
+
+    def source(self, name):
+        if name.startswith('be/'):
+            return self.surveys.be.get(name[3:])
+
+        if name == 'properties/skeleton':
+            return properties_skeleton(self.surveys)
+
+        if name.startswith('properties/'):
+            return properties_tab(self.surveys, name[11:])
+
+        source = payload_sources.get(name)
+        return source(self.surveys) if source else None
+
+
+def property_tab_code(logic_code):
+    """
+    'X-1.3' (the Impact Areas answer) => 'X3' (the tab)
+    """
+    return 'X' + logic_code.split('.')[1]
+
+
+def property_tab_codes(surveys):
+    """
+    {'X-1.1': 'X1', ...} for every X tab in the properties survey
+    """
+    codes = {}
+    for question in surveys.properties['questions']:
+        if question['type'] == 'checkbox' and question['logic']:
+            logic_code = question['logic'][0][0]
+            codes[logic_code] = property_tab_code(logic_code)
+    return codes
+
+
+def properties_skeleton(surveys):
+    """
+    the properties survey without the X tab option trees,
+    those get fetched per tab (properties_tab) once a tab is picked in X
+
+    the tab headers all repeat the same description, so descriptions are
+    sent once under 'descriptions' and the questions point at them with 'description_ref'
+    """
+    questions = []
+    descriptions = {}
+    refs = {}
+
+    for question in surveys.properties['questions']:
+        question = dict(question)
+
+        if question['logic'] and question['type'] == 'checkbox':
+            question['tab'] = property_tab_code(question['logic'][0][0])
+            question['options'] = []
+
+        elif question['logic'] and question.get('description'):
+            description = tuple(question.pop('description'))
+            if description not in refs:
+                refs[description] = 'd{}'.format(len(refs))
+                descriptions[refs[description]] = description
+            question['description_ref'] = refs[description]
+
+        questions.append(question)
+
+    return {
+        'questions': questions,
+        'descriptions': descriptions,
+        'tabs': property_tab_codes(surveys),
+    }
+
+
+def properties_tab(surveys, tab):
+    """
+    the option tree for one X tab, eg 'X3', None if there isn't one
+    """
+    for question in surveys.properties['questions']:
+        if question['type'] == 'checkbox' and question['logic']:
+            if property_tab_code(question['logic'][0][0]) == tab:
+                return {
+                    'tab': tab,
+                    'question': question,
+                }
+
+    return None
+
+
+def data_signature():
+    signature = []
+    for path in sorted(glob.glob(file_paths['data_glob'], recursive=True)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+def validate_surveys(surveys):
+    """
+    the views index straight into these, so check them before a swap
+    rather than finding out with a 500
+    """
+    errors = []
+
+    for tag in surveys.be_tags:
+        be = surveys.be.get(tag)
+        if not be or not be['questions']:
+            errors.append('{} has no questions'.format(tag))
+            continue
+
+        for score in ['progress', 'awareness']:
+            if 'score' not in be['scores'].get(score, {}) or 'unit' not in be['scores'].get(score, {}):
+                errors.append('{} is missing the {} score/unit'.format(tag, score))
+
+        if tag not in surveys.be_text_lookup['break_evens']:
+            errors.append('{} is missing from the short names'.format(tag))
+
+        if tag not in surveys.be_sdgs:
+            errors.append('{} has no SDG links'.format(tag))
+
+    tabs = [q for q in surveys.properties['questions'] if q['type'] == 'checkbox' and q['logic']]
+    if not tabs:
+        errors.append('no X tabs loaded')
+
+    if not surveys.facets['questions']:
+        errors.append('no facets loaded')
+
+    if not surveys.pp_action['questions']:
+        errors.append('no impact questions loaded')
+
+    if errors:
+        raise CatalogError(', '.join(errors))
+
+
+def get_surveys():
+    """
+    the catalog for the current request,
+    pinned on the first use so a reload mid request can't mix versions
+    """
+    if has_app_context():
+        if 'catalog_surveys' not in g:
+            g.catalog_surveys = catalog.current()
+        return g.catalog_surveys
+
+    return catalog.current()
+
+
+catalog = CatalogManager()
+surveys = LocalProxy(get_surveys)
@@ -0,0 +1,122 @@
+"""
+gzip/brotli for the responses, picked from the requests Accept-Encoding
+(brotli when it's accepted and installed, gzip otherwise)
+
+left alone:
+  - bodies under COMPRESSION_MIN_BYTES, not worth the cpu or the bytes
+  - responses that already have a Content-Encoding, ie the catalog payloads
+    which are compressed once up front (lib/catalog)
+  - types that don't compress (the logos) & files sent as they are
+  - 304s & the like, there's no body
+
+streamed responses (the csv export) are compressed as they stream, chunk by
+chunk, so they're never held whole. the levels are COMPRESSION_GZIP_LEVEL &
+COMPRESSION_BROTLI_QUALITY, per response so well under the maximums, 11 for
+brotli is for compressing once like the catalog does
+"""
+
+import zlib
+
+from flask import request
+
+import config.settings as settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compressible_types = {
+    'application/json',
+    'application/javascript',
+    'text/csv',
+    'text/html',
+    'text/plain',
+    'text/css',
+}
+
+
+def gzip_compressor(level):
+    # 16 + for the gzip header & trailer rather than a raw zlib stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def brotli_compressor(quality):
+    compressor = brotli.Compressor(quality=quality)
+    return compressor.process, compressor.finish
+
+
+class Compression():
+    def __init__(self, min_bytes=1024, gzip_level=6, brotli_quality=4):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def init_app(self, app, enabled=True):
+        if not enabled:
+            return
+
+        @app.after_request
+        def compress_response(response):
+            return self.compress(response)
+
+    def choose_encoding(self):
+        if brotli and request.accept_encodings['br']:
+            return 'br'
+        if request.accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def compressor(self, encoding):
+        if encoding == 'br':
+            return brotli_compressor(self.brotli_quality)
+        return gzip_compressor(self.gzip_level)
+
+    def compress(self, response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in compressible_types
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, response.iter_encoded(), encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_bytes:
+                return response
+            process, finish = self.compressor(encoding)
+            response.set_data(process(data) + finish())
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # the bytes differ, so the strong etag does too
+            response.set_etag('{}-{}'.format(etag, encoding))
+
+        return response
+
+    def _stream(self, original, chunks, encoding):
+        process, finish = self.compressor(encoding)
+        try:
+            for chunk in chunks:
+                compressed = process(chunk)
+                if compressed:
+                    yield compressed
+            yield finish()
+        finally:
+            # the server closes this one, pass it on
+            if hasattr(original, 'close'):
+                original.close()
+
+
+compression = Compression(min_bytes=settings.COMPRESSION_MIN_BYTES, gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+                          brotli_quality=settings.COMPRESSION_BROTLI_QUALITY)
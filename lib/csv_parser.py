@@ -1,4 +1,8 @@
 import csv
+import glob
+import hashlib
+
+from lib.timing import timed
 
 file_paths = {
     'add_edit_product': 'data/Add Edit Activity.csv',
@@ -20,9 +24,50 @@ file_paths = {
     'impact_data': 'data/Impact Metrics.csv',
     'be_base_path': 'data/be/',
     'be_sdgs': 'data/be/SDG Links-Table 1.csv',
+    'data_glob': 'data/**/*.csv',
 }
 
 
+class FrozenDict(dict):
+    """
+    read only dict for the parsed catalog, it is shared by every request,
+    still a dict so it serialises as one, .copy() / dict(x) give a mutable one
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('the catalog is read only, copy it first')
+
+    __setitem__ = _read_only
+    __delitem__ = _read_only
+    __ior__ = _read_only
+    clear = _read_only
+    pop = _read_only
+    popitem = _read_only
+    setdefault = _read_only
+    update = _read_only
+
+
+def freeze(value, memo=None):
+    """
+    dicts => FrozenDict, lists => tuples, all the way down
+    anything shared while parsing (eg the x description) stays shared
+    """
+    if memo is None:
+        memo = {}
+
+    if id(value) in memo:
+        return memo[id(value)]
+
+    if isinstance(value, dict):
+        frozen = FrozenDict((k, freeze(v, memo)) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        frozen = tuple(freeze(x, memo) for x in value)
+    else:
+        return value
+
+    memo[id(value)] = frozen
+    return frozen
+
+
 class Surveys():
     def __init__(self):
         self.facets = {}
@@ -40,8 +85,11 @@ class Surveys():
         self.facet_description_lookup = {}
         self.property_description_lookup = {}
         self.property_title_lookup = {}
+        self.version = ''
 
+    @timed('csv.load')
     def load(self):
+        self.load_version()
         self.load_be_tags()
         self.load_pp_descriptions()
         self.load_x0_automatic()
@@ -55,6 +103,29 @@ class Surveys():
         self.load_add_edit_product()
         self.load_be_sdgs()
         self.load_be()
+        self.freeze()
+
+    def freeze(self):
+        """
+        everything is shared between requests (and threads) from here on,
+        so stop anything writing into it
+        """
+        memo = {}
+        for key, value in list(vars(self).items()):
+            setattr(self, key, freeze(value, memo))
+
+    def load_version(self):
+        """
+        hash of all the csv content, anything cached off the parsed catalog
+        gets keyed by this so it is dropped when the csvs change
+        """
+        digest = hashlib.sha1()
+        for path in sorted(glob.glob(file_paths['data_glob'], recursive=True)):
+            digest.update(path.encode('utf-8'))
+            with open(path, 'rb') as csv_file:
+                digest.update(csv_file.read())
+
+        self.version = digest.hexdigest()[:16]
 
     def load_facets(self):
         self.facets = {
@@ -77,6 +148,7 @@ class Surveys():
                 tags.append('BE' + str(n))
         self.be_tags = tags
 
+    @timed('csv.load_be')
     def load_be(self):
         for tag in self.be_tags:
             path = file_paths['be_base_path'] + tag + '-Table 1.csv'
@@ -128,6 +200,7 @@ class Surveys():
 
             return scores
 
+    @timed('csv.load_pp_descriptions')
     def load_pp_descriptions(self):
         with open(file_paths['descriptions'], 'r') as csv_file:
             reader = csv.reader(csv_file, delimiter=',')
@@ -177,6 +250,7 @@ class Surveys():
                 elif row[2]:
                     self.pp_text_lookup[row[2]] = row[3]
 
+    @timed('csv.load_be_text_lookup')
     def load_be_text_lookup(self):
         lookup = {
             'break_evens': {},
@@ -265,6 +339,7 @@ class Surveys():
         self.property_title_lookup['X-0'] = 'Automatic'
 
 
+    @timed('csv.load_properties')
     def load_properties(self):
         x_description = []
         properties = {
@@ -464,6 +539,7 @@ class Surveys():
         return nested_rows
 
 
+    @timed('csv.load_action')
     def load_action(self):
         """
         data collection & intensity
@@ -0,0 +1,119 @@
+"""
+the flask-sqlalchemy setup, pool sizing & read replica routing
+
+the pool options (DATABASE_POOL_*) apply to the server databases, sqlite
+keeps the pools flask-sqlalchemy picks for it
+
+with DATABASE_REPLICA_URI set, the views marked @read_replica (the reports,
+the investor & admin listings) run their queries on the replica, so the
+report load stays off the primary the saves go to. flushes always go to the
+primary. read your writes: a user who saved anything in the last
+REPLICA_STICKY_SECONDS has their reads kept on the primary, the time of
+their last save is kept on their user row (so it holds across workers)
+
+    @app.route('/report/pp', methods=['GET'])
+    @jwt_required
+    @read_replica
+    def get_positive_impact_report_data():
+"""
+
+import time
+from functools import wraps
+
+from flask import g, request, current_app, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from flask_jwt_extended import get_jwt_claims
+from sqlalchemy import event, orm, select
+from sqlalchemy.sql.dml import UpdateBase
+
+import config.settings as settings
+
+REPLICA = 'replica'
+
+
+def replica_configured(app):
+    return REPLICA in (app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def reading_replica(app):
+    return has_request_context() and g.get('read_replica', False) and replica_configured(app)
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase) or not reading_replica(self.app):
+            return super().get_bind(mapper, clause)
+
+        # models with a __bind_key__ of their own stay on it
+        if mapper is not None and mapper.persist_selectable.info.get('bind_key') is not None:
+            return super().get_bind(mapper, clause)
+
+        return get_state(self.app).db.get_engine(self.app, bind=REPLICA)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def __init__(self, app=None, pool_options=None, **kwargs):
+        self.pool_options = pool_options or {}
+        super().__init__(app, **kwargs)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        if not sa_url.drivername.startswith('sqlite'):
+            options.update(self.pool_options)
+        return super().apply_driver_hacks(app, sa_url, options)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def current_user_id():
+    return get_jwt_claims().get('user_id') if has_request_context() else None
+
+
+def wrote_recently(user_id):
+    # imported here, models needs the db this module sets up
+    from models import User
+
+    if not user_id:
+        # a token from before the claims, can't tell
+        return True
+
+    # a short lived connection to the primary, the session would hold one (and
+    # its transaction) open for the rest of the request
+    with get_state(current_app).db.engine.connect() as connection:
+        last_write = connection.execute(select([User.last_write_at]).where(User.id == user_id)).scalar()
+    return last_write is not None and time.time() - last_write < settings.REPLICA_STICKY_SECONDS
+
+
+def read_replica(fn):
+    """
+    the views queries go to the replica, when there is one and the user
+    hasn't just saved something. for read only views, under @jwt_required
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.read_replica = replica_configured(current_app) and not wrote_recently(current_user_id())
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            g.pop('read_replica', None)
+
+    return wrapper
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def record_user_write(session, flush_context):
+    """
+    stamps the users last_write_at in the same transaction as their save,
+    once per request
+    """
+    # the environ rather than g, which outlives the request when an app context was already pushed
+    if not has_request_context() or request.environ.get('ibt.write_recorded'):
+        return
+
+    user_id = current_user_id()
+    if not user_id:
+        return
+
+    from models import User
+    session.execute(User.__table__.update().where(User.id == user_id).values(last_write_at=time.time()))
+    request.environ['ibt.write_recorded'] = True
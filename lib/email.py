@@ -1,38 +1,145 @@
+import time
+import logging
 
 from flask import render_template
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 
-from app import settings
+from app import settings, db
+from models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+from_email = 'no-reply@em796.futurefit.business'
 
 
 def send_reset_password_email(email, password):
     template = render_template('emails/reset_password.html', password=password)
+    return queue_email(email, 'Password Reset', template)
+
+
+def send_welcome_email(email, password):
+    template = render_template('emails/welcome.html', password=password, email=email)
+    return queue_email(email, 'Welcome to the Impact Benchmark Tool', template)
+
 
+def queue_email(email, subject, html_content):
+    """
+    add to the outbound queue, it goes with the callers commit
+    and the mail worker sends it from there
+    """
     if settings.DEBUG:
         email = 'raphael@futurefitbusiness.org'
 
-    message = Mail(
-        from_email='no-reply@em796.futurefit.business',
-        to_emails=email,
-        subject='Password Reset',
-        html_content=template)
+    now = time.time()
+    queued = OutboundEmail(
+        to_email=email,
+        subject=subject,
+        html_content=html_content,
+        status='pending',
+        attempts=0,
+        created_on=now,
+        next_attempt_on=now)
+    db.session.add(queued)
 
-    sendgrid_client = SendGridAPIClient(api_key=settings.secrets.SENDGRID_API_KEY)
-    response = sendgrid_client.send(message)
+    return queued
 
 
-def send_welcome_email(email, password):
-    template = render_template('emails/welcome.html', password=password, email=email)
+class SendGridTransport():
+    def __init__(self, api_key):
+        # one client for the worker, rather than one per email
+        self.client = SendGridAPIClient(api_key=api_key)
 
-    if settings.DEBUG:
-        email = 'raphael@futurefitbusiness.org'
+    def send(self, email):
+        message = Mail(
+            from_email=from_email,
+            to_emails=email.to_email,
+            subject=email.subject,
+            html_content=email.html_content)
+        self.client.send(message)
+
+
+class LocalTransport():
+    """
+    keeps the emails in memory instead of sending them, for tests & local dev
+    """
+    def __init__(self):
+        self.sent = []
+        self.fail_next = 0
+
+    def send(self, email):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise RuntimeError('local transport failure')
+
+        self.sent.append({
+            'from_email': from_email,
+            'to_email': email.to_email,
+            'subject': email.subject,
+            'html_content': email.html_content,
+        })
+
+
+def get_transport(name=None):
+    name = name or settings.MAIL_TRANSPORT
+    if name == 'local':
+        return LocalTransport()
+
+    return SendGridTransport(settings.secrets.SENDGRID_API_KEY)
+
+
+def send_queued_emails(transport, batch_size=None):
+    """
+    send one batch of due emails, failures are retried with a backoff
+    until MAIL_MAX_ATTEMPTS, returns how many were sent
+    """
+    batch_size = batch_size or settings.MAIL_BATCH_SIZE
+    now = time.time()
+    sent = 0
+
+    # skip locked, so a second worker takes the next batch instead of waiting
+    emails = OutboundEmail.query.\
+        filter(OutboundEmail.status == 'pending', OutboundEmail.next_attempt_on <= now).\
+        order_by(OutboundEmail.id).\
+        limit(batch_size).\
+        with_for_update(skip_locked=True).\
+        all()
+
+    for email in emails:
+        try:
+            transport.send(email)
+        except Exception as e:
+            email.attempts += 1
+            email.last_error = str(e)[:500]
+            email.next_attempt_on = time.time() + settings.MAIL_RETRY_SECONDS * (2 ** (email.attempts - 1))
+            if email.attempts >= settings.MAIL_MAX_ATTEMPTS:
+                email.status = 'failed'
+            logger.warning('email %s to %s failed (attempt %s): %s', email.id, email.to_email, email.attempts, e)
+        else:
+            email.status = 'sent'
+            email.sent_on = time.time()
+            email.html_content = None
+            sent += 1
+
+    db.session.commit()
+
+    return sent
+
+
+def run_mail_worker(transport, interval=None, once=False):
+    interval = interval or settings.MAIL_POLL_SECONDS
+
+    while True:
+        try:
+            sent = send_queued_emails(transport)
+        except Exception:
+            logger.exception('mail worker batch failed')
+            db.session.rollback()
+            sent = 0
 
-    message = Mail(
-        from_email='no-reply@em796.futurefit.business',
-        to_emails=email,
-        subject='Welcome to the Impact Benchmark Tool',
-        html_content=template)
+        if once:
+            return sent
 
-    sendgrid_client = SendGridAPIClient(api_key=settings.secrets.SENDGRID_API_KEY)
-    response = sendgrid_client.send(message)
+        # keep going straight away while there's a backlog
+        if sent < settings.MAIL_BATCH_SIZE:
+            time.sleep(interval)
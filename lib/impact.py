@@ -1,20 +1,24 @@
-from lib.csv_parser import Surveys
-from models import ImpactAnswer
+from functools import lru_cache
 
-surveys = Surveys()
-surveys.load()
+from lib.catalog import catalog, surveys
+from lib.timing import timed
 
-def get_impact_percent_complete_stats(question_lookup, impact_id):
+# parse the csvs up front, rather than on the first request
+catalog.current()
+
+# distinct facet selections we keep hidden options for,
+# products tend to share a small number of facet profiles
+HIDDEN_OPTIONS_CACHE_SIZE = 256
+
+@timed('impact.get_impact_percent_complete_stats')
+def get_impact_percent_complete_stats(question_lookup, impact):
     #run through the answers and see if we have answerd all that is visible - based on the answers
-    answers = {}
     stats = {}
     visible_questions = 0
     answered_questions = 0
     percent_complete = 0
 
-    current_answers = ImpactAnswer.query.filter_by(impact_id=impact_id).all()
-    for current_answer in current_answers:
-        answers[current_answer.number] = current_answer.data
+    answers = impact.answer_data()
 
     for number in question_lookup:
         question = question_lookup[number]
@@ -66,17 +70,20 @@ def get_impact_description_from_dict(impact):
     return description
 
 
+@timed('impact.merge_duplicate_impacts')
 def merge_duplicate_impacts(actions):
     # now we de-dup the actions:
     """
     so, we've already merged the blank ones,
     and ones further up in the tree of that specific option,
     this is merging duplicates from across different main options & x tabs
+
+    keyed on (pp action, option text), the same as CatalogImpact
     """
     impacts = {}
 
     for action in actions:
-        key = action['option_text'] + action['pp']
+        key = (action['pp'], action['option_text'])
 
         if key not in impacts:
             impacts[key] = action
@@ -92,6 +99,7 @@ def merge_duplicate_impacts(actions):
     return impacts
 
 
+@timed('impact.merge_duplicate_impacts_as_list')
 def merge_duplicate_impacts_as_list(actions):
     """
     thing for kev, list of unique combos
@@ -99,7 +107,7 @@ def merge_duplicate_impacts_as_list(actions):
     impacts = {}
 
     for action in actions:
-        key = action['option_text'] + action['pp']
+        key = (action['pp'], action['option_text'])
 
         if key not in impacts:
             impacts[key] = action
@@ -135,6 +143,27 @@ def get_hidden_options(options, selected_facets):
     return ret
 
 
+@timed('impact.get_hidden_property_options')
+def get_hidden_property_options(selected_facets):
+    """
+    all the X tab options hidden by the selected facets,
+    it only depends on the facet set, so is cached per set & catalog version
+    """
+    return _get_hidden_property_options(frozenset(selected_facets), surveys.version)
+
+
+@lru_cache(maxsize=HIDDEN_OPTIONS_CACHE_SIZE)
+def _get_hidden_property_options(facet_set, version):
+    hidden_options = []
+
+    for question in surveys.properties['questions'][1:]:
+        if question['type'] == 'checkbox':
+            hidden_options += get_hidden_options(question['options'], facet_set)
+
+    return tuple(hidden_options)
+
+
+@timed('impact.assign_automatic_impacts')
 def assign_automatic_impacts(impacts, selected_facets):
     """
     if they have the facets, but not the action:
@@ -160,7 +189,7 @@ def assign_automatic_impacts(impacts, selected_facets):
                     # duplicates are merged in the next step after
                     impacts.append({
                         'pp': action['pp'],
-                        'sdgs': action['sdgs'],
+                        'sdgs': list(action['sdgs']),
                         'option_code': x['value'],
                         'option_text': x['title'],
                         'property_code': 'X-0'
@@ -169,6 +198,7 @@ def assign_automatic_impacts(impacts, selected_facets):
     return impacts
 
 
+@timed('impact.get_property_actions')
 def get_property_actions(answers, property_code, selected_facets):
     """
     generate a list of actions (that will get merged into impacts later on)
@@ -208,72 +238,57 @@ def _update_actions_per_option_tree(actions):
     also
     eg [1.1, 1.1.1, 1.1.2] => 1.1.1 & 1.1.2 both get sdgs/actions from 1.1
 
-    first we need to find the sub most option
-    (there could be multiple at the same level),
-    then take all the previous ones
+    the actions are nested into a trie by option code, so the sub most options
+    are the leaves, and everything further up gets passed down on the way to them
     (one action may be added multiple times with different text)
-    and duplicate the options and put the text on all that link to it,
+    the answers come in sorted, so the leaves are visited in the same order
     """
-    action_codes = [x['option_code'] for x in actions]
-    grouped_codes = _group_by_reverse_sub_options(action_codes)
     new_actions = []
-
-    for key in grouped_codes:
-
-        text = ''
-        # find the main ones
-        for a in actions:
-            if a['option_code'] == key:
-                # action = a
-                new_actions.append(a)
-                if a['option_text']:
-                    text = a['option_text']
-
-        codes = grouped_codes[key]
-
-        for a in actions:
-            if a['option_code'] in codes:
-                b = a.copy()
-                b['option_text'] = text
-                new_actions.append(b)
+    _collect_option_tree_actions(_build_option_trie(actions), [], new_actions)
 
     return new_actions
 
 
-def _group_by_reverse_sub_options(codes):
+def _build_option_trie(actions):
     """
-    make a dict of the lowest sub options, with all its previous options attached
-    *and chop out all of the other options
-    eg:
-    original = [3, 3.1, 3.1.1, 3.1.2]
-    {
-        '3.1.1': [3, 3.1],
-        '3.1.2': [3, 3.1]
-    }
-    so we have a list of what actions to pull down into the sub option
+    nest the actions by the dotted option code
+    eg X1-2.1.3 => {'X1-2': {'1': {'3': ...}}}
+    every node only exists because something under it has actions,
+    so a node without children is always one of the sub most options
     """
-    res = {}
+    root = {'children': {}, 'actions': []}
 
-    for c in codes:
-        sub_codes = _get_sub_codes(c)
-
-        res[c] = sub_codes
-        # remove codes if the are now part of a sub option
-        for sc in sub_codes:
-            if sc in res:
-                del res[sc]
-
-    return res
+    for action in actions:
+        node = root
+        for token in action['option_code'].split('.'):
+            if token not in node['children']:
+                node['children'][token] = {'children': {}, 'actions': []}
+            node = node['children'][token]
 
+        node['actions'].append(action)
 
-def _get_sub_codes(c):
-    previous_codes = []
-    tokens = c.split('.')
+    return root
 
-    for (i, token) in enumerate(tokens[1:], 1):
-        previous_codes.append(".".join(tokens[:i]))
 
-    return previous_codes
+def _collect_option_tree_actions(node, inherited, new_actions):
+    if not node['children']:
+        text = ''
+        for a in node['actions']:
+            new_actions.append(a)
+            if a['option_text']:
+                text = a['option_text']
+
+        # all the further up actions get the text of the sub option
+        for a in inherited:
+            b = a.copy()
+            b['option_text'] = text
+            new_actions.append(b)
+
+        return
+
+    inherited = inherited + node['actions']
+    for child in node['children'].values():
+        _collect_option_tree_actions(child, inherited, new_actions)
 
 
 def _check_f_logic(facets, selected_facets):
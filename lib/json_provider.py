@@ -0,0 +1,83 @@
+"""
+json for the responses, through orjson when it's installed (several times
+quicker on the catalog & report payloads, see benchmarks/serialization) and
+flask's own json otherwise
+
+    from lib.json_provider import jsonify
+
+jsonify takes the same arguments as flask's and gives the same output, sorted
+keys (JSON_SORT_KEYS), indented in debug, dates as http dates like flask's
+encoder (orjson writes non ascii as utf-8 rather than \\u escapes, the
+same json once parsed). JSON_PROVIDER picks one ('orjson' or 'json'), by
+default orjson if it imports. anything orjson can't do (ints over 64 bits,
+say) goes through flask's json instead
+"""
+
+import logging
+
+from flask import current_app, has_app_context, json as flask_json
+
+import config.settings as settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+providers = ['orjson', 'json']
+
+
+def get_provider(name):
+    if name == 'orjson' and orjson is None:
+        logger.warning('JSON_PROVIDER is orjson but it is not installed, using json')
+        return 'json'
+    if name in providers:
+        return name
+    return 'orjson' if orjson is not None else 'json'
+
+
+provider = get_provider(settings.JSON_PROVIDER)
+
+
+def _encoder():
+    return current_app.json_encoder() if has_app_context() else flask_json.JSONEncoder()
+
+
+def _default(obj):
+    # the types orjson leaves to us, done the way flask's encoder does them
+    return _encoder().default(obj)
+
+
+def dumps(obj, sort_keys=True, indent=False):
+    """
+    => utf-8 bytes
+    """
+    if provider == 'orjson':
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except orjson.JSONEncodeError:
+            pass
+
+    if indent:
+        text = flask_json.dumps(obj, sort_keys=sort_keys, indent=2, separators=(', ', ': '))
+    else:
+        text = flask_json.dumps(obj, sort_keys=sort_keys, separators=(',', ':'))
+    return text.encode('utf-8')
+
+
+def jsonify(*args, **kwargs):
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+    data = args[0] if len(args) == 1 else args or kwargs
+
+    indent = current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] or current_app.debug
+    body = dumps(data, sort_keys=current_app.config['JSON_SORT_KEYS'], indent=indent)
+
+    return current_app.response_class(body + b'\n', mimetype=current_app.config['JSONIFY_MIMETYPE'])
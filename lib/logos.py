@@ -0,0 +1,71 @@
+import io
+import logging
+
+import config.settings as settings
+from lib.blob_store import get_blob_store
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+content_types = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+
+
+class LogoError(Exception):
+    pass
+
+
+def logo_content_type(extension):
+    return content_types.get((extension or '').lower(), 'application/octet-stream')
+
+
+def make_thumbnail(data, size=None):
+    """
+    a png that fits in LOGO_THUMB_SIZE, None when pillow isn't installed
+    or can't read the image (ie svg, which doesn't need one)
+    """
+    if Image is None:
+        return None
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.thumbnail(size or settings.LOGO_THUMB_SIZE)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        out = io.BytesIO()
+        image.save(out, format='PNG', optimize=True)
+        return out.getvalue()
+    except Exception as e:
+        logger.info('no logo thumbnail: %s', e)
+        return None
+
+
+def store_logo(data, extension):
+    """
+    => (logo hash, thumbnail hash or None), the caller sets them on the company
+    """
+    extension = (extension or '').lower()
+    if extension not in content_types:
+        raise LogoError('logos need to be one of {}'.format(', '.join(sorted(content_types))))
+    if not data:
+        raise LogoError('empty file')
+    if len(data) > settings.LOGO_MAX_BYTES:
+        raise LogoError('logos need to be under {}MB'.format(settings.LOGO_MAX_BYTES // (1024 * 1024)))
+
+    store = get_blob_store()
+    logo_hash = store.put(data, logo_content_type(extension))
+
+    thumb = make_thumbnail(data)
+    thumb_hash = store.put(thumb, 'image/png') if thumb else None
+
+    return logo_hash, thumb_hash
@@ -0,0 +1,211 @@
+"""
+per request memory accounting with tracemalloc, for a sample of requests
+
+tracemalloc is switched on for the sampled request and off again after it,
+so the rest pay nothing (MEMORY_SAMPLE_RATE=0, the default, is just the
+check). a traced request records its peak traced memory
+(the most python allocated at once while it ran) and the top allocation
+sites still holding memory at the end of it (the response body, anything
+cached or leaked), by file & line
+
+    MEMORY_SAMPLE_RATE=0.05 - trace 1 in 20 requests
+
+the peaks are aggregated per endpoint for /admin/metrics (with the worker
+max rss, for the creep), each traced request is logged as a json line
+(a warning over MEMORY_LOG_MB). tracing is process wide, so one request at a
+time is traced and allocations by other threads in the meantime count too,
+keep that in mind with threaded workers. the benchmarks use trace() directly,
+see benchmarks/endpoints --memory
+"""
+
+import os
+import sys
+import json
+import random
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from flask import g, request
+
+import config.settings as settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+
+class MemoryTrace():
+    def __init__(self):
+        self.peak = 0
+        self.current = 0
+        self.sites = []
+
+    def as_dict(self):
+        return {
+            'peak_kb': round(self.peak / 1024, 1),
+            'current_kb': round(self.current / 1024, 1),
+            'sites': [{'site': site, 'kb': round(size / 1024, 1), 'count': count} for site, size, count in self.sites],
+        }
+
+
+def max_rss():
+    """
+    the process peak resident set size in bytes, None where it isn't known
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on mac
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def top_sites(snapshot, limit):
+    """
+    [(file:line, bytes, allocations)] of the biggest, the app files relative
+    to the repo
+    """
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    sites = []
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        filename = frame.filename
+        if filename.startswith(root):
+            filename = filename[len(root):]
+        sites.append(('{}:{}'.format(filename, frame.lineno), stat.size, stat.count))
+    return sites
+
+
+class MemoryTracker():
+    def __init__(self, sample_rate=0.0, top=5, log_bytes=50 * 1024 * 1024):
+        self.sample_rate = sample_rate
+        self.top = top
+        self.log_bytes = log_bytes
+        # {endpoint: [count, sum of peaks, max peak]}
+        self.peaks = {}
+        self._lock = threading.Lock()
+        self._tracing = threading.Lock()
+
+    def _begin(self, blocking):
+        if not self._tracing.acquire(blocking):
+            return None
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+            baseline = 0
+        else:
+            # already on (PYTHONTRACEMALLOC), counted from here instead
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        return started, baseline
+
+    def _end(self, state, top, trace):
+        started, baseline = state
+        try:
+            current, peak = tracemalloc.get_traced_memory()
+            trace.current = max(current - baseline, 0)
+            trace.peak = max(peak - baseline, 0)
+            if top and started:
+                trace.sites = top_sites(tracemalloc.take_snapshot(), top)
+        finally:
+            if started:
+                tracemalloc.stop()
+            self._tracing.release()
+        return trace
+
+    @contextmanager
+    def trace(self, top=None):
+        """
+        traces the block, waiting for any other trace to finish first
+
+            with memory.trace() as trace:
+                build_report()
+            trace.peak
+        """
+        state = self._begin(blocking=True)
+        trace = MemoryTrace()
+        try:
+            yield trace
+        finally:
+            self._end(state, self.top if top is None else top, trace)
+
+    def observe(self, endpoint, peak):
+        with self._lock:
+            stats = self.peaks.setdefault(endpoint, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += peak
+            stats[2] = max(stats[2], peak)
+
+    def reset(self):
+        with self._lock:
+            self.peaks = {}
+
+    def prometheus(self, metric='ibt_request_memory_peak_bytes'):
+        with self._lock:
+            peaks = sorted((endpoint, list(stats)) for endpoint, stats in self.peaks.items())
+
+        lines = [
+            '# HELP {} Peak traced python memory of the sampled requests.'.format(metric),
+            '# TYPE {} summary'.format(metric),
+        ]
+        # per worker, like lib/timing's
+        worker = os.getpid()
+        for endpoint, (count, total, _) in peaks:
+            lines.append('{}_sum{{endpoint="{}",worker="{}"}} {}'.format(metric, endpoint, worker, total))
+            lines.append('{}_count{{endpoint="{}",worker="{}"}} {}'.format(metric, endpoint, worker, count))
+        lines += [
+            '# HELP {}_max Largest peak traced python memory of the sampled requests.'.format(metric),
+            '# TYPE {}_max gauge'.format(metric),
+        ]
+        for endpoint, (_, _, largest) in peaks:
+            lines.append('{}_max{{endpoint="{}",worker="{}"}} {}'.format(metric, endpoint, worker, largest))
+
+        rss = max_rss()
+        if rss is not None:
+            lines += [
+                '# HELP ibt_process_max_rss_bytes Peak resident set size of the worker.',
+                '# TYPE ibt_process_max_rss_bytes gauge',
+                'ibt_process_max_rss_bytes{{worker="{}"}} {}'.format(worker, rss),
+            ]
+
+        return '\n'.join(lines) + '\n'
+
+    def init_app(self, app):
+        @app.before_request
+        def start_memory_trace():
+            if self.sample_rate and random.random() < self.sample_rate:
+                # skipped when another request is being traced
+                state = self._begin(blocking=False)
+                if state is not None:
+                    g.memory_trace = state
+
+        @app.teardown_request
+        def finish_memory_trace(exception=None):
+            state = g.pop('memory_trace', None)
+            if state is not None:
+                self.report(self._end(state, self.top, MemoryTrace()))
+
+    def report(self, trace):
+        endpoint = request.endpoint or 'unknown'
+        self.observe(endpoint, trace.peak)
+
+        info = trace.as_dict()
+        info.update({
+            'event': 'memory',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+        })
+        level = logging.WARNING if trace.peak > self.log_bytes else logging.INFO
+        logger.log(level, json.dumps(info, sort_keys=True))
+
+
+memory = MemoryTracker(sample_rate=settings.MEMORY_SAMPLE_RATE, top=settings.MEMORY_TOP_SITES,
+                       log_bytes=settings.MEMORY_LOG_MB * 1024 * 1024)
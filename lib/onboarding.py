@@ -0,0 +1,170 @@
+"""
+bulk onboarding from a csv, one row per user, eg
+
+    email,first,last,company,industry_type,business_model,description,year,month_start,month_end,admin,investor
+    jo@acme.com,Jo,Bloggs,Acme,Energy,B2B,,2021,January,December,,
+
+rows with the same company share it (and its benchmark), companies that
+already exist are reused, users whose email exists already are skipped
+"""
+
+import csv
+import io
+
+from sqlalchemy import func
+
+from app import db
+from models import User, Company, Benchmark
+import utils as utils
+from lib.email import send_welcome_email
+from lib.passwords import hash_passwords
+
+true_values = ['1', 'true', 'yes', 'y', 'x']
+
+
+def read_onboarding_csv(text):
+    """
+    csv text => list of row dicts, headers lowercased and values stripped
+    """
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    rows = []
+    for row in reader:
+        rows.append({k.strip().lower(): (v or '').strip() for k, v in row.items() if k})
+    return rows
+
+
+def onboard_users(rows, send_welcome=True, dry_run=False, hasher=hash_passwords):
+    """
+    create the users, companies & benchmarks in the rows with bulk inserts,
+    passwords are generated & hashed and sent in the (queued) welcome
+    emails, everything goes in one commit
+
+    hasher takes the list of passwords => their hashes, by default a process
+    per core (the cli). /admin/onboard hashes one at a time on the password
+    pool instead, so only takes small csvs (ONBOARDING_REQUEST_MAX_ROWS)
+    """
+    result = {
+        'users': 0,
+        'companies': 0,
+        'existing_companies': 0,
+        'skipped': [],
+        'errors': [],
+    }
+
+    emails = [x['email'] for x in rows if x.get('email')]
+    existing_emails = set()
+    if emails:
+        existing_emails = {x.lower() for (x,) in db.session.query(User.email).filter(User.email.in_(emails))}
+
+    names = list({x['company'] for x in rows if x.get('company')})
+    existing_companies = {}
+    if names:
+        # keyed on the lowercased name, the same as mysql compares them
+        existing_companies = {x.name.lower(): x.id for x in Company.query.filter(Company.name.in_(names))}
+
+    users = []
+    new_companies = {}
+    seen = set()
+
+    # line 1 is the header
+    for line, row in enumerate(rows, 2):
+        email = row.get('email', '')
+        company = row.get('company', '').lower()
+
+        if '@' not in email:
+            result['errors'].append({'line': line, 'message': 'missing or invalid email'})
+            continue
+
+        if email.lower() in seen:
+            result['errors'].append({'line': line, 'message': '{} is in the csv twice'.format(email)})
+            continue
+        seen.add(email.lower())
+
+        if email.lower() in existing_emails:
+            result['skipped'].append(email)
+            continue
+
+        if company and company not in existing_companies and company not in new_companies:
+            if not row.get('year'):
+                result['errors'].append({'line': line, 'message': 'new company {} needs a year'.format(row['company'])})
+                continue
+            new_companies[company] = row
+
+        users.append(row)
+
+    result['users'] = len(users)
+    result['companies'] = len(new_companies)
+    result['existing_companies'] = len({x['company'].lower() for x in users if x.get('company', '').lower() in existing_companies})
+
+    if dry_run or not users:
+        return result
+
+    passwords = [utils.random_uuid_code() for _ in users]
+    hashes = hasher(passwords)
+
+    try:
+        company_ids = dict(existing_companies)
+        benchmark_ids = {}
+
+        if existing_companies:
+            query = db.session.query(Benchmark.company_id, func.min(Benchmark.id)).\
+                filter(Benchmark.company_id.in_(existing_companies.values())).\
+                group_by(Benchmark.company_id)
+            benchmark_ids = dict(query)
+
+        if new_companies:
+            # plain executemany inserts, return_defaults would insert them one at a time
+            # for the ids, which are read back in one select each instead
+            company_rows = [{
+                'name': row['company'],
+                'intro_complete': True,
+                'hidden': False,
+                'industry_type': row.get('industry_type') or None,
+                'business_model': row.get('business_model') or None,
+                'description': row.get('description') or None,
+            } for name, row in new_companies.items()]
+            db.session.bulk_insert_mappings(Company, company_rows)
+            query = db.session.query(Company.name, Company.id).\
+                filter(Company.name.in_([x['name'] for x in company_rows])).\
+                order_by(Company.id)
+            # the newest company of each name, any older ones are existing_companies
+            new_ids = {name.lower(): id for name, id in query}
+            company_ids.update({name: new_ids[name] for name in new_companies})
+
+            benchmark_rows = [{
+                'company_id': company_ids[name],
+                'year': row['year'],
+                'month_start': row.get('month_start') or None,
+                'month_end': row.get('month_end') or None,
+            } for name, row in new_companies.items()]
+            db.session.bulk_insert_mappings(Benchmark, benchmark_rows)
+            query = db.session.query(Benchmark.company_id, Benchmark.id).\
+                filter(Benchmark.company_id.in_([x['company_id'] for x in benchmark_rows]))
+            benchmark_ids.update(dict(query))
+
+        user_rows = []
+        for row, password in zip(users, hashes):
+            company_id = company_ids.get(row.get('company', '').lower())
+            user_rows.append({
+                'email': row['email'],
+                'password': password,
+                'first': row.get('first') or None,
+                'last': row.get('last') or None,
+                'admin': row.get('admin', '').lower() in true_values,
+                'investor': row.get('investor', '').lower() in true_values,
+                'welcome': False,
+                'company_id': company_id,
+                'benchmark_id': benchmark_ids.get(company_id),
+            })
+        db.session.bulk_insert_mappings(User, user_rows)
+
+        if send_welcome:
+            for row, password in zip(users, passwords):
+                send_welcome_email(row['email'], password)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return result
@@ -0,0 +1,43 @@
+"""
+the bcrypt functions the password pool runs, kept apart from lib/passwords
+so a pool process can import them without the app (a spawned or forkserver
+process imports this module on its own, and the app imports the pool).
+only bcrypt here, the rounds come in as an argument
+"""
+
+import bcrypt
+
+
+def hash_password(password, rounds):
+    """
+    the same hash as bcrypt.generate_password_hash (flask-bcrypt), as a plain
+    function so it can run in a pool process
+    """
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def check_password(pw_hash, password, rounds):
+    """
+    => (matches, new hash or None), the new hash is there when the
+    password matched but was hashed with another cost than rounds
+    """
+    try:
+        matches = bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+    except ValueError:
+        # not a bcrypt hash
+        return False, None
+
+    if matches and hash_rounds(pw_hash) != rounds:
+        return True, hash_password(password, rounds)
+
+    return matches, None
+
+
+def hash_rounds(pw_hash):
+    """
+    '$2b$12$...' => 12
+    """
+    try:
+        return int(pw_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
@@ -0,0 +1,174 @@
+import os
+import time
+import threading
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, has_app_context
+
+import config.settings as settings
+from lib.password_hashing import hash_password, check_password, hash_rounds
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+class PasswordPool():
+    """
+    the bcrypt work for requests (login, password changes), run in a small
+    process pool so a burst of logins queues up there instead of holding the
+    cpu the rest of the api needs
+
+    at most max_pending calls wait on the pool per worker process, past that
+    PasswordPoolBusy is raised straight away rather than queueing up behind
+    requests that will time out anyway. workers=0 runs them inline
+    """
+    def __init__(self, workers=None, max_pending=None, timeout=None, mp_context=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.mp_context = mp_context
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.counts = {'hash': 0, 'check': 0, 'rehash': 0, 'busy': 0, 'timeout': 0, 'broken': 0}
+        self.seconds = {'hash': 0.0, 'check': 0.0}
+        self.max_seconds = {'hash': 0.0, 'check': 0.0}
+
+    @property
+    def rounds(self):
+        if has_app_context():
+            return current_app.config.get('BCRYPT_LOG_ROUNDS', settings.BCRYPT_LOG_ROUNDS)
+        return settings.BCRYPT_LOG_ROUNDS
+
+    def hash(self, password):
+        return self._run('hash', hash_password, password, self.rounds)
+
+    def check(self, pw_hash, password):
+        """
+        => (matches, new hash or None), see check_password, the caller saves the new hash
+        """
+        matches, new_hash = self._run('check', check_password, pw_hash, password, self.rounds)
+        if new_hash:
+            with self._lock:
+                self.counts['rehash'] += 1
+        return matches, new_hash
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'workers': self._get_workers(),
+                'max_pending': self._get_max_pending(),
+                'pending': self.pending,
+                'rounds': self.rounds,
+            }
+            stats.update(self.counts)
+            for name in self.seconds:
+                count = self.counts[name]
+                stats['{}_avg_ms'.format(name)] = round(self.seconds[name] / count * 1000, 1) if count else None
+                stats['{}_max_ms'.format(name)] = round(self.max_seconds[name] * 1000, 1)
+            return stats
+
+    def _get_workers(self):
+        return settings.PASSWORD_POOL_WORKERS if self.workers is None else self.workers
+
+    def _get_max_pending(self):
+        return settings.PASSWORD_POOL_MAX_PENDING if self.max_pending is None else self.max_pending
+
+    def _get_timeout(self):
+        return settings.PASSWORD_POOL_TIMEOUT if self.timeout is None else self.timeout
+
+    def _get_executor(self):
+        # a pool from before a fork (ie gunicorn preload) is no use in the child
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self._get_workers(), mp_context=self.mp_context)
+            self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, name, fn, *args):
+        with self._lock:
+            if self.pending >= self._get_max_pending():
+                self.counts['busy'] += 1
+                raise PasswordPoolBusy('{} password checks already waiting'.format(self.pending))
+            self.pending += 1
+            executor = self._get_executor() if self._get_workers() else None
+
+        start = time.time()
+        try:
+            if executor is None:
+                try:
+                    return fn(*args)
+                finally:
+                    self._release()
+
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # a pool process died since the last call (oom killed, say), start a new pool
+                self._reset(executor)
+                try:
+                    with self._lock:
+                        executor = self._get_executor()
+                    future = executor.submit(fn, *args)
+                except BrokenProcessPool:
+                    self._release()
+                    self._reset(executor)
+                    raise PasswordPoolBusy('password pool broken')
+
+            # the slot is held until the work is done, not until we stop waiting on it,
+            # so a timed out check that's still running in the pool counts against max_pending
+            future.add_done_callback(self._release)
+            try:
+                return future.result(timeout=self._get_timeout())
+            except TimeoutError:
+                # drops it if it's still queued, one already running finishes first
+                future.cancel()
+                with self._lock:
+                    self.counts['timeout'] += 1
+                raise PasswordPoolBusy('password {} timed out'.format(name))
+            except BrokenProcessPool:
+                # a process died with this one in it, the next call gets a new pool
+                self._reset(executor)
+                raise PasswordPoolBusy('password pool broken')
+        finally:
+            seconds = time.time() - start
+            with self._lock:
+                self.counts[name] += 1
+                self.seconds[name] += seconds
+                self.max_seconds[name] = max(self.max_seconds[name], seconds)
+
+    def _reset(self, executor):
+        with self._lock:
+            self.counts['broken'] += 1
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+
+password_pool = PasswordPool()
+
+
+def hash_passwords(passwords, workers=None, rounds=None):
+    """
+    hash a batch of passwords across a process pool of its own, one process
+    per core (bcrypt is cpu bound), results keep the input order. for the
+    onboarding cli, a web worker hashes on password_pool so it can't take
+    every core from the requests
+    """
+    rounds = rounds or password_pool.rounds
+    passwords = list(passwords)
+
+    if len(passwords) < 2:
+        return [hash_password(x, rounds) for x in passwords]
+
+    workers = min(workers or os.cpu_count() or 1, len(passwords))
+    chunksize = max(1, len(passwords) // (workers * 4))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(hash_password, passwords, repeat(rounds), chunksize=chunksize))
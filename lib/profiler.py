@@ -0,0 +1,240 @@
+"""
+on demand profiling in a running worker, armed from the admin endpoints
+
+  - the next N requests whose path matches a pattern, with cProfile (a
+    .pstats file per request, for snakeviz / python -m pstats) or sampled
+    (a .collapsed file per request)
+  - the whole worker sampled for T seconds (every threads stacks, into
+    one .collapsed file)
+
+the sampling is a thread reading sys._current_frames() every interval, the
+.collapsed files are one 'frame;frame;frame count' line per stack, the input
+flamegraph.pl & speedscope take. files go in PROFILE_DIR
+
+it's per process, so with several workers only the one that took the admin
+request is armed. disarmed, the only cost is a check in before_request
+"""
+
+import os
+import re
+import sys
+import time
+import cProfile
+import threading
+from collections import Counter
+
+from flask import g, request
+
+import config.settings as settings
+
+modes = ['cprofile', 'sample']
+
+# shorter than this the sampler thread would keep the gil more than the app
+min_interval = 0.001
+
+_safe_name = re.compile(r'^[\w.-]+$')
+
+
+class ProfilerError(Exception):
+    pass
+
+
+# the app files show relative to here in the stacks
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+
+def frame_name(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(root):
+        filename = filename[len(root):]
+    return '{}:{}'.format(filename, code.co_name)
+
+
+class StackSampler():
+    """
+    counts the stacks of thread_ids (or all the other threads) every interval
+    """
+    def __init__(self, interval=0.005, thread_ids=None):
+        self.interval = max(interval, min_interval)
+        self.thread_ids = thread_ids
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {x.ident: x.name for x in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if self.thread_ids and thread_id not in self.thread_ids:
+                    continue
+                if names.get(thread_id, '').startswith('stack-sampler'):
+                    # this one, and the timer of a worker sample
+                    continue
+
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return ''.join('{} {}\n'.format(stack, count) for stack, count in self.stacks.most_common())
+
+
+class Profiler():
+    def __init__(self, directory):
+        self.directory = directory
+        self.armed = False
+        self._lock = threading.Lock()
+        self._pattern = None
+        self._remaining = 0
+        self._mode = None
+        self._sampler = None
+        self._sample_until = None
+
+    def init_app(self, app):
+        @app.before_request
+        def start_request_profile():
+            if self.armed:
+                self._start_request()
+
+        @app.teardown_request
+        def finish_request_profile(exception=None):
+            profile = g.pop('profile', None)
+            if profile is not None:
+                self._finish_request(profile)
+
+    def arm(self, pattern, count, mode='cprofile'):
+        """
+        profile the next count requests with a path matching the pattern (a
+        regex, searched), count 0 disarms
+        """
+        if mode not in modes:
+            raise ProfilerError('mode should be one of {}'.format(', '.join(modes)))
+        if count > settings.PROFILE_MAX_REQUESTS:
+            raise ProfilerError('at most {} requests'.format(settings.PROFILE_MAX_REQUESTS))
+        try:
+            pattern = re.compile(pattern)
+        except re.error as e:
+            raise ProfilerError('bad pattern: {}'.format(e))
+
+        with self._lock:
+            self._pattern = pattern
+            self._remaining = count
+            self._mode = mode
+            self.armed = count > 0
+
+    def _start_request(self):
+        with self._lock:
+            if self._remaining <= 0 or not self._pattern.search(request.path):
+                return
+            self._remaining -= 1
+            self.armed = self._remaining > 0
+            mode = self._mode
+
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            # finer than a worker sample, most requests are over in well under a second
+            profiler = StackSampler(interval=0.001, thread_ids={threading.get_ident()})
+            profiler.start()
+
+        g.profile = (profiler, request.endpoint or 'unknown', time.time())
+
+    def _finish_request(self, profile):
+        profiler, endpoint, started = profile
+        name = self._file_name(endpoint, started)
+
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            profiler.dump_stats(self._path(name + '.pstats'))
+        else:
+            profiler.stop()
+            self._write(name + '.collapsed', profiler.collapsed())
+
+    def sample(self, seconds, interval=0.005):
+        """
+        sample every thread in the worker for seconds, in the background
+        => the file name it'll be written to
+        """
+        if not 0 < seconds <= settings.PROFILE_MAX_SECONDS:
+            raise ProfilerError('seconds should be between 0 and {}'.format(settings.PROFILE_MAX_SECONDS))
+        if not min_interval <= interval <= 1:
+            raise ProfilerError('interval should be between {} and 1'.format(min_interval))
+
+        with self._lock:
+            if self._sampler is not None:
+                raise ProfilerError('already sampling')
+            self._sampler = StackSampler(interval=interval)
+            self._sample_until = time.time() + seconds
+
+        name = self._file_name('worker', time.time()) + '.collapsed'
+        sampler = self._sampler
+        sampler.start()
+
+        def finish():
+            time.sleep(seconds)
+            sampler.stop()
+            try:
+                self._write(name, sampler.collapsed())
+            finally:
+                with self._lock:
+                    self._sampler = None
+                    self._sample_until = None
+
+        threading.Thread(target=finish, name='stack-sampler-timer', daemon=True).start()
+        return name
+
+    def _file_name(self, label, started):
+        return '{}-{}-{}-{}'.format(time.strftime('%Y%m%d-%H%M%S', time.localtime(started)),
+                                    '{:03d}'.format(int(started * 1000) % 1000), os.getpid(), label)
+
+    def _path(self, name):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, name)
+
+    def _write(self, name, text):
+        with open(self._path(name), 'w') as f:
+            f.write(text)
+
+    def path(self, name):
+        """
+        the full path of a profile file, or None if it isn't one
+        """
+        if not _safe_name.match(name) or not name.endswith(('.pstats', '.collapsed')):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted((x for x in os.listdir(self.directory) if x.endswith(('.pstats', '.collapsed'))), reverse=True)
+
+    def status(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'armed': self.armed,
+                'pattern': self._pattern.pattern if self._pattern else None,
+                'remaining': self._remaining,
+                'mode': self._mode,
+                'sampling_until': self._sample_until,
+            }
+
+
+profiler = Profiler(settings.PROFILE_DIR)
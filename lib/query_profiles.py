@@ -0,0 +1,42 @@
+"""
+the loader options for the hot queries, per endpoint
+
+the large text columns (Company.description, Product.description &
+ImpactAnswer.text) are deferred on the models, so they are only fetched
+where a profile here undefers them, or one at a time when something reads
+them anyway. Impact.option_text is on CatalogImpact, joined in where it's
+used. tests/query_profiles.py checks the columns each of these loads
+"""
+
+from sqlalchemy.orm import undefer, load_only, defaultload, joinedload
+
+from models import Company, Benchmark, Product, Impact
+
+
+# /admin/company, the list shows the company description
+admin_companies = (
+    undefer(Company.description),
+)
+
+# /investor/reports, shows the company & product descriptions,
+# the options carry over to the lazy loads of b.company & b.products
+# (company is a backref, so by name, it isn't on Benchmark until the mappers are set up)
+investor_reports = (
+    defaultload('company').undefer('description'),
+    defaultload(Benchmark.products).undefer(Product.description),
+)
+
+# /product & /product/edit/<id>, show the product description
+products = (
+    undefer(Product.description),
+)
+
+# impacts that are only counted for a progress %, see get_impact_percent_complete_stats
+impact_progress = (
+    load_only(Impact.id, Impact.active, Impact.answers_json),
+)
+
+# the impact list, calculate & the reports show the option text
+impact_text = (
+    joinedload(Impact.catalog_impact),
+)
@@ -0,0 +1,187 @@
+"""
+per request sql query counts & time, from the sqlalchemy engine events
+
+statements are grouped by shape (the sql with the literals and IN lists
+folded), the same shape run N_PLUS_ONE_THRESHOLD or more times in one
+request is flagged as a probable n+1, ie a lazy relationship loaded in a loop
+
+in DEBUG the counts go in the response headers (X-Query-Count, X-Query-Time,
+X-Query-N-Plus-One & Server-Timing, so they show in the browser dev tools),
+outside it requests over QUERY_STATS_LOG_QUERIES queries or with an n+1 are
+logged as a json line. tests can put a budget on a block with
+
+    with assert_max_queries(10):
+        self.test_client_app.get('/product', headers=headers)
+"""
+
+import re
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_in_list = re.compile(r'\(\s*\?(\s*,\s*\?)+\s*\)')
+_number = re.compile(r'\b\d+(\.\d+)?\b')
+_string = re.compile(r"'(?:[^']|'')*'")
+_whitespace = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """
+    the statement with literals as ? and IN (?, ?, ...) as IN (?...), so the
+    same query for different rows comes out the same
+    """
+    shape = statement.replace('%s', '?')
+    shape = _string.sub('?', shape)
+    shape = _number.sub('?', shape)
+    shape = _in_list.sub('(?...)', shape)
+    return _whitespace.sub(' ', shape).strip()
+
+
+class QueryStats():
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.queries += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def n_plus_one(self, threshold):
+        """
+        [(shape, count)] of the shapes run threshold or more times, most first
+        """
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def as_dict(self, threshold):
+        return {
+            'queries': self.queries,
+            'query_ms': round(self.seconds * 1000, 2),
+            'n_plus_one': [{'statement': shape[:300], 'count': count} for shape, count in self.n_plus_one(threshold)],
+        }
+
+
+class QueryStatsCollector():
+    """
+    records every statement the app runs into the current requests
+    QueryStats (g.query_stats) and any capture() blocks on the thread
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._listening = False
+        self.n_plus_one_threshold = 5
+        self.headers = False
+        self.log_queries = 50
+
+    def init_app(self, app, headers=False, n_plus_one_threshold=5, log_queries=50):
+        self.headers = headers
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.log_queries = log_queries
+        self.listen()
+
+        @app.before_request
+        def start_query_stats():
+            g.query_stats = QueryStats()
+
+        @app.after_request
+        def finish_query_stats(response):
+            stats = g.pop('query_stats', None)
+            if stats is not None:
+                self.report(stats, response)
+            return response
+
+    def listen(self):
+        # on the class, so it covers the engines made later (the tests sqlite ones)
+        if self._listening:
+            return
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        self._listening = True
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # per execution, as in lib/slow_queries
+        if context is not None:
+            context._query_stats_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_query_stats_start', None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+
+        if has_app_context():
+            stats = g.get('query_stats')
+            if stats is not None:
+                stats.record(statement, seconds)
+
+        for stats in getattr(self._local, 'captures', ()):
+            stats.record(statement, seconds)
+
+    @contextmanager
+    def capture(self):
+        """
+        => the QueryStats of everything run on this thread in the block
+        """
+        self.listen()
+        stats = QueryStats()
+        if not hasattr(self._local, 'captures'):
+            self._local.captures = []
+
+        self._local.captures.append(stats)
+        try:
+            yield stats
+        finally:
+            self._local.captures.remove(stats)
+
+    def report(self, stats, response):
+        n_plus_one = stats.n_plus_one(self.n_plus_one_threshold)
+
+        if self.headers:
+            response.headers['X-Query-Count'] = str(stats.queries)
+            response.headers['X-Query-Time'] = '{:.2f}'.format(stats.seconds * 1000)
+            response.headers['Server-Timing'] = 'db;dur={:.2f};desc="{} queries"'.format(stats.seconds * 1000, stats.queries)
+            if n_plus_one:
+                shape, count = n_plus_one[0]
+                response.headers['X-Query-N-Plus-One'] = '{} shapes, {}x {}'.format(len(n_plus_one), count, shape[:200])
+        elif n_plus_one or stats.queries > self.log_queries:
+            info = stats.as_dict(self.n_plus_one_threshold)
+            info.update({
+                'event': 'query_stats',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+            })
+            logger.warning(json.dumps(info, sort_keys=True))
+
+
+query_stats = QueryStatsCollector()
+
+
+@contextmanager
+def assert_max_queries(count, check_n_plus_one=False):
+    """
+    fails the block when it runs more than count queries, or with
+    check_n_plus_one when a statement shape repeats N_PLUS_ONE_THRESHOLD or
+    more times
+    """
+    with query_stats.capture() as stats:
+        yield stats
+
+    if stats.queries > count:
+        raise AssertionError('{} queries, expected at most {}:\n{}'.format(
+            stats.queries, count, '\n'.join('{}x {}'.format(n, shape) for shape, n in stats.shapes.most_common())))
+
+    repeated = stats.n_plus_one(query_stats.n_plus_one_threshold)
+    if check_n_plus_one and repeated:
+        raise AssertionError('probable n+1:\n{}'.format('\n'.join('{}x {}'.format(n, shape) for shape, n in repeated)))
@@ -0,0 +1,193 @@
+"""
+the slow query log, statements over SLOW_QUERY_MS logged as a json line with
+
+  - the statement & its bound parameters (SLOW_QUERY_PARAMS=0 leaves them out)
+  - the request id, method, path & endpoint (ie the view) when in a request
+  - where in the app it was run from, the innermost app frames
+  - for a SLOW_QUERY_EXPLAIN_RATE sample of the selects, the EXPLAIN (EXPLAIN
+    QUERY PLAN on sqlite), run on the same connection straight after
+
+they go to the lib.slow_queries logger, and with SLOW_QUERY_LOG set to a
+rotating file of its own instead (each worker rolls it over on its own, so a
+few lines can be lost around a rollover with several workers)
+
+every request gets an id, the X-Request-Id header when the proxy sets one
+(nginx $request_id) or a new one, and sends it back as X-Request-Id
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+_skip = (os.path.abspath(__file__), os.sep + 'site-packages' + os.sep)
+
+MAX_PARAMS = 50
+MAX_PARAM_LENGTH = 200
+
+
+def request_id():
+    """
+    the current requests id, None outside one
+    """
+    if not has_request_context():
+        return None
+    return g.get('request_id')
+
+
+def app_frames(limit=3):
+    """
+    ['file:line function'] of the innermost frames in the app code, the
+    sqlalchemy & flask ones skipped
+    """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < limit:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and not any(x in filename for x in _skip):
+            frames.append('{}:{} {}'.format(filename[len(root):], frame.f_lineno, frame.f_code.co_name))
+        frame = frame.f_back
+    return frames
+
+
+def format_param(value):
+    text = repr(value)
+    if len(text) > MAX_PARAM_LENGTH:
+        text = text[:MAX_PARAM_LENGTH] + '...'
+    return text
+
+
+def format_params(parameters, executemany):
+    if executemany:
+        # the first set, most batches are the same statement for many rows
+        return {'first': format_params(parameters[0], False) if parameters else None, 'sets': len(parameters)}
+    if isinstance(parameters, dict):
+        return {key: format_param(value) for key, value in list(parameters.items())[:MAX_PARAMS]}
+    return [format_param(x) for x in list(parameters or ())[:MAX_PARAMS]]
+
+
+class SlowQueryLog():
+    def __init__(self):
+        self.threshold = 0.0
+        self.explain_rate = 0.0
+        self.params = True
+        self._listening = False
+        self._file_handler = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, threshold_ms=0, explain_rate=0.0, params=True, path=None,
+                 max_bytes=10 * 1024 * 1024, backups=5):
+        """
+        threshold_ms 0 turns the log off (the request ids are still set)
+        """
+        self.threshold = threshold_ms / 1000
+        self.explain_rate = explain_rate
+        self.params = params
+        if path:
+            self.log_to(path, max_bytes, backups)
+        if threshold_ms:
+            self.listen()
+
+        @app.before_request
+        def start_request_id():
+            g.request_id = request.headers.get('X-Request-Id', '')[:64] or uuid.uuid4().hex
+
+        @app.after_request
+        def send_request_id(response):
+            if g.get('request_id'):
+                response.headers['X-Request-Id'] = g.request_id
+            return response
+
+    def log_to(self, path, max_bytes=10 * 1024 * 1024, backups=5):
+        """
+        log to a rotating file rather than on through the logging setup
+        """
+        with self._lock:
+            if self._file_handler is not None:
+                logger.removeHandler(self._file_handler)
+                self._file_handler.close()
+
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+            self._file_handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(self._file_handler)
+            logger.setLevel(logging.WARNING)
+            logger.propagate = False
+
+    def listen(self):
+        # on the class like lib/query_stats, so it covers the engines made later
+        if self._listening:
+            return
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        self._listening = True
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # on the execution context rather than conn.info, a query that raises never
+        # gets its after_cursor_execute and would leave its start behind on the connection
+        if context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_slow_query_start', None)
+        if start is None:
+            # a default/sequence run without a context, not timed
+            return
+        seconds = time.perf_counter() - start
+        if self.threshold and seconds >= self.threshold:
+            self.log(conn, statement, parameters, executemany, seconds)
+
+    def log(self, conn, statement, parameters, executemany, seconds):
+        info = {
+            'event': 'slow_query',
+            'ms': round(seconds * 1000, 2),
+            'statement': statement,
+            'location': app_frames(),
+        }
+        if self.params:
+            info['params'] = format_params(parameters, executemany)
+
+        if has_request_context():
+            info.update({
+                'request_id': request_id(),
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+            })
+
+        if not executemany and statement.lstrip()[:6].upper() == 'SELECT' and random.random() < self.explain_rate:
+            info['explain'] = self.explain(conn, statement, parameters)
+
+        logger.warning(json.dumps(info, sort_keys=True, default=str))
+
+    def explain(self, conn, statement, parameters):
+        """
+        the plan rows, on a dbapi cursor of its own so it doesn't go through
+        the engine events (or disturb the statements results)
+        """
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            columns = [x[0] for x in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception as e:
+            return {'error': str(e)}
+        finally:
+            cursor.close()
+
+
+slow_queries = SlowQueryLog()
@@ -0,0 +1,234 @@
+"""
+synthetic data for running & benchmarking the app locally, eg against sqlite
+
+    DATABASE_URI=sqlite:////tmp/ibt.db flask create-db
+    DATABASE_URI=sqlite:////tmp/ibt.db flask generate-data --companies 50
+
+companies get a benchmark, a user, products and break evens, the products
+facets, properties, impacts & answers are all picked from the loaded csv
+catalog (the impacts worked out the same way as saving the product setup
+does), with a seeded random so the same arguments give the same data
+"""
+
+import random
+import calendar
+
+from flask import current_app
+
+from app import db
+from models import User, Company, Benchmark, Product, ProductFacet, ProductProperty,\
+    ProductPropertyAnswer, Impact, ImpactSdg, BreakEven, CatalogImpact
+from lib.impact import surveys, get_property_actions, assign_automatic_impacts,\
+    merge_duplicate_impacts, get_hidden_property_options
+from lib.passwords import hash_password
+
+TESTER_EMAIL = 'tester@futurefitbusiness.org'
+
+words = ['energy', 'water', 'community', 'waste', 'solar', 'circular', 'supply', 'health',
+         'training', 'local', 'recycled', 'clean', 'efficient', 'access', 'education', 'fair']
+industry_types = ['Energy', 'Agriculture', 'Manufacturing', 'Retail', 'Technology', 'Finance', 'Health']
+# the frontend sends these as 'name (short name)'
+business_models = ['Business to Business (B2B)', 'Business to Consumer (B2C)', 'Business to Government (B2G)']
+months = calendar.month_name[1:]
+
+
+def sentence(rng, count):
+    return ' '.join(rng.choice(words) for _ in range(count)).capitalize() + '.'
+
+
+def is_visible(question, answers):
+    """
+    the same logic as the percent complete stats, every non empty logic
+    group needs one of its values in the answers
+    """
+    values = set(answers.values())
+    return all(not logic or values.intersection(logic) for logic in question['logic'])
+
+
+def answer_questions(rng, questions):
+    """
+    {question value: answer} for a catalog questionnaire, walked in order so
+    only the questions visible given the earlier answers get answered
+    """
+    answers = {}
+    for question in questions:
+        if 'number' not in question or not is_visible(question, answers):
+            continue
+
+        if question.get('options'):
+            answers[question['value']] = rng.choice(question['options'])['value']
+        elif question['type'] == 'number':
+            answers[question['value']] = str(rng.randint(1, 100000))
+        else:
+            answers[question['value']] = sentence(rng, rng.randint(3, 30))
+
+    return answers
+
+
+def pick_options(rng, options, hidden, chance=0.4):
+    picked = []
+    for option in options:
+        if option['value'] in hidden or rng.random() >= chance:
+            continue
+        picked.append(option['value'])
+        picked += pick_options(rng, option.get('options') or (), hidden, chance)
+    return picked
+
+
+def pick_facets(rng):
+    facets = []
+    for question in surveys.facets['questions']:
+        if question.get('options'):
+            facets += [x['value'] for x in question['options'] if rng.random() < 0.3]
+    return facets
+
+
+def pick_properties(rng, facets):
+    """
+    {'X-1.n': [answer codes]}, in the shape save_setup builds from the form
+    """
+    hidden = set(get_hidden_property_options(facets))
+    questions = surveys.properties['questions']
+    areas = [x['value'] for x in questions[1]['options']]
+
+    properties = {}
+    for area in rng.sample(areas, rng.randint(1, 3)):
+        answers = []
+        for question in questions[2:]:
+            if question['type'] == 'checkbox' and (area,) in question['logic']:
+                answers += pick_options(rng, question['options'], hidden)
+        properties[area] = answers
+
+    return properties
+
+
+def add_impacts(rng, product, facets, properties, fill):
+    actions = []
+    for property_code, answers in properties.items():
+        actions += get_property_actions(sorted(answers), property_code, facets)
+
+    impacts = merge_duplicate_impacts(assign_automatic_impacts(actions, facets))
+    catalog_ids = CatalogImpact.intern(impacts.keys())
+    questions = surveys.pp_action['questions'][1:]
+
+    for key, action in impacts.items():
+        impact = Impact(
+            product=product,
+            catalog_impact_id=catalog_ids[key],
+            property_code=action['property_code'],
+            option_code=action['option_code'],
+            pp_action=action['pp'],
+            # a few marked not applicable
+            active=rng.random() > 0.1)
+        impact.sdgs = [ImpactSdg(sdg=x) for x in action['sdgs'] if x]
+        db.session.add(impact)
+
+        if rng.random() < fill:
+            data = answer_questions(rng, questions)
+            text = {}
+            for question in questions:
+                if question.get('type') == 'text area' and question.get('value') in data:
+                    text[question['value']] = data[question['value']]
+                    data[question['value']] = None
+            db.session.flush()
+            impact.set_answers(data, text)
+
+    return len(impacts)
+
+
+def add_product(rng, benchmark, fill):
+    answers = answer_questions(rng, surveys.add_edit_product['questions'])
+    product = Product(
+        benchmark=benchmark,
+        code='{:013x}'.format(rng.getrandbits(52)),
+        name='{} {}'.format(rng.choice(words), rng.choice(words)).title(),
+        description=answers.get('AE-2'),
+        revenue_type=answers.get('AE-3'),
+        revenue=float(answers['AE-4']) if 'AE-4' in answers else None,
+        cost=float(answers['AE-5']) if 'AE-5' in answers else None,
+        stage=answers.get('AE-6'),
+        known_costs=answers.get('AE-7'))
+
+    facets = pick_facets(rng)
+    properties = pick_properties(rng, facets)
+
+    product.facets = [ProductFacet(code=x) for x in facets]
+    product.product_properties = [
+        ProductProperty(code=code, answers=[ProductPropertyAnswer(code=x) for x in answers])
+        for code, answers in properties.items()
+    ]
+    db.session.add(product)
+
+    return add_impacts(rng, product, facets, properties, fill)
+
+
+def add_break_evens(rng, benchmark, fill):
+    for code in surveys.be_tags:
+        be = BreakEven(benchmark=benchmark, code=code)
+        db.session.add(be)
+
+        if rng.random() < fill:
+            answers = answer_questions(rng, surveys.be[code]['questions'])
+            be.applicable = rng.random() > 0.2
+            be.progress_score = round(rng.uniform(0, 100), 1)
+            be.awareness_score = round(rng.uniform(0, 100), 1)
+            db.session.flush()
+            be.set_answers(answers)
+
+
+def generate_data(companies=10, products=5, fill=0.7, seed=1, tester=True, password='123456', min_products=1):
+    """
+    add the companies (each with min_products to products products, fill is
+    the chance of an impact/break even being answered), tester adds the tests
+    tester@futurefitbusiness.org admin to the first one if it isn't there
+
+    => counts of what was added
+    """
+    rng = random.Random(seed)
+    counts = {'companies': 0, 'users': 0, 'products': 0, 'impacts': 0, 'break_evens': 0}
+
+    # hashed once, the users share it
+    pw_hash = hash_password(password, current_app.config['BCRYPT_LOG_ROUNDS'])
+    # a run on top of earlier ones gets new emails
+    start = Company.query.count()
+
+    try:
+        for n in range(start, start + companies):
+            company = Company(
+                name='{} {}'.format(rng.choice(words).title(), rng.choice(['Ltd', 'Co', 'Group', 'Inc'])),
+                intro_complete=True,
+                description=sentence(rng, rng.randint(10, 60)),
+                industry_type=rng.choice(industry_types),
+                business_model=rng.choice(business_models))
+            month = rng.randrange(len(months))
+            benchmark = Benchmark(
+                company=company,
+                year=str(rng.randint(2018, 2021)),
+                month_start=months[month],
+                month_end=months[month - 1],
+                total_revenue=rng.randint(10000, 10000000),
+                total_expenses=rng.randint(10000, 10000000))
+            user = User(email='user{}@example.com'.format(n), password=pw_hash, first='User', last=str(n),
+                        welcome=True, company=company, benchmark=benchmark)
+            db.session.add_all([company, benchmark, user])
+
+            for _ in range(rng.randint(min_products, products)):
+                counts['impacts'] += add_product(rng, benchmark, fill)
+                counts['products'] += 1
+
+            add_break_evens(rng, benchmark, fill)
+            counts['break_evens'] += len(surveys.be_tags)
+            counts['companies'] += 1
+            counts['users'] += 1
+
+            if tester and n == start and not User.query.filter_by(email=TESTER_EMAIL).count():
+                db.session.add(User(email=TESTER_EMAIL, password=pw_hash, first='tester', last='tester',
+                                    welcome=True, admin=True, investor=True, company=company, benchmark=benchmark))
+                counts['users'] += 1
+
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return counts
@@ -0,0 +1,156 @@
+"""
+timers for the hot paths, aggregated into a histogram per span name
+
+    with span('report.pp.load'):
+        products = pre_load_products_and_impacts(benchmark)
+
+    @timed('impact.get_property_actions')
+    def get_property_actions(...):
+
+requests are timed too, as request.<endpoint>. /admin/metrics gives the
+histograms in the prometheus text format. they're per process, and a scrape
+through gunicorn gets whichever worker answers, so every series has a
+worker="<pid>" label: each worker's counters only go up, sum them by span
+in the queries, ie sum by (span) (rate(ibt_span_seconds_count[5m])). a
+worker that's recycled starts new series
+
+with TIMING off span() hands back one shared do nothing context manager and
+timed() leaves the function as it is, so there's nothing to pay for it
+"""
+
+import os
+import time
+import bisect
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+from flask import g, request
+
+import config.settings as settings
+
+# seconds, from 0.1ms as most of the lib/impact spans are well under 5ms
+buckets = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram():
+    def __init__(self):
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class Timings():
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+    def snapshot(self):
+        """
+        {name: (cumulative bucket counts, count, sum)}
+        """
+        with self._lock:
+            data = {}
+            for name, histogram in self.histograms.items():
+                cumulative, total = [], 0
+                for count in histogram.counts:
+                    total += count
+                    cumulative.append(total)
+                data[name] = (cumulative, histogram.count, histogram.sum)
+            return data
+
+    def prometheus(self, metric='ibt_span_seconds'):
+        lines = [
+            '# HELP {} Time spent in the timed code spans and requests.'.format(metric),
+            '# TYPE {} histogram'.format(metric),
+        ]
+        worker = os.getpid()
+        for name, (cumulative, count, total) in sorted(self.snapshot().items()):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            for bound, value in zip(buckets + ('+Inf',), cumulative):
+                lines.append('{}_bucket{{span="{}",worker="{}",le="{}"}} {}'.format(metric, label, worker, bound, value))
+            lines.append('{}_sum{{span="{}",worker="{}"}} {}'.format(metric, label, worker, repr(total)))
+            lines.append('{}_count{{span="{}",worker="{}"}} {}'.format(metric, label, worker, count))
+
+        return '\n'.join(lines) + '\n'
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+
+        @app.before_request
+        def start_request_timing():
+            g.request_started = time.perf_counter()
+
+        @app.teardown_request
+        def finish_request_timing(exception=None):
+            started = g.pop('request_started', None)
+            if started is not None:
+                self.observe('request.{}'.format(request.endpoint), time.perf_counter() - started)
+
+
+timings = Timings(enabled=settings.TIMING)
+
+
+class _NullSpan():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+@contextmanager
+def _span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.observe(name, time.perf_counter() - started)
+
+
+def span(name):
+    if not timings.enabled:
+        return _null_span
+    return _span(name)
+
+
+def timed(name):
+    """
+    decorator, the function is timed as the span name
+    """
+    def decorator(fn):
+        if not timings.enabled:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings.observe(name, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
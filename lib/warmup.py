@@ -0,0 +1,61 @@
+"""
+getting a pre fork server ready before it takes traffic, see config/gunicorn.py
+
+in the master (with preload_app), once, so the workers share the result copy
+on write:
+  - the csv catalog is parsed & validated and its survey payloads serialised
+    (with their gzip & brotli versions)
+  - the url map is sorted
+
+in each worker, before it accepts connections:
+  - the connections inherited from the master are dropped & the pool filled
+  - one request to / goes through the app, for the before_first_request hooks
+    (ie the catalog watcher, which is per process)
+"""
+
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def warm_master(app):
+    from lib.catalog import catalog
+
+    start = time.time()
+    surveys = catalog.current()
+    surveys.payloads.warm()
+    app.url_map.update()
+
+    logger.info('catalog %s loaded and %s payloads built in %.2fs', surveys.version,
+                len(surveys.payloads.names()), time.time() - start)
+
+
+def pool_connections(engine, threads):
+    # the pool (QueuePool on mysql) keeps this many, more than the threads won't be used at once
+    size = getattr(engine.pool, 'size', None)
+    return max(1, min(threads, size())) if size else 1
+
+
+def warm_worker(app, db, threads=1):
+    """
+    => the number of connections opened
+    """
+    with app.app_context():
+        engine = db.engine
+        # never share a socket with the master or another worker
+        engine.dispose()
+
+        connections = []
+        try:
+            for _ in range(pool_connections(engine, threads)):
+                connection = engine.connect()
+                connection.execute('SELECT 1')
+                connections.append(connection)
+        finally:
+            # back into the pool, open
+            for connection in connections:
+                connection.close()
+
+    app.test_client().get('/')
+    return len(connections)
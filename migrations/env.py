@@ -79,11 +79,17 @@ def run_migrations_online():
     )
 
     with connectable.connect() as connection:
+        configure_args = dict(current_app.extensions['migrate'].configure_args)
+        if connection.dialect.name == 'sqlite':
+            # sqlite can't alter or drop columns, autogenerate the migrations
+            # as table copies (batch_alter_table) so they run on it too
+            configure_args.setdefault('render_as_batch', True)
+
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
-            **current_app.extensions['migrate'].configure_args
+            **configure_args
         )
 
         with context.begin_transaction():
@@ -0,0 +1,133 @@
+"""empty message
+
+Revision ID: 1e6f0b3c8d27
+Revises: 5b0e7c2d9a41
+Create Date: 2026-10-19 15:31:48.112604
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1e6f0b3c8d27'
+down_revision = '5b0e7c2d9a41'
+branch_labels = None
+depends_on = None
+
+# impacts/break evens per batch
+batch_size = 2000
+
+impact = sa.table('impact',
+    sa.column('id', sa.Integer),
+    sa.column('answers_json', sa.Text),
+)
+impact_answer = sa.table('impact_answer',
+    sa.column('id', sa.Integer),
+    sa.column('impact_id', sa.Integer),
+    sa.column('number', sa.String),
+    sa.column('data', sa.String),
+    sa.column('text', sa.Text),
+)
+break_even = sa.table('break_even',
+    sa.column('id', sa.Integer),
+    sa.column('answers_json', sa.Text),
+)
+break_even_answer = sa.table('break_even_answer',
+    sa.column('id', sa.Integer),
+    sa.column('break_even_id', sa.Integer),
+    sa.column('code', sa.String),
+    sa.column('data', sa.String),
+)
+
+
+def dumps(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+def id_batches(connection, table):
+    last_id = connection.execute(sa.select([sa.func.max(table.c.id)])).scalar() or 0
+    for start in range(0, last_id + 1, batch_size):
+        yield start, start + batch_size
+
+
+def upgrade():
+    op.add_column('impact', sa.Column('answers_json', sa.Text(), nullable=True))
+    op.add_column('break_even', sa.Column('answers_json', sa.Text(), nullable=True))
+
+    connection = op.get_bind()
+    update_impact = impact.update().where(impact.c.id == sa.bindparam('_id')).\
+        values(answers_json=sa.bindparam('_answers_json'))
+    update_break_even = break_even.update().where(break_even.c.id == sa.bindparam('_id')).\
+        values(answers_json=sa.bindparam('_answers_json'))
+
+    for start, end in id_batches(connection, impact):
+        answers = {}
+        rows = connection.execute(sa.select([impact_answer]).
+                                  where(impact_answer.c.impact_id >= start).
+                                  where(impact_answer.c.impact_id < end).
+                                  order_by(impact_answer.c.id))
+        for row in rows:
+            answer = answers.setdefault(row.impact_id, {'data': {}, 'text': {}})
+            answer['data'][row.number] = row.data
+            if row.text:
+                answer['text'][row.number] = row.text
+
+        if answers:
+            connection.execute(update_impact, [{'_id': k, '_answers_json': dumps(v)} for k, v in answers.items()])
+
+    for start, end in id_batches(connection, break_even):
+        answers = {}
+        rows = connection.execute(sa.select([break_even_answer]).
+                                  where(break_even_answer.c.break_even_id >= start).
+                                  where(break_even_answer.c.break_even_id < end).
+                                  order_by(break_even_answer.c.id))
+        for row in rows:
+            answers.setdefault(row.break_even_id, {})[row.code] = row.data
+
+        if answers:
+            connection.execute(update_break_even, [{'_id': k, '_answers_json': dumps(v)} for k, v in answers.items()])
+
+    # the rest have no answers
+    connection.execute(impact.update().where(impact.c.answers_json.is_(None)).
+                       values(answers_json=dumps({'data': {}, 'text': {}})))
+    connection.execute(break_even.update().where(break_even.c.answers_json.is_(None)).
+                       values(answers_json=dumps({})))
+
+
+def downgrade():
+    # put back the rows for anything only saved as json (ANSWER_STORAGE=json),
+    # ones that still have rows keep them, even if the json is newer
+    connection = op.get_bind()
+
+    for start, end in id_batches(connection, impact):
+        with_rows = set(x for (x,) in connection.execute(
+            sa.select([impact_answer.c.impact_id]).distinct().
+            where(impact_answer.c.impact_id >= start).where(impact_answer.c.impact_id < end)))
+        rows = []
+        for row in connection.execute(sa.select([impact]).where(impact.c.id >= start).where(impact.c.id < end)):
+            if row.id in with_rows or not row.answers_json:
+                continue
+            answers = json.loads(row.answers_json)
+            for number, data in answers['data'].items():
+                rows.append({'impact_id': row.id, 'number': number, 'data': data, 'text': answers['text'].get(number)})
+        if rows:
+            connection.execute(impact_answer.insert(), rows)
+
+    for start, end in id_batches(connection, break_even):
+        with_rows = set(x for (x,) in connection.execute(
+            sa.select([break_even_answer.c.break_even_id]).distinct().
+            where(break_even_answer.c.break_even_id >= start).where(break_even_answer.c.break_even_id < end)))
+        rows = []
+        for row in connection.execute(sa.select([break_even]).where(break_even.c.id >= start).where(break_even.c.id < end)):
+            if row.id in with_rows or not row.answers_json:
+                continue
+            for code, data in json.loads(row.answers_json).items():
+                rows.append({'break_even_id': row.id, 'code': code, 'data': data})
+        if rows:
+            connection.execute(break_even_answer.insert(), rows)
+
+    op.drop_column('break_even', 'answers_json')
+    op.drop_column('impact', 'answers_json')
@@ -0,0 +1,24 @@
+"""empty message
+
+Revision ID: 4a7d2c9e1b63
+Revises: 8c3d5f1a7e90
+Create Date: 2026-10-19 17:20:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a7d2c9e1b63'
+down_revision = '8c3d5f1a7e90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('last_write_at', sa.Float(precision=53), nullable=True))
+
+
+def downgrade():
+    op.drop_column('user', 'last_write_at')
@@ -0,0 +1,62 @@
+"""empty message
+
+Revision ID: 5b0e7c2d9a41
+Revises: c41f2a9be7d3
+Create Date: 2026-10-19 14:02:17.530981
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from lib.blob_store import get_blob_store
+from lib.logos import make_thumbnail, logo_content_type
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0e7c2d9a41'
+down_revision = 'c41f2a9be7d3'
+branch_labels = None
+depends_on = None
+
+
+company = sa.table('company',
+    sa.column('id', sa.Integer),
+    sa.column('logo', sa.LargeBinary),
+    sa.column('logo_hash', sa.String),
+    sa.column('logo_thumb_hash', sa.String),
+    sa.column('logo_file_extension', sa.String),
+)
+
+
+def upgrade():
+    op.add_column('company', sa.Column('logo_hash', sa.String(length=64), nullable=True))
+    op.add_column('company', sa.Column('logo_thumb_hash', sa.String(length=64), nullable=True))
+
+    # move the logos out to the blob store
+    connection = op.get_bind()
+    store = get_blob_store()
+    rows = connection.execute(sa.select([company.c.id, company.c.logo, company.c.logo_file_extension]).
+                              where(company.c.logo.isnot(None))).fetchall()
+    for row in rows:
+        logo_hash = store.put(row.logo, logo_content_type(row.logo_file_extension))
+        thumb = make_thumbnail(row.logo)
+        thumb_hash = store.put(thumb, 'image/png') if thumb else None
+        connection.execute(company.update().where(company.c.id == row.id).
+                           values(logo_hash=logo_hash, logo_thumb_hash=thumb_hash))
+
+    op.drop_column('company', 'logo')
+
+
+def downgrade():
+    op.add_column('company', sa.Column('logo', sa.BLOB(), nullable=True))
+
+    connection = op.get_bind()
+    store = get_blob_store()
+    rows = connection.execute(sa.select([company.c.id, company.c.logo_hash]).
+                              where(company.c.logo_hash.isnot(None))).fetchall()
+    for row in rows:
+        connection.execute(company.update().where(company.c.id == row.id).
+                           values(logo=store.get(row.logo_hash)))
+
+    op.drop_column('company', 'logo_thumb_hash')
+    op.drop_column('company', 'logo_hash')
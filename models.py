@@ -1,15 +1,23 @@
-from app import db
+import json
+import hashlib
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db, settings
 
 
 class Company(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(80), nullable=False)
     intro_complete = db.Column(db.Boolean, nullable=False, default=False)
-    description = db.Column(db.Text, nullable=True)
+    # deferred, see lib/query_profiles
+    description = db.deferred(db.Column(db.Text, nullable=True))
     industry_type = db.Column(db.String(120), nullable=True)
     business_model = db.Column(db.String(120), nullable=True)
     hidden = db.Column(db.Boolean, nullable=False, default=False)
-    logo = db.Column(db.BLOB, nullable=True)
+    # the logo & its thumbnail are in the blob store (lib/blob_store), by hash
+    logo_hash = db.Column(db.String(64), nullable=True)
+    logo_thumb_hash = db.Column(db.String(64), nullable=True)
     logo_file_extension = db.Column(db.String(20), nullable=True)
 
     users = db.relationship('User', backref='company', lazy=True)
@@ -44,11 +52,41 @@ class BreakEven(db.Model):
     applicable = db.Column(db.Boolean, nullable=True)
 
     benchmark_id = db.Column(db.Integer, db.ForeignKey('benchmark.id'), nullable=True)
-    answers = db.relationship('BreakEvenAnswer', backref="break_even", cascade="all,delete", lazy='subquery')
+    # {code: data}, see ANSWER_STORAGE, None (the rows are read) for anything saved in rows mode
+    answers_json = db.Column(db.Text, nullable=True, default=lambda: None if settings.ANSWER_STORAGE == 'rows' else '{}')
+    answers = db.relationship('BreakEvenAnswer', backref="break_even", cascade="all,delete", lazy=True)
 
     def __repr__(self):
         return '<BreakEven %r>' % self.code
 
+    def get_answers(self):
+        """
+        {code: data}
+        """
+        if self.answers_json is not None and settings.ANSWER_STORAGE != 'rows':
+            return json.loads(self.answers_json)
+
+        return {x.code: x.data for x in self.answers}
+
+    def has_answers(self):
+        return len(self.get_answers()) > 0
+
+    def set_answers(self, answers):
+        """
+        replaces all the answers, for a saved break even
+        """
+        if settings.ANSWER_STORAGE != 'rows':
+            self.answers_json = json.dumps(answers, separators=(',', ':'))
+        else:
+            # the rows have it now, so a switch to dual or json reads those
+            self.answers_json = None
+
+        # json only leaves the old rows as they are, they're not read again
+        if settings.ANSWER_STORAGE != 'json':
+            BreakEvenAnswer.query.filter_by(break_even_id=self.id).delete(synchronize_session=False)
+            for code, data in answers.items():
+                db.session.add(BreakEvenAnswer(break_even_id=self.id, code=code, data=data))
+
 
 class BreakEvenAnswer(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -70,7 +108,7 @@ class Product(db.Model):
     cost = db.Column(db.Float, nullable=True)
     revenue_type = db.Column(db.String(20), nullable=True)
     revenue = db.Column(db.Float, nullable=True)
-    description = db.Column(db.Text, nullable=True)
+    description = db.deferred(db.Column(db.Text, nullable=True))
     known_costs = db.Column(db.String(20), nullable=True)
 
     # eg AE-6.3 =  Scaling up
@@ -127,11 +165,132 @@ class Impact(db.Model):
     property_code = db.Column(db.String(80), nullable=False)  # property code
     pp_action = db.Column(db.String(80), nullable=False)  # ie PP01.01
     option_code = db.Column(db.String(80), nullable=False)
-    option_text = db.Column(db.String(500), nullable=False)
+    # the pp action + option text this is unique on, see CatalogImpact
+    catalog_impact_id = db.Column(db.Integer, db.ForeignKey('catalog_impact.id'), nullable=False, index=True)
     active = db.Column(db.Boolean, nullable=False, default=True)
+    # {"data": {number: data}, "text": {number: text}}, see ANSWER_STORAGE,
+    # None (the rows are read) for anything saved in rows mode
+    answers_json = db.Column(db.Text, nullable=True,
+                             default=lambda: None if settings.ANSWER_STORAGE == 'rows' else '{"data":{},"text":{}}')
 
+    catalog_impact = db.relationship('CatalogImpact')
     sdgs = db.relationship('ImpactSdg', backref="impact",  cascade="all,delete")
-    answers = db.relationship('ImpactAnswer', backref="impact", cascade="all,delete", lazy='subquery')
+    answers = db.relationship('ImpactAnswer', backref="impact", cascade="all,delete", lazy=True)
+
+    @property
+    def option_text(self):
+        return self.catalog_impact.option_text
+
+    def get_answers(self):
+        """
+        {'data': {number: data}, 'text': {number: text}}, every answered
+        question is in data, text area answers have None there & the answer in text
+        """
+        if self.answers_json is not None and settings.ANSWER_STORAGE != 'rows':
+            return json.loads(self.answers_json)
+
+        rows = ImpactAnswer.query.options(db.undefer('text')).filter_by(impact_id=self.id).all()
+        return {
+            'data': {x.number: x.data for x in rows},
+            'text': {x.number: x.text for x in rows if x.text},
+        }
+
+    def answer_data(self):
+        return self.get_answers()['data']
+
+    def has_answers(self):
+        return len(self.answer_data()) > 0
+
+    def set_answers(self, data, text):
+        """
+        replaces all the answers, for a saved impact, data & text as in get_answers
+        """
+        if settings.ANSWER_STORAGE != 'rows':
+            self.answers_json = json.dumps({'data': data, 'text': text}, separators=(',', ':'))
+        else:
+            self.answers_json = None
+
+        # json only leaves the old rows as they are, they're not read again
+        if settings.ANSWER_STORAGE != 'json':
+            ImpactAnswer.query.filter_by(impact_id=self.id).delete(synchronize_session=False)
+            for number in data:
+                db.session.add(ImpactAnswer(impact_id=self.id, number=number, data=data[number], text=text.get(number)))
+
+
+def catalog_impact_hash(pp_action, option_text):
+    return hashlib.sha1('{}\n{}'.format(pp_action, option_text).encode('utf-8')).hexdigest()
+
+
+class CatalogImpact(db.Model):
+    """
+    the distinct pp action + option text pairs from the catalog, impacts
+    point at one of these rather than each repeating the (up to 500 char)
+    option text, and compare on the id instead of the text. rows are only
+    ever added, by intern()
+    """
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # catalog_impact_hash, the unique index is on this rather than the long text
+    key_hash = db.Column(db.String(40), nullable=False, unique=True)
+    pp_action = db.Column(db.String(80), nullable=False)
+    option_text = db.Column(db.String(500), nullable=False)
+
+    def __repr__(self):
+        return '<CatalogImpact %r>' % self.pp_action
+
+    @classmethod
+    def intern(cls, keys, attempts=3):
+        """
+        [(pp_action, option_text), ...] => {(pp_action, option_text): id}
+
+        missing ones are inserted & committed on a connection of their own, so
+        they are there for every request whatever happens to this one, and
+        read back on it too, the session might not see them yet
+        """
+        hashes = {key: catalog_impact_hash(*key) for key in keys}
+        if not hashes:
+            return {}
+
+        if db.engine.dialect.name == 'sqlite':
+            # one writer at a time, a second connection would wait on (or with
+            # an in memory db, be) the sessions one, so they go with the session
+            return cls._intern(db.session.connection(), hashes)
+
+        for attempt in range(attempts):
+            with db.engine.connect() as connection:
+                try:
+                    with connection.begin():
+                        return cls._intern(connection, hashes)
+                except IntegrityError:
+                    # another request added some of them first, go again
+                    pass
+
+        raise RuntimeError('could not add the catalog impacts')
+
+    @classmethod
+    def lookup(cls, keys):
+        """
+        [(pp_action, option_text), ...] => {(pp_action, option_text): id} for
+        the ones already there, read only (for previews, intern on save)
+        """
+        hashes = {key: catalog_impact_hash(*key) for key in keys}
+        if not hashes:
+            return {}
+
+        ids = dict(db.session.query(cls.key_hash, cls.id).filter(cls.key_hash.in_(set(hashes.values()))))
+        return {key: ids[h] for key, h in hashes.items() if h in ids}
+
+    @classmethod
+    def _intern(cls, connection, hashes):
+        query = db.select([cls.key_hash, cls.id]).where(cls.key_hash.in_(set(hashes.values())))
+        ids = dict(connection.execute(query).fetchall())
+
+        missing = [{'key_hash': h, 'pp_action': key[0], 'option_text': key[1]}
+                   for key, h in hashes.items() if h not in ids]
+        if missing:
+            connection.execute(cls.__table__.insert(), missing)
+            ids.update(connection.execute(query).fetchall())
+
+        return {key: ids[h] for key, h in hashes.items()}
 
 
 class ImpactSdg(db.Model):
@@ -151,7 +310,7 @@ class ImpactAnswer(db.Model):
     impact_id = db.Column(db.Integer, db.ForeignKey('impact.id'))
     number = db.Column(db.String(20), nullable=False)
     data = db.Column(db.String(200), nullable=True)  # going to be code or the number or string
-    text = db.Column(db.Text, nullable=True)
+    text = db.deferred(db.Column(db.Text, nullable=True))
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -164,6 +323,30 @@ class User(db.Model):
     investor = db.Column(db.Boolean, nullable=True, default=False)
     benchmark_id = db.Column(db.Integer, db.ForeignKey('benchmark.id'), nullable=True)
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=True)
+    # their last save, their reads stay off the replica for a while after it (lib/database)
+    last_write_at = db.Column(db.Float(53), nullable=True)
 
     def __repr__(self):
         return '<User %r>' % self.email
+
+
+class OutboundEmail(db.Model):
+    """
+    the outbound mail queue, requests add to it and the mail worker
+    (flask send-emails) sends them, the content is cleared once sent
+    as the welcome/reset ones have a password in them
+    """
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html_content = db.Column(db.Text, nullable=True)
+    # pending, sent or failed (after too many attempts)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_on = db.Column(db.Float(53), nullable=True)
+    next_attempt_on = db.Column(db.Float(53), nullable=True)
+    sent_on = db.Column(db.Float(53), nullable=True)
+
+    def __repr__(self):
+        return '<OutboundEmail %r>' % self.subject
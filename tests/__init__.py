@@ -47,3 +47,26 @@ class TestBase(unittest.TestCase):
     def tearDown(self):
         #os.close(self.db_fd)
         pass
+
+
+class DatabaseTestBase(TestBase):
+    """
+    runs against a throw away in memory sqlite db, rather than the configured one
+    """
+    database_uri = 'sqlite://'
+
+    def setUp(self):
+        super().setUp()
+        self._configured_database_uri = self.app.config['SQLALCHEMY_DATABASE_URI']
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = self.database_uri
+
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = self._configured_database_uri
+        super().tearDown()
@@ -0,0 +1,136 @@
+import json
+import unittest
+from unittest import mock
+
+from tests import DatabaseTestBase
+from app import db
+from models import User, Company, Benchmark, Product, Impact, ImpactAnswer, BreakEven, BreakEvenAnswer, CatalogImpact
+from lib.auth import create_user_access_token
+
+
+class TestAnswerStorage(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        company = Company(name='Acme', intro_complete=True)
+        benchmark = Benchmark(year='2021', company=company)
+        product = Product(name='Widget', benchmark=benchmark)
+        self.user = User(email='crud@test.com', password='x', company=company, benchmark=benchmark)
+        catalog_impact = CatalogImpact.intern([('PP01.01', 'Energy')])[('PP01.01', 'Energy')]
+        self.impact = Impact(product=product, property_code='X-1.1', pp_action='PP01.01',
+                             option_code='X1-1', catalog_impact_id=catalog_impact)
+        self.be = BreakEven(code='BE01', benchmark=benchmark)
+        db.session.add_all([company, benchmark, product, self.user, self.impact, self.be])
+        db.session.commit()
+
+        with self.app.test_request_context():
+            self.headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(self.user))}
+
+    def storage(self, mode):
+        return mock.patch('config.settings.ANSWER_STORAGE', mode)
+
+    def test_legacy_rows_are_read(self):
+        # saved before answers_json
+        self.impact.answers_json = None
+        self.be.answers_json = None
+        db.session.add_all([
+            ImpactAnswer(impact_id=self.impact.id, number='A-1', data='A-1.2'),
+            ImpactAnswer(impact_id=self.impact.id, number='A-9', text='a long answer'),
+            BreakEvenAnswer(break_even_id=self.be.id, code='A', data='A-1.1'),
+        ])
+        db.session.commit()
+
+        self.assertEqual(self.impact.get_answers(), {
+            'data': {'A-1': 'A-1.2', 'A-9': None},
+            'text': {'A-9': 'a long answer'},
+        })
+        self.assertEqual(self.be.get_answers(), {'A': 'A-1.1'})
+
+    def test_new_have_no_answers(self):
+        self.assertFalse(self.impact.has_answers())
+        self.assertFalse(self.be.has_answers())
+        self.assertEqual(self.impact.get_answers(), {'data': {}, 'text': {}})
+
+    def test_saved_under_rows_read_under_dual(self):
+        with self.storage('rows'):
+            # new under rows, never saved
+            impact = Impact(product=self.impact.product, property_code='X-1.1', pp_action='PP01.01',
+                            option_code='X1-2', catalog_impact_id=self.impact.catalog_impact_id)
+            db.session.add(impact)
+            db.session.commit()
+            db.session.add(ImpactAnswer(impact_id=impact.id, number='A-1', data='A-1.1'))
+            db.session.commit()
+        with self.storage('dual'):
+            self.assertEqual(impact.get_answers()['data'], {'A-1': 'A-1.1'})
+
+        with self.storage('dual'):
+            self.impact.set_answers({'A-1': 'A-1.1'}, {})
+            self.be.set_answers({'A': 'A-1.1'})
+            db.session.commit()
+
+        with self.storage('rows'):
+            self.impact.set_answers({'A-1': 'A-1.2', 'A-9': None}, {'A-9': 'a long answer'})
+            self.be.set_answers({'A': 'A-1.2'})
+            db.session.commit()
+
+        for mode in ['dual', 'json']:
+            with self.storage(mode):
+                db.session.expire_all()
+                self.assertEqual(self.impact.get_answers(), {
+                    'data': {'A-1': 'A-1.2', 'A-9': None},
+                    'text': {'A-9': 'a long answer'},
+                })
+                self.assertEqual(self.be.get_answers(), {'A': 'A-1.2'})
+
+    def test_dual(self):
+        with self.storage('dual'):
+            self.impact.set_answers({'A-1': 'A-1.2', 'A-9': None}, {'A-9': 'a long answer'})
+            self.be.set_answers({'A': 'A-1.1'})
+            db.session.commit()
+
+            self.assertEqual(ImpactAnswer.query.count(), 2)
+            self.assertEqual(BreakEvenAnswer.query.count(), 1)
+            self.assertEqual(json.loads(self.impact.answers_json)['text'], {'A-9': 'a long answer'})
+
+            # saving again replaces them
+            self.impact.set_answers({'A-1': 'A-1.1'}, {})
+            db.session.commit()
+            self.assertEqual([x.data for x in ImpactAnswer.query.all()], ['A-1.1'])
+
+        with self.storage('rows'):
+            self.assertEqual(self.impact.answer_data(), {'A-1': 'A-1.1'})
+
+    def test_json(self):
+        with self.storage('json'):
+            self.impact.set_answers({'A-1': 'A-1.2'}, {})
+            self.be.set_answers({'A': 'A-1.1'})
+            db.session.commit()
+
+            self.assertEqual(ImpactAnswer.query.count(), 0)
+            self.assertEqual(BreakEvenAnswer.query.count(), 0)
+            self.assertEqual(self.impact.answer_data(), {'A-1': 'A-1.2'})
+            self.assertTrue(self.be.has_answers())
+
+    def test_views(self):
+        url = '/product/{}/impact/{}'.format(self.impact.product_id, self.impact.id)
+        answers = {'A-1': 'A-1.2', 'A-2': ''}
+
+        with mock.patch('views.product.get_impact_question_type', side_effect=lambda key: 'text area' if key == 'A-9' else 'radio'):
+            answers['A-9'] = 'a long answer'
+            response = self.test_client_app.post(url, headers=self.headers, json={'data': {'answers': answers}})
+        self.assertEqual(response.status_code, 200)
+
+        db.session.expire_all()
+        self.assertEqual(Impact.query.get(self.impact.id).get_answers(), {
+            'data': {'A-1': 'A-1.2', 'A-9': None},
+            'text': {'A-9': 'a long answer'},
+        })
+
+        data = json.loads(self.test_client_app.get(url, headers=self.headers).get_data())
+        self.assertEqual(data['answers'], {'A-1': 'A-1.2', 'A-9': 'a long answer'})
+
+        data = json.loads(self.test_client_app.get('/be/{}'.format(self.be.id), headers=self.headers).get_data())
+        self.assertEqual(data['answers'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import unittest
+
+from tests import DatabaseTestBase
+from app import db
+from models import User, Company, Benchmark, Product
+from lib.auth import create_user_access_token
+
+
+class TestAdminCheck(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User(email='admin@test.com', password='x', admin=True)
+        self.user = User(email='crud@test.com', password='x')
+        db.session.add_all([self.admin, self.user])
+        db.session.commit()
+
+        with self.app.test_request_context():
+            self.headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(self.admin))}
+            self.user_headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(self.user))}
+
+    def status(self, headers):
+        response = self.test_client_app.get('/admin/profile', headers=headers)
+        return json.loads(response.get_data())['status']
+
+    def test_admin(self):
+        self.assertEqual(self.status(self.headers), 'success')
+        self.assertEqual(self.status(self.user_headers), 'error')
+
+    def test_admin_taken_away(self):
+        self.admin.admin = False
+        db.session.commit()
+
+        # the token still says admin
+        self.assertEqual(self.status(self.headers), 'error')
+
+    def test_admin_given_needs_new_token(self):
+        self.user.admin = True
+        db.session.commit()
+
+        self.assertEqual(self.status(self.user_headers), 'error')
+
+
+class TestClaimsChecked(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self.company = Company(name='Acme', intro_complete=True)
+        self.benchmark = Benchmark(year='2021', company=self.company)
+        self.other = Benchmark(year='2021', company=Company(name='Other', intro_complete=True))
+        self.user = User(email='crud@test.com', password='x', company=self.company, benchmark=self.benchmark)
+        db.session.add_all([self.company, self.benchmark, self.other, self.user])
+        db.session.commit()
+
+        with self.app.test_request_context():
+            self.headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(self.user))}
+
+    def add_product(self):
+        response = self.test_client_app.post('/product', headers=self.headers, json={'data': {'AE-1': 'Widget'}})
+        return response.status_code
+
+    def test_save(self):
+        self.assertEqual(self.add_product(), 200)
+        self.assertEqual(Product.query.one().benchmark_id, self.benchmark.id)
+
+    def test_moved_to_another_company(self):
+        self.user.company = self.other.company
+        self.user.benchmark = self.other
+        db.session.commit()
+
+        self.assertEqual(self.add_product(), 401)
+        self.assertEqual(Product.query.count(), 0)
+
+        # reads still go by the token
+        self.assertEqual(self.test_client_app.get('/product', headers=self.headers).status_code, 200)
+
+    def test_deleted_user(self):
+        db.session.delete(self.user)
+        db.session.commit()
+
+        self.assertEqual(self.add_product(), 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from benchmarks.endpoints import compare_results
+
+
+def results(**medians):
+    return {'results': {key: {'median_ms': ms} for key, ms in medians.items()}}
+
+
+class TestBenchmarkCompare(unittest.TestCase):
+    def test_compare(self):
+        before = results(report_pp=100, be=2, product=50, gone=10)
+        after = results(report_pp=130, be=4, product=40, new=10)
+
+        rows = {x[0]: x for x in compare_results(before, after, threshold=0.2, min_ms=5)}
+        self.assertEqual(set(rows), {'report_pp', 'be', 'product'})
+        self.assertTrue(rows['report_pp'][4])
+        # doubled, but by less than min_ms
+        self.assertFalse(rows['be'][4])
+        self.assertFalse(rows['product'][4])
+        self.assertAlmostEqual(rows['product'][3], -0.2)
+
+        rows = compare_results(before, after, threshold=0.5, min_ms=5)
+        self.assertFalse(any(x[4] for x in rows))
+
+    def test_compare_memory(self):
+        before = {'results': {'be': {'median_ms': 1, 'peak_kb': 100}, 'report_pp': {'median_ms': 1, 'peak_kb': 2000},
+                              'product': {'median_ms': 1}}}
+        after = {'results': {'be': {'median_ms': 1, 'peak_kb': 150}, 'report_pp': {'median_ms': 1, 'peak_kb': 3000},
+                             'product': {'median_ms': 1, 'peak_kb': 100}}}
+
+        rows = {x[0]: x for x in compare_results(before, after, threshold=0.2, min_ms=256, field='peak_kb')}
+        # product wasn't traced before
+        self.assertEqual(set(rows), {'be', 'report_pp'})
+        self.assertFalse(rows['be'][4])
+        self.assertTrue(rows['report_pp'][4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import gzip
+import json
+import unittest
+from unittest import mock
+
+from flask import jsonify
+from flask_jwt_extended import create_access_token
+
+from tests import TestBase
+from lib.catalog import catalog, surveys, CatalogError, properties_skeleton
+
+
+class TestCatalog(TestBase):
+    def test_request_keeps_its_version(self):
+        with self.app.test_request_context():
+            pinned = surveys._get_current_object()
+            catalog.reload()
+            self.assertIs(surveys._get_current_object(), pinned)
+
+        with self.app.test_request_context():
+            self.assertIs(surveys._get_current_object(), catalog.current())
+            self.assertIsNot(surveys._get_current_object(), pinned)
+
+    def test_failed_reload_keeps_current(self):
+        current = catalog.current()
+
+        with mock.patch('lib.catalog.validate_surveys', side_effect=CatalogError('broken')):
+            with self.assertRaises(CatalogError):
+                catalog.reload()
+
+        self.assertIs(catalog.current(), current)
+        self.assertIn('broken', catalog.status()['last_error'])
+
+        catalog.reload()
+        self.assertIsNone(catalog.status()['last_error'])
+
+    def test_catalog_is_read_only(self):
+        current = catalog.current()
+        item = current.be_text_lookup['menu_items'][0]['items'][0]
+
+        with self.assertRaises(TypeError):
+            item['percent_complete'] = 100
+        with self.assertRaises(TypeError):
+            item.update({'id': 1})
+        with self.assertRaises(AttributeError):
+            current.be_tags.append('BE24')
+
+        # copies are plain & mutable
+        copied = dict(item)
+        copied['percent_complete'] = 100
+        self.assertNotIn('percent_complete', item)
+
+    def test_frozen_catalog_serialises(self):
+        with self.app.test_request_context():
+            data = json.loads(jsonify(surveys.be['BE01']).get_data())
+
+        self.assertEqual(data['scores'], dict(catalog.current().be['BE01']['scores']))
+        self.assertIsInstance(data['questions'], list)
+
+    def auth_headers(self, **headers):
+        with self.app.app_context():
+            headers['Authorization'] = 'Bearer {}'.format(create_access_token(identity='tester@futurefitbusiness.org'))
+        return headers
+
+    def test_survey_payload_etag(self):
+        response = self.test_client_app.get('/survey/properties', headers=self.auth_headers())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data()), json.loads(json.dumps(catalog.current().properties)))
+
+        etag = response.headers['ETag']
+        response = self.test_client_app.get('/survey/properties', headers=self.auth_headers(**{'If-None-Match': etag}))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b'')
+
+    def test_survey_payload_encoding(self):
+        plain = self.test_client_app.get('/survey/be/BE01', headers=self.auth_headers())
+        zipped = self.test_client_app.get('/survey/be/BE01', headers=self.auth_headers(**{'Accept-Encoding': 'gzip'}))
+
+        self.assertEqual(zipped.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.get_data()), plain.get_data())
+        self.assertNotEqual(zipped.headers['ETag'], plain.headers['ETag'])
+
+        response = self.test_client_app.get('/survey/be/BE01', headers=self.auth_headers(**{'If-None-Match': zipped.headers['ETag']}))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], zipped.headers['ETag'])
+
+    def test_lazy_properties(self):
+        response = self.test_client_app.get('/survey/properties?lazy=true', headers=self.auth_headers())
+        skeleton = json.loads(response.get_data())
+        full = json.loads(json.dumps(catalog.current().properties))
+
+        self.assertEqual(len(skeleton['questions']), len(full['questions']))
+        self.assertEqual(len(skeleton['descriptions']), 1)
+        self.assertEqual(list(skeleton['tabs'].values()), ['X{}'.format(x) for x in range(1, 9)])
+
+        for question, full_question in zip(skeleton['questions'], full['questions']):
+            if 'tab' in question:
+                self.assertEqual(question['options'], [])
+                response = self.test_client_app.get('/survey/properties/' + question['tab'], headers=self.auth_headers())
+                self.assertEqual(json.loads(response.get_data())['question'], full_question)
+            elif 'description_ref' in question:
+                self.assertEqual(skeleton['descriptions'][question['description_ref']], full_question['description'])
+            else:
+                self.assertEqual(question, full_question)
+
+    def test_payload_data_cached_per_version(self):
+        payloads = catalog.current().payloads
+        skeleton = payloads.data('properties/skeleton')
+        self.assertIs(payloads.data('properties/skeleton'), skeleton)
+        self.assertEqual(skeleton, properties_skeleton(catalog.current()))
+
+        catalog.reload()
+        self.assertIsNot(catalog.current().payloads.data('properties/skeleton'), skeleton)
+
+    def test_unknown_surveys(self):
+        response = self.test_client_app.get('/survey/pumpkin', headers=self.auth_headers())
+        self.assertIsNone(json.loads(response.get_data()))
+
+        response = self.test_client_app.get('/survey/be/BE99', headers=self.auth_headers())
+        self.assertEqual(response.status_code, 404)
+
+        response = self.test_client_app.get('/survey/properties/X9', headers=self.auth_headers())
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import csv
+import gzip
+import json
+import unittest
+
+from flask import Response
+
+from tests import DatabaseTestBase
+from app import app, db
+from models import User
+from lib.auth import create_user_access_token
+from lib.compression import Compression, brotli
+from lib.synthetic import generate_data, TESTER_EMAIL
+
+body = json.dumps([{'code': 'X-1.{}'.format(n), 'text': 'the same text again'} for n in range(200)]).encode()
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.compression = Compression(min_bytes=1024, gzip_level=6, brotli_quality=4)
+
+    def compress(self, response, accept='gzip'):
+        with app.test_request_context(headers={'Accept-Encoding': accept}):
+            return self.compression.compress(response)
+
+    def test_gzip(self):
+        response = Response(body, mimetype='application/json')
+        response.set_etag('abc')
+        response = self.compress(response)
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(response.get_etag(), ('abc-gzip', False))
+        self.assertEqual(int(response.headers['Content-Length']), len(response.get_data()))
+        self.assertLess(len(response.get_data()), len(body) / 5)
+        self.assertEqual(gzip.decompress(response.get_data()), body)
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        response = self.compress(Response(body, mimetype='application/json'), accept='gzip, deflate, br')
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.get_data()), body)
+
+    def test_left_alone(self):
+        # not accepted, small, already encoded, not a compressible type, no body
+        self.assertNotIn('Content-Encoding', self.compress(Response(body, mimetype='application/json'), accept='').headers)
+        self.assertNotIn('Content-Encoding', self.compress(Response(b'{}', mimetype='application/json')).headers)
+
+        response = Response(b'already', mimetype='application/json', headers={'Content-Encoding': 'br'})
+        self.assertEqual(self.compress(response).get_data(), b'already')
+
+        self.assertNotIn('Content-Encoding', self.compress(Response(body, mimetype='image/png')).headers)
+        self.assertNotIn('Content-Encoding', self.compress(Response(status=304, mimetype='application/json')).headers)
+
+    def test_streamed(self):
+        closed = []
+
+        class Rows():
+            def __iter__(self):
+                for n in range(1000):
+                    yield 'row,{}\n'.format(n)
+
+            def close(self):
+                closed.append(True)
+
+        response = self.compress(Response(Rows(), mimetype='text/csv'))
+        self.assertTrue(response.is_streamed)
+        self.assertNotIn('Content-Length', response.headers)
+        data = b''.join(response.response)
+        response.close()
+
+        self.assertEqual(gzip.decompress(data).decode().splitlines()[-1], 'row,999')
+        self.assertEqual(closed, [True])
+
+
+class TestCsvExport(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self._rounds = self.app.config['BCRYPT_LOG_ROUNDS']
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 4
+        generate_data(companies=1, products=3, min_products=3, seed=3)
+        tester = User.query.filter_by(email=TESTER_EMAIL).one()
+        with self.app.test_request_context():
+            self.headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(tester))}
+
+    def tearDown(self):
+        self.app.config['BCRYPT_LOG_ROUNDS'] = self._rounds
+        super().tearDown()
+
+    def test_streamed_gzip(self):
+        plain = self.test_client_app.get('/report/download/csv', headers=self.headers)
+        self.assertTrue(plain.is_streamed)
+        self.assertEqual(plain.mimetype, 'text/csv')
+        rows = list(csv.reader(plain.get_data(as_text=True).splitlines()))
+        self.assertEqual(rows[0], ['Impact Benchmark Repot Data'])
+        self.assertIn(['ESG Risks'], rows)
+
+        compressed = self.test_client_app.get('/report/download/csv',
+                                              headers={**self.headers, 'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.get_data()), plain.get_data())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy.engine.url import make_url
+
+from tests import DatabaseTestBase
+from app import app, db
+from models import User, Company
+from lib.auth import create_user_access_token
+from lib.database import RoutingSQLAlchemy, REPLICA
+
+directory = tempfile.mkdtemp()
+
+
+class TestReadReplica(DatabaseTestBase):
+    database_uri = 'sqlite:///{}'.format(os.path.join(directory, 'primary.db'))
+    replica_uri = 'sqlite:///{}'.format(os.path.join(directory, 'replica.db'))
+
+    def setUp(self):
+        self._binds = app.config.get('SQLALCHEMY_BINDS')
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA: self.replica_uri}
+        super().setUp()
+
+        replica = db.get_engine(app, bind=REPLICA)
+        db.Model.metadata.create_all(replica)
+        # behind the primary, it has a couple of companies the primary doesn't
+        replica.execute(Company.__table__.insert(), [{'name': 'Replica 1'}, {'name': 'Replica 2'}])
+
+        self.admin = User(email='admin@test.com', password='x', admin=True)
+        db.session.add(self.admin)
+        db.session.commit()
+        with app.test_request_context():
+            self.headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(self.admin))}
+
+    def tearDown(self):
+        db.Model.metadata.drop_all(db.get_engine(app, bind=REPLICA))
+        super().tearDown()
+        app.config['SQLALCHEMY_BINDS'] = self._binds
+
+    def stats(self):
+        return json.loads(self.test_client_app.get('/admin/stats', headers=self.headers).get_data())
+
+    def test_routing(self):
+        self.assertEqual(self.stats()['companies'], 2)
+        # not a @read_replica view
+        response = self.test_client_app.get('/user/profile', headers=self.headers)
+        self.assertEqual(json.loads(response.get_data())['email'], 'admin@test.com')
+
+    def test_read_your_writes(self):
+        response = self.test_client_app.post('/user/profile', headers=self.headers,
+                                             json={'data': {'email': 'admin@test.com', 'first': 'Ad'}})
+        self.assertEqual(json.loads(response.get_data())['status'], 'success')
+        db.session.expire_all()
+        self.assertIsNotNone(User.query.get(self.admin.id).last_write_at)
+
+        # just saved, so the primary
+        self.assertEqual(self.stats()['companies'], 0)
+
+        with mock.patch('config.settings.REPLICA_STICKY_SECONDS', 0):
+            self.assertEqual(self.stats()['companies'], 2)
+
+
+class TestPoolOptions(unittest.TestCase):
+    def test_server_databases_only(self):
+        routing = RoutingSQLAlchemy(pool_options={'pool_size': 3, 'pool_pre_ping': True})
+        url = make_url('mysql://ffuser@localhost/ibt')
+        _, options = routing.apply_driver_hacks(app, url, {})
+        self.assertEqual(options['pool_size'], 3)
+        self.assertTrue(options['pool_pre_ping'])
+
+        url = make_url('sqlite://')
+        _, options = routing.apply_driver_hacks(app, url, {})
+        self.assertNotIn('pool_size', options)
+
+
+def tearDownModule():
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
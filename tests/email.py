@@ -0,0 +1,67 @@
+import time
+import unittest
+
+from tests import DatabaseTestBase
+from app import db, settings
+from models import OutboundEmail
+from lib.email import LocalTransport, send_welcome_email, send_reset_password_email,\
+    send_queued_emails
+
+
+class TestEmailQueue(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self.request_context = self.app.test_request_context()
+        self.request_context.push()
+
+    def tearDown(self):
+        self.request_context.pop()
+        super().tearDown()
+
+    def test_queued_then_sent(self):
+        send_welcome_email('crud@test.com', 'stupidbunny')
+        send_reset_password_email('crud@test.com', 'stupidbunny')
+        db.session.commit()
+
+        transport = LocalTransport()
+        self.assertEqual(send_queued_emails(transport), 2)
+        self.assertEqual([x['subject'] for x in transport.sent],
+                         ['Welcome to the Impact Benchmark Tool', 'Password Reset'])
+        self.assertIn('stupidbunny', transport.sent[0]['html_content'])
+
+        # content with the password in it doesn't hang around
+        for email in OutboundEmail.query.all():
+            self.assertEqual(email.status, 'sent')
+            self.assertIsNone(email.html_content)
+
+        self.assertEqual(send_queued_emails(transport), 0)
+
+    def test_retries_then_fails(self):
+        send_welcome_email('crud@test.com', 'stupidbunny')
+        db.session.commit()
+
+        transport = LocalTransport()
+        transport.fail_next = settings.MAIL_MAX_ATTEMPTS
+
+        self.assertEqual(send_queued_emails(transport), 0)
+        email = OutboundEmail.query.one()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_on, time.time())
+
+        # not due yet
+        self.assertEqual(send_queued_emails(transport), 0)
+        self.assertEqual(email.attempts, 1)
+
+        for attempt in range(2, settings.MAIL_MAX_ATTEMPTS + 1):
+            email.next_attempt_on = 0
+            db.session.commit()
+            send_queued_emails(transport)
+            self.assertEqual(email.attempts, attempt)
+
+        self.assertEqual(email.status, 'failed')
+        self.assertEqual(transport.sent, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import json
+import datetime
+import unittest
+from unittest import mock
+
+from flask import jsonify as flask_jsonify
+
+from tests import TestBase
+import lib.json_provider as json_provider
+from lib.json_provider import jsonify, dumps
+
+data = {
+    'b': [1, 2.5, None, True],
+    'a': {'z': 'café'},
+    'n': {2: 'x', 1: 'y'},
+    'when': datetime.datetime(2021, 3, 4, 5, 6, 7),
+    'big': 2 ** 70,
+}
+
+
+class TestJsonProvider(TestBase):
+    def test_same_as_flask(self):
+        for provider in json_provider.providers:
+            with mock.patch.object(json_provider, 'provider', provider), self.app.app_context():
+                response = jsonify(data)
+                expected = flask_jsonify(data)
+
+                self.assertEqual(response.mimetype, 'application/json')
+                self.assertEqual(json.loads(response.get_data()), json.loads(expected.get_data()))
+                self.assertEqual(json.loads(response.get_data())['when'], 'Thu, 04 Mar 2021 05:06:07 GMT')
+                self.assertTrue(response.get_data().endswith(b'\n'))
+
+    @unittest.skipIf(json_provider.orjson is None, 'orjson is not installed')
+    def test_orjson(self):
+        with mock.patch.object(json_provider, 'provider', 'orjson'), self.app.app_context():
+            body = dumps({'b': 1, 'a': {2: 'x', 1: 'y'}})
+            self.assertEqual(body, b'{"a":{"1":"y","2":"x"},"b":1}')
+            # over 64 bits, through flask's json
+            self.assertEqual(dumps({'big': 2 ** 70}), b'{"big":1180591620717411303424}')
+            with self.assertRaises(TypeError):
+                dumps({'x': object()})
+
+    def test_jsonify_arguments(self):
+        with self.app.app_context():
+            self.assertEqual(json.loads(jsonify(status='success').get_data()), {'status': 'success'})
+            self.assertEqual(json.loads(jsonify(1, 2).get_data()), [1, 2])
+            with self.assertRaises(TypeError):
+                jsonify(1, status='success')
+
+    def test_provider(self):
+        self.assertEqual(json_provider.get_provider('json'), 'json')
+        self.assertEqual(json_provider.get_provider('auto'), 'orjson' if json_provider.orjson else 'json')
+        with mock.patch.object(json_provider, 'orjson', None):
+            self.assertEqual(json_provider.get_provider('orjson'), 'json')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import json
+import shutil
+import tempfile
+import unittest
+
+from tests import DatabaseTestBase
+from app import db
+from models import User, Company, Benchmark
+import lib.blob_store as blob_store
+from lib.auth import create_user_access_token
+from lib.logos import Image
+
+
+def png(width, height):
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), 'green').save(out, format='PNG')
+    return out.getvalue()
+
+
+@unittest.skipIf(Image is None, 'needs pillow')
+class TestLogos(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self.blob_dir = tempfile.mkdtemp()
+        self._store = blob_store._store
+        blob_store._store = blob_store.LocalBlobStore(self.blob_dir)
+
+        company = Company(name='Acme', intro_complete=True)
+        benchmark = Benchmark(year='2021', company=company)
+        self.user = User(email='crud@test.com', password='x', company=company, benchmark=benchmark)
+        db.session.add_all([company, benchmark, self.user])
+        db.session.commit()
+
+        with self.app.test_request_context():
+            self.headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(self.user))}
+
+    def tearDown(self):
+        blob_store._store = self._store
+        shutil.rmtree(self.blob_dir)
+        super().tearDown()
+
+    def upload(self, data, filename):
+        response = self.test_client_app.post('/company/logo', headers=self.headers,
+                                             data={'file': (io.BytesIO(data), filename)},
+                                             content_type='multipart/form-data')
+        return json.loads(response.get_data())
+
+    def test_upload_and_serve(self):
+        logo = png(800, 400)
+        data = self.upload(logo, 'acme.PNG')
+        self.assertEqual(data['status'], 'success')
+
+        company = Company.query.one()
+        self.assertEqual(company.logo_hash, blob_store.blob_hash(logo))
+        self.assertEqual(company.logo_file_extension, 'png')
+
+        response = self.test_client_app.get(data['logo_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), logo)
+        self.assertEqual(response.mimetype, 'image/png')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+        response = self.test_client_app.get(data['logo_url'], headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        thumb = self.test_client_app.get(data['logo_thumb_url']).get_data()
+        self.assertLessEqual(Image.open(io.BytesIO(thumb)).size, (200, 100))
+
+        # the company url points at the current one
+        response = self.test_client_app.get('/company/db/img/{}?thumb=true'.format(company.id))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.headers['Location'].endswith(data['logo_thumb_url']))
+
+        info = json.loads(self.test_client_app.get('/user/company', headers=self.headers).get_data())
+        self.assertEqual(info['company']['logo_url'], data['logo_url'])
+
+    def test_same_logo_stored_once(self):
+        logo = png(10, 10)
+        self.upload(logo, 'a.png')
+        self.upload(logo, 'b.png')
+        self.assertEqual(blob_store._store.get(blob_store.blob_hash(logo)), logo)
+
+    def test_svg_has_no_thumbnail(self):
+        data = self.upload(b'<svg xmlns="http://www.w3.org/2000/svg"></svg>', 'logo.svg')
+        self.assertEqual(data['logo_thumb_url'], data['logo_url'])
+
+        response = self.test_client_app.get(data['logo_url'])
+        self.assertEqual(response.mimetype, 'image/svg+xml')
+        self.assertIn('Content-Security-Policy', response.headers)
+
+    def test_rejected(self):
+        self.assertEqual(self.upload(b'MZ', 'logo.exe')['status'], 'error')
+        self.assertIsNone(Company.query.one().logo_hash)
+
+        response = self.test_client_app.get('/company/logo/{}.png'.format('0' * 64))
+        self.assertEqual(response.status_code, 404)
+        response = self.test_client_app.get('/company/db/img/{}'.format(Company.query.one().id))
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
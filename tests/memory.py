@@ -0,0 +1,66 @@
+import os
+import json
+import logging
+import unittest
+import tracemalloc
+from unittest import mock
+
+from tests import DatabaseTestBase
+from app import db
+from models import User
+from lib.auth import create_user_access_token
+from lib.memory import memory
+
+
+def allocate():
+    return [str(x) * 10 for x in range(20000)]
+
+
+class TestMemory(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        memory.reset()
+
+    def test_trace(self):
+        with memory.trace(top=3) as trace:
+            data = allocate()
+            del data
+
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreater(trace.peak, 1024 * 1024)
+        # freed by the end
+        self.assertLess(trace.current, trace.peak / 10)
+
+        with memory.trace(top=3) as trace:
+            data = allocate()
+        self.assertGreater(trace.current, 1024 * 1024)
+        self.assertTrue(trace.sites[0][0].startswith('tests/memory.py:'))
+        self.assertEqual(set(trace.as_dict()), {'peak_kb', 'current_kb', 'sites'})
+
+    def test_sampled_requests(self):
+        admin = User(email='admin@test.com', password='x', admin=True)
+        db.session.add(admin)
+        db.session.commit()
+        with self.app.test_request_context():
+            headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(admin))}
+
+        self.test_client_app.get('/admin/stats', headers=headers)
+        self.assertEqual(memory.peaks, {})
+
+        with mock.patch.object(memory, 'sample_rate', 1.0), mock.patch.object(memory, 'log_bytes', 0):
+            with self.assertLogs('lib.memory', logging.WARNING) as logs:
+                self.test_client_app.get('/admin/stats', headers=headers)
+
+        self.assertFalse(tracemalloc.is_tracing())
+        info = json.loads(logs.records[0].getMessage())
+        self.assertEqual(info['endpoint'], 'get_admin_stats')
+        self.assertGreater(info['peak_kb'], 0)
+        self.assertEqual(memory.peaks['get_admin_stats'][0], 1)
+
+        text = self.test_client_app.get('/admin/metrics', headers=headers).get_data(as_text=True)
+        self.assertIn('ibt_request_memory_peak_bytes_count{{endpoint="get_admin_stats",worker="{}"}} 1'.format(os.getpid()), text)
+        self.assertIn('ibt_process_max_rss_bytes{{worker="{}"}} '.format(os.getpid()), text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import re
+import json
+import unittest
+from unittest import mock
+
+from tests import DatabaseTestBase
+from app import db, bcrypt
+from models import User, Company, Benchmark, OutboundEmail
+from lib.email import LocalTransport, send_queued_emails
+from lib.onboarding import read_onboarding_csv, onboard_users
+from lib.auth import create_user_access_token
+from lib.passwords import hash_passwords, hash_rounds
+
+
+portfolio_csv = '''\ufeffEmail,First,Last,Company,Industry_Type,Business_Model,Description,Year,Month_Start,Month_End,Admin,Investor
+jo@acme.com,Jo,Bloggs,Acme,Energy,B2B,,2021,January,December,,
+sam@acme.com,Sam,Smith,Acme,,,,,,,,
+al@existing.com,Al,Jones,Existing Co,,,,,,,,
+crud@test.com,Crud,,Acme,,,,,,,,
+inv@fund.com,Ina,Vest,,,,,,,,,yes
+,No,Email,Acme,,,,,,,,
+jo@acme.com,Jo,Again,Acme,,,,,,,,
+new@nowhere.com,New,Co,Nowhere,,,,,,,,
+'''
+
+
+class TestOnboarding(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self.request_context = self.app.test_request_context()
+        self.request_context.push()
+
+        self._rounds = self.app.config.get('BCRYPT_LOG_ROUNDS')
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 4
+
+        company = Company(name='Existing Co', intro_complete=True)
+        benchmark = Benchmark(year='2020', company=company)
+        db.session.add_all([company, benchmark])
+        db.session.add(User(email='crud@test.com', password='x'))
+        db.session.commit()
+
+    def tearDown(self):
+        if self._rounds is None:
+            del self.app.config['BCRYPT_LOG_ROUNDS']
+        else:
+            self.app.config['BCRYPT_LOG_ROUNDS'] = self._rounds
+        self.request_context.pop()
+        super().tearDown()
+
+    def test_hash_passwords(self):
+        hashes = hash_passwords(['stupidbunny', 'crud', 'stupidbunny'])
+        self.assertEqual(len(hashes), 3)
+        self.assertTrue(bcrypt.check_password_hash(hashes[0], 'stupidbunny'))
+        self.assertTrue(bcrypt.check_password_hash(hashes[1], 'crud'))
+        self.assertNotEqual(hashes[0], hashes[2])
+
+    def test_dry_run(self):
+        result = onboard_users(read_onboarding_csv(portfolio_csv), dry_run=True)
+        self.assertEqual(result['users'], 4)
+        self.assertEqual(User.query.count(), 1)
+
+    def test_onboard(self):
+        result = onboard_users(read_onboarding_csv(portfolio_csv))
+
+        self.assertEqual(result['users'], 4)
+        self.assertEqual(result['companies'], 1)
+        self.assertEqual(result['existing_companies'], 1)
+        self.assertEqual(result['skipped'], ['crud@test.com'])
+        self.assertEqual([x['line'] for x in result['errors']], [7, 8, 9])
+
+        jo = User.query.filter_by(email='jo@acme.com').one()
+        sam = User.query.filter_by(email='sam@acme.com').one()
+        self.assertEqual(jo.company.name, 'Acme')
+        self.assertTrue(jo.company.intro_complete)
+        self.assertEqual(jo.company_id, sam.company_id)
+        self.assertEqual(jo.benchmark.year, '2021')
+        self.assertEqual(jo.benchmark_id, sam.benchmark_id)
+        self.assertEqual(jo.benchmark.company_id, jo.company_id)
+
+        al = User.query.filter_by(email='al@existing.com').one()
+        self.assertEqual(al.company.name, 'Existing Co')
+        self.assertEqual(al.benchmark.year, '2020')
+
+        investor = User.query.filter_by(email='inv@fund.com').one()
+        self.assertTrue(investor.investor)
+        self.assertIsNone(investor.company_id)
+        self.assertFalse(jo.investor)
+
+        # the password in the welcome email is the one that logs in
+        transport = LocalTransport()
+        self.assertEqual(send_queued_emails(transport), 4)
+        for email in transport.sent:
+            # to_email is swapped out in DEBUG, so go by the content
+            address, password = re.findall('#ffffff">([^<]+)<', email['html_content'])[-2:]
+            user = User.query.filter_by(email=address).one()
+            self.assertTrue(bcrypt.check_password_hash(user.password, password))
+
+    def test_hasher(self):
+        onboard_users(read_onboarding_csv(portfolio_csv), hasher=lambda passwords: ['x' for _ in passwords])
+        self.assertEqual(User.query.filter_by(email='jo@acme.com').one().password, 'x')
+
+    def test_onboard_endpoint(self):
+        admin = User(email='admin@test.com', password='x', admin=True)
+        db.session.add(admin)
+        db.session.commit()
+        headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(admin))}
+
+        with mock.patch('config.settings.ONBOARDING_REQUEST_MAX_ROWS', 3):
+            response = self.test_client_app.post('/admin/onboard', headers=headers, json={'data': portfolio_csv})
+            self.assertEqual(json.loads(response.get_data())['status'], 'error')
+            self.assertIsNone(User.query.filter_by(email='jo@acme.com').one_or_none())
+
+            # a dry run only checks the csv, any size
+            response = self.test_client_app.post('/admin/onboard?dry_run=true', headers=headers, json={'data': portfolio_csv})
+            self.assertEqual(json.loads(response.get_data())['data']['users'], 4)
+
+        response = self.test_client_app.post('/admin/onboard', headers=headers, json={'data': portfolio_csv})
+        self.assertEqual(json.loads(response.get_data())['data']['users'], 4)
+        jo = User.query.filter_by(email='jo@acme.com').one()
+        self.assertEqual(hash_rounds(jo.password), 4)
+
+    def test_no_welcome(self):
+        onboard_users(read_onboarding_csv(portfolio_csv), send_welcome=False)
+        self.assertEqual(User.query.count(), 5)
+        self.assertEqual(OutboundEmail.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
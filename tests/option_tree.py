@@ -0,0 +1,180 @@
+import random
+import unittest
+from unittest import mock
+
+from tests import TestBase
+from lib.impact import surveys, _get_answer_actions, _update_actions_per_option_tree, get_hidden_options,\
+    get_hidden_property_options, _get_hidden_property_options
+
+
+def reference_update_actions_per_option_tree(actions):
+    """
+    the original list scanning version, kept to check the trie against
+    """
+    action_codes = [x['option_code'] for x in actions]
+    grouped_codes = reference_group_by_reverse_sub_options(action_codes)
+    new_actions = []
+
+    for key in grouped_codes:
+        text = ''
+        for a in actions:
+            if a['option_code'] == key:
+                new_actions.append(a)
+                if a['option_text']:
+                    text = a['option_text']
+
+        codes = grouped_codes[key]
+
+        for a in actions:
+            if a['option_code'] in codes:
+                b = a.copy()
+                b['option_text'] = text
+                new_actions.append(b)
+
+    return new_actions
+
+
+def reference_group_by_reverse_sub_options(codes):
+    res = {}
+
+    for c in codes:
+        sub_codes = reference_get_sub_codes(c)
+
+        res[c] = sub_codes
+        for sc in sub_codes:
+            if sc in res:
+                del res[sc]
+
+    return res
+
+
+def reference_get_sub_codes(c):
+    previous_codes = []
+    tokens = c.split('.')
+
+    for (i, token) in enumerate(tokens[1:], 1):
+        previous_codes.append(".".join(tokens[:i]))
+
+    return previous_codes
+
+
+class TestOptionTree(TestBase):
+    iterations = 300
+
+    def setUp(self):
+        super().setUp()
+        self.random = random.Random(2021)
+        self.facet_codes = []
+        for question in surveys.facets['questions']:
+            for option in question.get('options', []):
+                self.facet_codes.append(option['value'])
+
+        self.tabs = {}
+        for question in surveys.properties['questions']:
+            if question['type'] == 'checkbox' and question['logic']:
+                self.tabs[question['logic'][0][0]] = self.all_option_codes(question['options'])
+
+    def all_option_codes(self, options):
+        codes = []
+        for option in options:
+            codes.append(option['value'])
+            codes += self.all_option_codes(option['options'])
+        return codes
+
+    def random_facets(self):
+        return self.random.sample(self.facet_codes, self.random.randint(0, len(self.facet_codes)))
+
+    def random_answers(self, codes):
+        # sorted, the same as calculate_impacts hands them over
+        return sorted(self.random.sample(codes, self.random.randint(0, len(codes))))
+
+    def synthetic_actions(self):
+        """
+        deeper and wider than the csvs, with gaps in the tree
+        """
+        codes = set()
+        for _ in range(self.random.randint(0, 25)):
+            depth = self.random.randint(1, 5)
+            tokens = ['X{}-{}'.format(self.random.randint(1, 3), self.random.randint(1, 12))]
+            tokens += [str(self.random.randint(1, 12)) for _ in range(depth - 1)]
+            codes.add('.'.join(tokens))
+
+        actions = []
+        for code in sorted(codes):
+            for _ in range(self.random.randint(1, 3)):
+                actions.append({
+                    'pp': 'PP{:02d}.0{}'.format(self.random.randint(1, 21), self.random.randint(1, 4)),
+                    'sdgs': [str(self.random.randint(1, 17))],
+                    'property_code': 'X-1.1',
+                    'option_text': self.random.choice(['', code]),
+                    'option_code': code,
+                })
+        return actions
+
+    def test_matches_reference_on_catalog_answers(self):
+        for _ in range(self.iterations):
+            property_code = self.random.choice(list(self.tabs.keys()))
+            property_questions = [q for q in surveys.properties['questions']
+                                  if q['type'] == 'checkbox' and q['logic'] and q['logic'][0][0] == property_code][0]
+            facets = self.random_facets()
+            actions = []
+            for answer in self.random_answers(self.tabs[property_code]):
+                actions += _get_answer_actions(property_questions['options'], facets, answer, property_code)
+
+            self.assertEqual(_update_actions_per_option_tree(actions),
+                             reference_update_actions_per_option_tree(actions))
+
+    def test_matches_reference_on_synthetic_trees(self):
+        for _ in range(self.iterations):
+            actions = self.synthetic_actions()
+            self.assertEqual(_update_actions_per_option_tree(actions),
+                             reference_update_actions_per_option_tree(actions))
+
+    def test_sub_options_inherit_parent_actions(self):
+        def action(pp, code, text):
+            return {'pp': pp, 'sdgs': ['7.1'], 'property_code': 'X-1.1',
+                    'option_text': text, 'option_code': code}
+
+        parent = action('PP01.01', 'X1-1', 'parent')
+        first = action('PP01.02', 'X1-1.1', 'first')
+        second = action('PP01.03', 'X1-1.2', 'second')
+
+        self.assertEqual(_update_actions_per_option_tree([parent, first, second]), [
+            first,
+            dict(parent, option_text='first'),
+            second,
+            dict(parent, option_text='second'),
+        ])
+
+    def test_no_actions(self):
+        self.assertEqual(_update_actions_per_option_tree([]), [])
+
+    def test_hidden_property_options_cache(self):
+        with self.app.test_request_context():
+            _get_hidden_property_options.cache_clear()
+
+            for _ in range(20):
+                facets = self.random.sample(self.facet_codes, self.random.randint(0, 5))
+                hidden = get_hidden_property_options(facets)
+
+                # the same set in another order & with repeats shares the result
+                self.assertIs(get_hidden_property_options(list(reversed(facets)) + facets), hidden)
+
+                expected = []
+                for question in surveys.properties['questions'][1:]:
+                    if question['type'] == 'checkbox':
+                        expected += get_hidden_options(question['options'], set(facets))
+                self.assertEqual(list(hidden), expected)
+
+            facets = self.facet_codes[:3]
+            get_hidden_property_options(facets)
+            misses = _get_hidden_property_options.cache_info().misses
+
+            # a new catalog version doesn't get the old versions results
+            with mock.patch.object(surveys._get_current_object(), 'version', 'next'):
+                get_hidden_property_options(facets)
+            self.assertEqual(_get_hidden_property_options.cache_info().misses, misses + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import json
+import signal
+import time
+import multiprocessing
+import unittest
+
+from tests import DatabaseTestBase
+from app import db
+from models import User
+from lib.passwords import PasswordPool, PasswordPoolBusy, password_pool, hash_password, hash_rounds
+
+
+class TestPasswordPool(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self._rounds = self.app.config['BCRYPT_LOG_ROUNDS']
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 5
+
+    def tearDown(self):
+        self.app.config['BCRYPT_LOG_ROUNDS'] = self._rounds
+        super().tearDown()
+
+    def test_check(self):
+        pool = PasswordPool(workers=1)
+        pw_hash = pool.hash('stupidbunny')
+
+        self.assertEqual(pool.check(pw_hash, 'stupidbunny'), (True, None))
+        self.assertEqual(pool.check(pw_hash, 'crud'), (False, None))
+        self.assertEqual(pool.check('not a hash', 'crud'), (False, None))
+        self.assertEqual(pool.stats()['check'], 3)
+        self.assertEqual(pool.stats()['pending'], 0)
+
+    def test_spawned_pool(self):
+        # the pool processes import the hashing on their own, as under macos or forkserver
+        pool = PasswordPool(workers=1, timeout=30, mp_context=multiprocessing.get_context('spawn'))
+        pw_hash = pool.hash('stupidbunny')
+
+        self.assertEqual(pool.check(pw_hash, 'stupidbunny'), (True, None))
+        self.assertEqual(pool.stats()['pending'], 0)
+
+    def test_dead_process_gets_a_new_pool(self):
+        pool = PasswordPool(workers=1, max_pending=1, timeout=30)
+        pw_hash = pool.hash('stupidbunny')
+
+        # the pool process dies mid call, like an oom kill
+        with self.assertRaises(PasswordPoolBusy):
+            pool._run('hash', os._exit, 1)
+        self.assertEqual(pool.stats()['pending'], 0)
+        self.assertEqual(pool.stats()['broken'], 1)
+
+        for _ in range(3):
+            self.assertEqual(pool.check(pw_hash, 'stupidbunny'), (True, None))
+        self.assertEqual(pool.stats()['pending'], 0)
+
+        # or dies between calls, the next one starts a new pool rather than failing
+        for pid in list(pool._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        time.sleep(0.5)
+        self.assertEqual(pool.check(pw_hash, 'stupidbunny'), (True, None))
+        self.assertEqual(pool.stats()['pending'], 0)
+        self.assertEqual(pool.stats()['broken'], 2)
+
+    def test_rehash_when_rounds_change(self):
+        pool = PasswordPool(workers=0)
+        pw_hash = hash_password('stupidbunny', 4)
+
+        matches, new_hash = pool.check(pw_hash, 'stupidbunny')
+        self.assertTrue(matches)
+        self.assertEqual(hash_rounds(new_hash), 5)
+        self.assertEqual(pool.check(new_hash, 'stupidbunny'), (True, None))
+
+        # no rehash for a wrong password
+        self.assertEqual(pool.check(pw_hash, 'crud'), (False, None))
+        self.assertEqual(pool.stats()['rehash'], 1)
+
+    def test_busy(self):
+        pool = PasswordPool(workers=0, max_pending=0)
+        with self.assertRaises(PasswordPoolBusy):
+            pool.check(hash_password('stupidbunny', 4), 'stupidbunny')
+        self.assertEqual(pool.stats()['busy'], 1)
+
+    def test_timeout_holds_slot_until_done(self):
+        pool = PasswordPool(workers=1, max_pending=1, timeout=0.05)
+        with self.assertRaises(PasswordPoolBusy):
+            pool._run('hash', time.sleep, 1)
+        self.assertEqual(pool.stats()['timeout'], 1)
+
+        # still sleeping in the pool, so no room for another
+        self.assertEqual(pool.stats()['pending'], 1)
+        with self.assertRaises(PasswordPoolBusy):
+            pool.hash('stupidbunny')
+        self.assertEqual(pool.stats()['busy'], 1)
+
+        deadline = time.time() + 10
+        while pool.stats()['pending'] and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(pool.stats()['pending'], 0)
+
+        pool.timeout = 10
+        self.assertTrue(pool.check(pool.hash('stupidbunny'), 'stupidbunny')[0])
+
+    def login(self, password):
+        response = self.test_client_app.post('/login', json={'email': 'crud@test.com', 'password': password})
+        return response.status_code, json.loads(response.get_data())
+
+    def test_login_rehashes(self):
+        db.session.add(User(email='crud@test.com', password=hash_password('stupidbunny', 4)))
+        db.session.commit()
+
+        status, data = self.login('crud')
+        self.assertEqual(data['message'], 'Invalid username/password')
+        self.assertEqual(hash_rounds(User.query.one().password), 4)
+
+        status, data = self.login('stupidbunny')
+        self.assertIn('access_token', data)
+        db.session.expire_all()
+        self.assertEqual(hash_rounds(User.query.one().password), 5)
+
+        self.assertEqual(self.login('stupidbunny')[0], 200)
+
+    def test_login_busy(self):
+        db.session.add(User(email='crud@test.com', password=hash_password('stupidbunny', 4)))
+        db.session.commit()
+
+        max_pending = password_pool.max_pending
+        password_pool.max_pending = 0
+        try:
+            status, data = self.login('stupidbunny')
+        finally:
+            password_pool.max_pending = max_pending
+
+        self.assertEqual(status, 503)
+        self.assertNotIn('access_token', data)
+
+    def test_welcome_email_busy(self):
+        user = User(email='crud@test.com', password=hash_password('stupidbunny', 4))
+        db.session.add(user)
+        db.session.commit()
+
+        max_pending = password_pool.max_pending
+        password_pool.max_pending = 0
+        try:
+            response = self.test_client_app.get('/admin/email/welcome/{}'.format(user.id))
+        finally:
+            password_pool.max_pending = max_pending
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '5')
+        db.session.expire_all()
+        self.assertEqual(hash_rounds(User.query.one().password), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
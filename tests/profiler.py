@@ -0,0 +1,104 @@
+import json
+import time
+import shutil
+import pstats
+import tempfile
+import threading
+import unittest
+
+from tests import DatabaseTestBase
+from app import db
+from models import User
+from lib.auth import create_user_access_token
+from lib.profiler import profiler, StackSampler
+
+
+def busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+class TestProfiler(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self._directory = profiler.directory
+        profiler.directory = tempfile.mkdtemp()
+
+        self.admin = User(email='admin@test.com', password='x', admin=True)
+        user = User(email='crud@test.com', password='x')
+        db.session.add_all([self.admin, user])
+        db.session.commit()
+
+        with self.app.test_request_context():
+            self.headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(self.admin))}
+            self.user_headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(user))}
+
+    def tearDown(self):
+        profiler.arm('.', 0)
+        shutil.rmtree(profiler.directory)
+        profiler.directory = self._directory
+        super().tearDown()
+
+    def post(self, url, data, headers=None):
+        response = self.test_client_app.post(url, headers=headers or self.headers, json={'data': data})
+        return json.loads(response.get_data())
+
+    def test_profile_requests(self):
+        self.assertEqual(self.post('/admin/profile/requests', {'pattern': '^/admin/user$', 'count': 1},
+                                   headers=self.user_headers)['status'], 'error')
+        self.assertEqual(self.post('/admin/profile/requests', {'pattern': '(', 'count': 1})['status'], 'error')
+        self.assertEqual(self.post('/admin/profile/requests', {'count': 1000})['status'], 'error')
+
+        data = self.post('/admin/profile/requests', {'pattern': '^/admin/user$', 'count': 1})
+        self.assertTrue(data['data']['armed'])
+
+        # doesn't match
+        self.test_client_app.get('/admin/stats', headers=self.headers)
+        self.assertEqual(profiler.files(), [])
+
+        self.test_client_app.get('/admin/user', headers=self.headers)
+        self.assertFalse(profiler.armed)
+        self.test_client_app.get('/admin/user', headers=self.headers)
+
+        files = json.loads(self.test_client_app.get('/admin/profile', headers=self.headers).get_data())['files']
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith('-get_admin_users.pstats'))
+
+        stats = pstats.Stats(profiler.path(files[0]))
+        self.assertIn('get_admin_users', {x[2] for x in stats.stats})
+
+        response = self.test_client_app.get('/admin/profile/' + files[0], headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.test_client_app.get('/admin/profile/..%2F' + files[0], headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(profiler.path('../settings.py'))
+
+    def test_sampler(self):
+        thread = threading.Thread(target=busy, args=(0.2,), name='busy')
+        sampler = StackSampler(interval=0.001, thread_ids=None)
+        sampler.start()
+        thread.start()
+        thread.join()
+        sampler.stop()
+
+        self.assertGreater(sampler.samples, 0)
+        busy_stacks = [x for x in sampler.collapsed().splitlines() if x.startswith('busy;')]
+        self.assertTrue(busy_stacks)
+        stack, count = busy_stacks[0].rsplit(' ', 1)
+        self.assertTrue(stack.endswith('tests/profiler.py:busy'))
+        self.assertNotIn('stack-sampler', sampler.collapsed())
+
+    def test_sample_worker(self):
+        data = self.post('/admin/profile/sample', {'seconds': 0.1})
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(self.post('/admin/profile/sample', {'seconds': 0.1})['message'], 'already sampling')
+        self.assertEqual(self.post('/admin/profile/sample', {'seconds': 1000})['status'], 'error')
+        self.assertEqual(self.post('/admin/profile/sample', {'seconds': 0.1, 'interval': 0})['status'], 'error')
+
+        busy(0.3)
+        self.assertEqual(profiler.files(), [data['file']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import unittest
+
+from sqlalchemy import inspect
+
+from tests import DatabaseTestBase
+from app import db
+from models import User, Company, Benchmark, Product, ProductFacet, Impact, ImpactAnswer, CatalogImpact, catalog_impact_hash
+from lib.auth import create_user_access_token
+import lib.query_profiles as query_profiles
+
+
+def columns(query):
+    """
+    the 'table.column's the query selects
+    """
+    return {'{}.{}'.format(x.table.name, x.name) for x in query.statement.inner_columns}
+
+
+class TestQueryProfiles(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        company = Company(name='Acme', description='a long story')
+        benchmark = Benchmark(year='2021', company=company)
+        product = Product(name='Widget', description='another long story', benchmark=benchmark)
+        catalog_impact = CatalogImpact(key_hash=catalog_impact_hash('PP01.01', 'Energy'),
+                                       pp_action='PP01.01', option_text='Energy')
+        impact = Impact(product=product, property_code='X-1.1', pp_action='PP01.01',
+                        option_code='X1-1', catalog_impact=catalog_impact)
+        answer = ImpactAnswer(impact=impact, number='A-2', text='some text')
+        db.session.add_all([company, benchmark, product, catalog_impact, impact, answer])
+        db.session.commit()
+        db.session.expunge_all()
+
+    def test_large_columns_deferred(self):
+        self.assertNotIn('company.description', columns(Company.query))
+        self.assertNotIn('product.description', columns(Product.query))
+        self.assertNotIn('impact_answer.text', columns(ImpactAnswer.query))
+
+        # but still there when read
+        company = Company.query.one()
+        self.assertIn('description', inspect(company).unloaded)
+        self.assertEqual(company.description, 'a long story')
+
+    def test_admin_companies(self):
+        self.assertEqual(columns(Company.query.options(*query_profiles.admin_companies)), {
+            'company.id', 'company.name', 'company.intro_complete', 'company.description',
+            'company.industry_type', 'company.business_model', 'company.hidden',
+            'company.logo_hash', 'company.logo_thumb_hash', 'company.logo_file_extension',
+        })
+
+    def test_investor_reports(self):
+        benchmark = Benchmark.query.options(*query_profiles.investor_reports).join(Company).one()
+        self.assertNotIn('description', inspect(benchmark.company).unloaded)
+        self.assertNotIn('description', inspect(benchmark.products[0]).unloaded)
+        self.assertIn('catalog_impact', inspect(benchmark.products[0].impacts[0]).unloaded)
+
+    def test_products(self):
+        self.assertIn('product.description', columns(Product.query.options(*query_profiles.products)))
+
+    def test_impact_progress(self):
+        self.assertEqual(columns(Impact.query.options(*query_profiles.impact_progress)),
+                         {'impact.id', 'impact.active', 'impact.answers_json'})
+
+        # and the answer rows aren't eagerly loaded along with them
+        impact = Impact.query.options(*query_profiles.impact_progress).one()
+        self.assertIn('answers', inspect(impact).unloaded)
+
+    def test_impact_text(self):
+        impact = Impact.query.options(*query_profiles.impact_text).one()
+        self.assertNotIn('catalog_impact', inspect(impact).unloaded)
+        self.assertEqual(impact.option_text, 'Energy')
+
+    def test_catalog_impact_intern(self):
+        ids = CatalogImpact.intern([('PP01.01', 'Energy'), ('PP01.01', 'Water'), ('PP02.01', 'Energy')])
+        self.assertEqual(ids[('PP01.01', 'Energy')], CatalogImpact.query.filter_by(option_text='Energy').first().id)
+        self.assertEqual(len(set(ids.values())), 3)
+
+        # the same ids again, nothing added
+        self.assertEqual(CatalogImpact.intern(list(ids)), ids)
+        self.assertEqual(CatalogImpact.query.count(), 3)
+        self.assertEqual(CatalogImpact.intern([]), {})
+
+    def test_catalog_impact_lookup(self):
+        self.assertEqual(CatalogImpact.lookup([('PP01.01', 'Energy'), ('PP01.01', 'Water')]),
+                         {('PP01.01', 'Energy'): CatalogImpact.query.one().id})
+        self.assertEqual(CatalogImpact.query.count(), 1)
+
+    def test_setup_preview_adds_nothing(self):
+        product = Product.query.one()
+        user = User(email='crud@test.com', password='x', company_id=product.benchmark.company_id,
+                    benchmark_id=product.benchmark_id)
+        db.session.add(user)
+        db.session.add_all([ProductFacet(product_id=product.id, code=x) for x in ['F-1.2', 'F-3.2']])
+        db.session.commit()
+        with self.app.test_request_context():
+            headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(user))}
+
+        url = '/product/{}/setup/2/'.format(product.id)
+        response = self.test_client_app.post(url + 'preview', headers=headers, json={'data': ['X-1.1', 'X1-1']})
+        preview = json.loads(response.get_data())['data']['impacts']
+        self.assertEqual([x['pp'] for x in preview['X-1.1']['added']], ['PP01.02'])
+        self.assertEqual(CatalogImpact.query.count(), 1)
+        self.assertEqual(Impact.query.count(), 1)
+
+        self.test_client_app.post(url, headers=headers, json={'data': ['X-1.1', 'X1-1']})
+        self.assertEqual(CatalogImpact.query.count(), 2)
+        self.assertEqual(Impact.query.filter_by(pp_action='PP01.02').count(), 1)
+
+        # saved, so nothing to add now
+        response = self.test_client_app.post(url + 'preview', headers=headers, json={'data': ['X-1.1', 'X1-1']})
+        self.assertEqual(json.loads(response.get_data())['data']['impacts']['X-1.1']['added'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import unittest
+from unittest import mock
+
+from tests import DatabaseTestBase
+from app import db
+from models import User, Product, Impact
+from lib.query_stats import statement_shape, query_stats, assert_max_queries
+from lib.synthetic import generate_data, TESTER_EMAIL
+
+# query budgets for the generate_data(companies=3, products=3, seed=1) data,
+# raise one only along with a reason
+budgets = {
+    '/product': 14,
+    '/product/{product_id}/impacts': 12,
+    '/be': 1,
+    '/report/pp': 21,
+    '/report/be': 1,
+    '/investor/reports': 17,
+    '/admin/company': 17,
+}
+
+
+class TestQueryStats(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self._rounds = self.app.config['BCRYPT_LOG_ROUNDS']
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 4
+        generate_data(companies=3, products=3, seed=1)
+
+    def tearDown(self):
+        self.app.config['BCRYPT_LOG_ROUNDS'] = self._rounds
+        super().tearDown()
+
+    def login(self):
+        response = self.test_client_app.post('/login', json={'email': TESTER_EMAIL, 'password': '123456'})
+        return {'Authorization': 'Bearer {}'.format(json.loads(response.get_data())['access_token'])}
+
+    def test_statement_shape(self):
+        self.assertEqual(statement_shape('SELECT a FROM t\n WHERE t.id IN (?, ?, ?) AND t.b = 12'),
+                         'SELECT a FROM t WHERE t.id IN (?...) AND t.b = ?')
+        self.assertEqual(statement_shape("SELECT * FROM t_1 WHERE x = 'it''s' LIMIT %s"),
+                         'SELECT * FROM t_1 WHERE x = ? LIMIT ?')
+
+    def test_n_plus_one(self):
+        with query_stats.capture() as stats:
+            for impact in Impact.query.all():
+                impact.sdgs
+
+        impacts = Impact.query.count()
+        self.assertEqual(stats.queries, impacts + 1)
+        (shape, count), = stats.n_plus_one(5)
+        self.assertEqual(count, impacts)
+        self.assertIn('FROM impact_sdg', shape)
+
+        with self.assertRaises(AssertionError):
+            with assert_max_queries(impacts * 2, check_n_plus_one=True):
+                for impact in Impact.query.all():
+                    impact.sdgs
+
+        with self.assertRaises(AssertionError):
+            with assert_max_queries(1):
+                Impact.query.all()
+                Product.query.all()
+
+    def test_headers_and_log(self):
+        headers = self.login()
+
+        with mock.patch.object(query_stats, 'headers', True):
+            response = self.test_client_app.get('/admin/company', headers=headers)
+        self.assertGreater(int(response.headers['X-Query-Count']), 1)
+        self.assertIn('db;dur=', response.headers['Server-Timing'])
+        self.assertIn('X-Query-N-Plus-One', response.headers)
+
+        with mock.patch.object(query_stats, 'headers', False), self.assertLogs('lib.query_stats', 'WARNING') as logs:
+            response = self.test_client_app.get('/admin/company', headers=headers)
+        self.assertNotIn('X-Query-Count', response.headers)
+        info = json.loads(logs.records[0].getMessage())
+        self.assertEqual(info['endpoint'], 'get_companies')
+        self.assertTrue(info['n_plus_one'])
+
+    def test_budgets(self):
+        headers = self.login()
+        tester = User.query.filter_by(email=TESTER_EMAIL).one()
+        product_id = db.session.query(Impact.product_id).join(Product).\
+            filter(Product.benchmark_id == tester.benchmark_id).first()[0]
+
+        for url, budget in budgets.items():
+            with assert_max_queries(budget):
+                response = self.test_client_app.get(url.format(product_id=product_id), headers=headers)
+            self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+import unittest
+from unittest import mock
+
+from tests import DatabaseTestBase
+from app import db
+from models import User
+from lib.auth import create_user_access_token
+from lib.slow_queries import slow_queries, logger, format_params
+
+
+class TestSlowQueries(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User(email='admin@test.com', password='x', admin=True)
+        db.session.add(self.admin)
+        db.session.commit()
+        with self.app.test_request_context():
+            self.headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(self.admin))}
+
+    def test_request_slow_queries(self):
+        with mock.patch.object(slow_queries, 'threshold', 1e-9), mock.patch.object(slow_queries, 'explain_rate', 1.0):
+            with self.assertLogs('lib.slow_queries', logging.WARNING) as logs:
+                response = self.test_client_app.get('/admin/stats', headers={**self.headers, 'X-Request-Id': 'abc123'})
+
+        self.assertEqual(response.headers['X-Request-Id'], 'abc123')
+        queries = [json.loads(x.getMessage()) for x in logs.records]
+        users = [x for x in queries if 'FROM user' in x['statement'] and 'admin' in x['statement']][0]
+        self.assertEqual(users['request_id'], 'abc123')
+        self.assertEqual(users['endpoint'], 'get_admin_stats')
+        self.assertTrue(users['location'][0].startswith('views/admin.py:'))
+        # admin = 1 is inlined
+        self.assertEqual(users['params'], [])
+        self.assertIn('detail', users['explain'][0])
+
+        # a new one when the proxy doesn't send it
+        response = self.test_client_app.get('/admin/stats', headers=self.headers)
+        self.assertEqual(len(response.headers['X-Request-Id']), 32)
+
+    def test_not_slow(self):
+        with mock.patch.object(slow_queries, 'threshold', 1000):
+            with mock.patch.object(logger, 'warning') as warning:
+                User.query.all()
+        warning.assert_not_called()
+
+    def test_format_params(self):
+        self.assertEqual(format_params(('x' * 300, 2), False), [repr('x' * 300)[:200] + '...', '2'])
+        self.assertEqual(format_params({'a': None}, False), {'a': 'None'})
+        self.assertEqual(format_params([(1,), (2,)], True), {'first': ['1'], 'sets': 2})
+
+    def test_log_file(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'logs', 'slow.log')
+        handlers, propagate, level = list(logger.handlers), logger.propagate, logger.level
+        try:
+            slow_queries.log_to(path, max_bytes=1000, backups=2)
+            with mock.patch.object(slow_queries, 'threshold', 1e-9):
+                for _ in range(5):
+                    User.query.filter_by(email='admin@test.com').all()
+
+            with open(path) as f:
+                line = json.loads(f.readline())
+            self.assertEqual(line['event'], 'slow_query')
+            self.assertEqual(line['params'], [repr('admin@test.com')])
+            self.assertNotIn('request_id', line)
+            self.assertTrue(os.path.exists(path + '.1'))
+        finally:
+            slow_queries._file_handler.close()
+            slow_queries._file_handler = None
+            logger.handlers, logger.propagate = handlers, propagate
+            logger.setLevel(level)
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from tests import DatabaseTestBase
+from app import db
+from models import User, Company, Product, Impact, BreakEven
+from lib.impact import get_impact_question_lookup, get_impact_percent_complete_stats
+from lib.synthetic import generate_data, TESTER_EMAIL
+
+
+class TestSyntheticData(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        self._rounds = self.app.config['BCRYPT_LOG_ROUNDS']
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 4
+
+    def tearDown(self):
+        self.app.config['BCRYPT_LOG_ROUNDS'] = self._rounds
+        super().tearDown()
+
+    def test_generate(self):
+        counts = generate_data(companies=3, products=3, fill=1, seed=2)
+        self.assertEqual(counts['companies'], 3)
+        self.assertEqual(counts['users'], 4)
+        self.assertEqual(Product.query.count(), counts['products'])
+        self.assertEqual(Impact.query.count(), counts['impacts'])
+        self.assertEqual(BreakEven.query.count(), counts['break_evens'])
+        self.assertGreater(counts['impacts'], 0)
+
+        tester = User.query.filter_by(email=TESTER_EMAIL).one()
+        self.assertTrue(tester.admin)
+
+        # every impact answered, and answered completely
+        question_lookup = get_impact_question_lookup()
+        for impact in Impact.query:
+            self.assertTrue(impact.option_text)
+            self.assertEqual(get_impact_percent_complete_stats(question_lookup, impact)['percent_complete'], 100)
+
+        # runs again on top, without another tester
+        counts = generate_data(companies=1, products=1, fill=0, seed=2)
+        self.assertEqual(counts['users'], 1)
+        self.assertEqual(Company.query.count(), 4)
+        self.assertEqual(User.query.filter_by(email='user3@example.com').count(), 1)
+
+    def test_same_seed_same_data(self):
+        generate_data(companies=2, seed=5, tester=False)
+        first = [(x.name, x.code, len(x.impacts)) for x in Product.query.order_by(Product.id)]
+        self.assertTrue(first)
+
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        generate_data(companies=2, seed=5, tester=False)
+        again = [(x.name, x.code, len(x.impacts)) for x in Product.query.order_by(Product.id)]
+        self.assertEqual(again, first)
+
+
+if __name__ == '__main__':
+    unittest.main()
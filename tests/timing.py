@@ -0,0 +1,98 @@
+import os
+import json
+import unittest
+from unittest import mock
+
+from tests import DatabaseTestBase
+from app import db
+from models import User
+from lib.auth import create_user_access_token
+from lib.timing import Timings, timings, span, timed
+
+
+class TestTiming(DatabaseTestBase):
+    def setUp(self):
+        super().setUp()
+        timings.reset()
+
+    def test_histogram(self):
+        t = Timings()
+        for seconds in [0.00005, 0.003, 0.003, 20]:
+            t.observe('report', seconds)
+
+        cumulative, count, total = t.snapshot()['report']
+        self.assertEqual(count, 4)
+        self.assertAlmostEqual(total, 20.00605)
+        # <= 0.1ms, <= 5ms and the +Inf bucket
+        self.assertEqual(cumulative[0], 1)
+        self.assertEqual(cumulative[5], 3)
+        self.assertEqual(cumulative[-2], 3)
+        self.assertEqual(cumulative[-1], 4)
+
+        text = t.prometheus()
+        self.assertIn('# TYPE ibt_span_seconds histogram', text)
+        worker = os.getpid()
+        self.assertIn('ibt_span_seconds_bucket{{span="report",worker="{}",le="0.005"}} 3'.format(worker), text)
+        self.assertIn('ibt_span_seconds_bucket{{span="report",worker="{}",le="+Inf"}} 4'.format(worker), text)
+        self.assertIn('ibt_span_seconds_count{{span="report",worker="{}"}} 4'.format(worker), text)
+
+    def test_span_and_timed(self):
+        @timed('test.add')
+        def add(a, b):
+            return a + b
+
+        self.assertEqual(add(1, 2), 3)
+        with span('test.block'):
+            pass
+        with self.assertRaises(ValueError):
+            with span('test.block'):
+                raise ValueError()
+
+        snapshot = timings.snapshot()
+        self.assertEqual(snapshot['test.add'][1], 1)
+        self.assertEqual(snapshot['test.block'][1], 2)
+
+    def test_disabled(self):
+        with mock.patch.object(timings, 'enabled', False):
+            def add(a, b):
+                return a + b
+
+            self.assertIs(timed('test.add')(add), add)
+            with span('test.block'):
+                pass
+
+        self.assertEqual(timings.snapshot(), {})
+
+    def test_metrics(self):
+        admin = User(email='admin@test.com', password='x', admin=True)
+        user = User(email='crud@test.com', password='x')
+        db.session.add_all([admin, user])
+        db.session.commit()
+
+        with self.app.test_request_context():
+            headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(user))}
+            admin_headers = {'Authorization': 'Bearer {}'.format(create_user_access_token(admin))}
+
+        data = json.loads(self.test_client_app.get('/admin/metrics', headers=headers).get_data())
+        self.assertEqual(data['status'], 'error')
+
+        response = self.test_client_app.get('/admin/metrics', headers=admin_headers)
+        self.assertEqual(response.mimetype, 'text/plain')
+        # the first request is in by now
+        self.assertIn('span="request.get_metrics"', response.get_data(as_text=True))
+
+    def test_metrics_token(self):
+        self.assertEqual(self.test_client_app.get('/admin/metrics').status_code, 401)
+
+        with mock.patch('config.settings.METRICS_TOKEN', 'scrape'):
+            response = self.test_client_app.get('/admin/metrics', headers={'Authorization': 'Bearer scrape'})
+            self.assertEqual(response.mimetype, 'text/plain')
+            self.assertEqual(self.test_client_app.get('/admin/metrics', headers={'Authorization': 'Bearer crud'}).status_code, 422)
+
+        # no token set, no way in without a login
+        response = self.test_client_app.get('/admin/metrics', headers={'Authorization': 'Bearer '})
+        self.assertNotEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from unittest import mock
+
+from tests import DatabaseTestBase
+from app import app, db
+from lib.catalog import catalog
+from lib.warmup import warm_master, warm_worker, pool_connections
+
+
+class TestWarmup(DatabaseTestBase):
+    def test_warm_master(self):
+        warm_master(app)
+        payloads = catalog.current().payloads
+        self.assertEqual(set(payloads._payloads), set(payloads.names()))
+
+    def test_warm_worker(self):
+        with mock.patch.object(db.engine, 'dispose', wraps=db.engine.dispose) as dispose:
+            self.assertEqual(warm_worker(app, db, threads=4), 1)
+        dispose.assert_called_once_with()
+        self.assertTrue(app._got_first_request)
+
+    def test_pool_connections(self):
+        engine = mock.Mock()
+        engine.pool.size.return_value = 5
+        self.assertEqual(pool_connections(engine, 8), 5)
+        self.assertEqual(pool_connections(engine, 2), 2)
+        engine.pool = object()
+        self.assertEqual(pool_connections(engine, 8), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 import uuid
 
-from app import bcrypt
+from lib.passwords import password_pool
 
 
 def reporting_period_format(benchmark):
@@ -18,7 +18,7 @@ def sdg_key(key):
 def new_bcrypt_password(pw=None):
     if not pw:
         pw = random_uuid_code()
-    return bcrypt.generate_password_hash(pw).decode('utf - 8')
+    return password_pool.hash(pw)
 
 
 def random_uuid_code(length=10):
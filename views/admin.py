@@ -1,16 +1,28 @@
+import hmac
 import json
 
-from flask import jsonify, request
-from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
+from flask import request, make_response, send_file
+from flask_jwt_extended import jwt_required, verify_jwt_in_request
 
-from app import app, bcrypt, db
+from app import app, bcrypt, db, settings
 from models import User, Company, Benchmark, Product, Impact
 import utils as utils
+import lib.query_profiles as query_profiles
+from lib.catalog import catalog, CatalogError
+from lib.auth import current_user_is_admin
 from lib.email import send_reset_password_email, send_welcome_email
+from lib.onboarding import read_onboarding_csv, onboard_users
+from lib.passwords import password_pool, PasswordPoolBusy
+from lib.timing import timings
+from lib.memory import memory
+from lib.profiler import profiler, ProfilerError
+from lib.database import read_replica
+from lib.json_provider import jsonify
 
 
 @app.route('/admin/stats', methods=['GET'])
 @jwt_required
+@read_replica
 def get_admin_stats():
     total_users = User.query.count()
     admin_users = User.query.filter_by(admin=True).count()
@@ -26,6 +38,8 @@ def get_admin_stats():
         'companies': companies,
         'products': products,
         'impacts': impacts,
+        # for the worker process that answered
+        'password_pool': password_pool.stats(),
     }
 
     return jsonify(data)
@@ -87,7 +101,10 @@ def save_user():
         user = User.query.get(data['id'])
     else:
         user = User()
-        user.password = utils.new_bcrypt_password()
+        try:
+            user.password = utils.new_bcrypt_password()
+        except PasswordPoolBusy:
+            return jsonify({'status': 'error', 'message': 'Busy, try again in a moment'}), 503, {'Retry-After': '5'}
 
     # required
     if data['email']:
@@ -118,6 +135,47 @@ def save_user():
     return jsonify(response)
 
 
+@app.route('/admin/onboard', methods=['POST'])
+@jwt_required
+def onboard():
+    """
+    bulk create users & their companies from a csv (see lib/onboarding),
+    either uploaded as 'file' or as text in data, ?welcome=false to not email them
+    and ?dry_run=true to only check the csv
+    """
+    if not current_user_is_admin():
+        return jsonify({'status': 'error', 'message': 'Incorrect permissions'})
+
+    upload = request.files.get('file')
+    if upload:
+        text = upload.read().decode('utf-8-sig')
+    else:
+        text = (request.json or {}).get('data') or ''
+
+    rows = read_onboarding_csv(text)
+    if not rows:
+        return jsonify({'status': 'error', 'message': 'no users in the csv'})
+
+    dry_run = request.args.get('dry_run') == 'true'
+    if not dry_run and len(rows) > settings.ONBOARDING_REQUEST_MAX_ROWS:
+        return jsonify({'status': 'error', 'message': 'over {} users, use flask onboard-users for this csv'.format(
+            settings.ONBOARDING_REQUEST_MAX_ROWS)})
+
+    try:
+        # one at a time, so the logins get the other pool processes meanwhile
+        result = onboard_users(rows, send_welcome=request.args.get('welcome') != 'false', dry_run=dry_run,
+                               hasher=lambda passwords: [password_pool.hash(x) for x in passwords])
+    except PasswordPoolBusy:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': 'Busy, try again in a moment'}), 503, {'Retry-After': '5'}
+
+    return jsonify({
+        'status': 'success',
+        'message': '{} users added'.format(result['users']),
+        'data': result
+    })
+
+
 @app.route('/admin/user/delete/<int:id>', methods=['GET'])
 @jwt_required
 def delete_user(id):
@@ -131,8 +189,9 @@ def delete_user(id):
 
 @app.route('/admin/company', methods=['GET'])
 @jwt_required
+@read_replica
 def get_companies():
-    companies = Company.query.all()
+    companies = Company.query.options(*query_profiles.admin_companies).all()
     data = []
     for c in companies:
         # they only ever have one for now..
@@ -145,7 +204,7 @@ def get_companies():
             total = len(impacts)
             count = 0
             for imp in impacts:
-                if imp.answers:
+                if imp.has_answers():
                     count += 1
             if total == count:
                 pp_finished += 1
@@ -155,7 +214,7 @@ def get_companies():
             pp_percent = round((pp_finished / pp_total) * 100)
 
         be_total = len(b.break_evens)
-        be_finished = len([be for be in b.break_evens if be.answers])
+        be_finished = len([be for be in b.break_evens if be.has_answers()])
         be_percent = 0
         if be_finished and be_total:
             be_percent = round((be_finished / be_total) * 100)
@@ -241,7 +300,10 @@ def send_email(type, user_id):
     user = User.query.get(user_id)
     res = {'status': 'error', 'message': 'error sending email'}
     pw = utils.random_uuid_code()
-    bcrypt_pw = utils.new_bcrypt_password(pw)
+    try:
+        bcrypt_pw = utils.new_bcrypt_password(pw)
+    except PasswordPoolBusy:
+        return jsonify({'status': 'error', 'message': 'Busy, try again in a moment'}), 503, {'Retry-After': '5'}
     print(user)
 
     if type == 'welcome':
@@ -256,3 +318,114 @@ def send_email(type, user_id):
         res = {'status': 'success', 'message': 'reset email sent'}
 
     return jsonify(res)
+
+
+@app.route('/admin/catalog', methods=['GET'])
+@jwt_required
+def get_catalog_status():
+    return jsonify({'status': 'success', 'data': catalog.status()})
+
+
+@app.route('/admin/catalog/reload', methods=['POST'])
+@jwt_required
+def reload_catalog():
+    """
+    re parse the csvs in data/ and swap them in for this worker,
+    other workers pick changes up with CATALOG_WATCH_INTERVAL
+    """
+    if not current_user_is_admin():
+        return jsonify({'status': 'error', 'message': 'Incorrect permissions'})
+
+    try:
+        catalog.reload()
+    except CatalogError as e:
+        return jsonify({'status': 'error', 'message': str(e), 'data': catalog.status()})
+
+    return jsonify({'status': 'success', 'message': 'catalog reloaded', 'data': catalog.status()})
+
+
+def metrics_token_sent():
+    token = settings.METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token)
+
+
+@app.route('/admin/metrics', methods=['GET'])
+def get_metrics():
+    """
+    the span & request timing histograms & the sampled request memory peaks
+    in the prometheus text format, for the worker process that answered
+    (labelled with its pid, see lib/timing). a scraper sends METRICS_TOKEN as
+    its bearer token, otherwise it takes an admin login
+    """
+    if not metrics_token_sent():
+        verify_jwt_in_request()
+        if not current_user_is_admin():
+            return jsonify({'status': 'error', 'message': 'Incorrect permissions'})
+
+    res = make_response(timings.prometheus() + memory.prometheus())
+    res.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return res
+
+
+@app.route('/admin/profile', methods=['GET'])
+@jwt_required
+def get_profile_status():
+    """
+    the profiler state for the worker that answered, and the profiles saved
+    """
+    if not current_user_is_admin():
+        return jsonify({'status': 'error', 'message': 'Incorrect permissions'})
+
+    return jsonify({'status': 'success', 'data': profiler.status(), 'files': profiler.files()})
+
+
+@app.route('/admin/profile/requests', methods=['POST'])
+@jwt_required
+def profile_requests():
+    """
+    profile the next count requests matching pattern (a regex on the path) in
+    this worker, {"data": {"pattern": "^/report/pp", "count": 5, "mode": "cprofile"}},
+    mode cprofile saves .pstats files and sample .collapsed ones, count 0 disarms
+    """
+    if not current_user_is_admin():
+        return jsonify({'status': 'error', 'message': 'Incorrect permissions'})
+
+    data = request.json.get('data') or {}
+    try:
+        profiler.arm(data.get('pattern') or '.', int(data.get('count', 1)), data.get('mode', 'cprofile'))
+    except (ProfilerError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+    return jsonify({'status': 'success', 'data': profiler.status()})
+
+
+@app.route('/admin/profile/sample', methods=['POST'])
+@jwt_required
+def profile_sample():
+    """
+    sample every thread in this worker for {"data": {"seconds": 10}}, the
+    .collapsed file is there once it's done
+    """
+    if not current_user_is_admin():
+        return jsonify({'status': 'error', 'message': 'Incorrect permissions'})
+
+    data = request.json.get('data') or {}
+    try:
+        name = profiler.sample(float(data.get('seconds', 10)), interval=float(data.get('interval', 0.005)))
+    except (ProfilerError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+    return jsonify({'status': 'success', 'file': name, 'data': profiler.status()})
+
+
+@app.route('/admin/profile/<name>', methods=['GET'])
+@jwt_required
+def download_profile(name):
+    if not current_user_is_admin():
+        return jsonify({'status': 'error', 'message': 'Incorrect permissions'})
+
+    path = profiler.path(name)
+    if not path:
+        return jsonify({'status': 'error', 'message': 'no profile'}), 404
+
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True, attachment_filename=name)
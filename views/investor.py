@@ -1,16 +1,20 @@
 import json
 
-from flask import jsonify, request
+from flask import request
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
 
 from app import app, bcrypt, db, app_ids
 from models import User, Company, Benchmark, Product, Impact
 import utils as utils
+import lib.query_profiles as query_profiles
 from lib.impact import get_impact_percent_complete_stats, get_impact_question_lookup
+from lib.database import read_replica
+from lib.json_provider import jsonify
 
 
 @app.route('/investor/reports', methods=['GET'])
 @jwt_required
+@read_replica
 def get_investor_reports():
 
     companies = []
@@ -21,6 +25,7 @@ def get_investor_reports():
     question_lookup = get_impact_question_lookup()
 
     benchmarks = Benchmark.query.\
+        options(*query_profiles.investor_reports).\
         join(Company).\
         filter(Company.hidden != True).\
         all()
@@ -34,7 +39,7 @@ def get_investor_reports():
 
 
         be_total = len([x for x in b.break_evens if x.applicable])
-        be_finished = len([x for x in b.break_evens if (x.applicable and len(x.answers))])
+        be_finished = len([x for x in b.break_evens if (x.applicable and x.has_answers())])
 
         if be_finished:
             be_progress = (be_finished / be_total) * 100
@@ -48,7 +53,7 @@ def get_investor_reports():
             finished_count = 0
             for impact in p.impacts:
                 if impact.active:
-                    stats = get_impact_percent_complete_stats(question_lookup, impact.id)
+                    stats = get_impact_percent_complete_stats(question_lookup, impact)
                     if stats['percent_complete'] == 100:
                         finished_count += 1
 
@@ -129,6 +134,7 @@ def get_investor_reports():
 
 @app.route('/investor/stats', methods=['GET'])
 @jwt_required
+@read_replica
 def get_investor_stats():
     total_users = User.query.count()
     admin_users = User.query.filter_by(admin=True).count()
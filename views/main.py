@@ -6,8 +6,10 @@ import json
 import random
 from datetime import datetime
 
-from flask import jsonify, request, render_template, session, make_response, Response, send_file
-from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
+from flask import request, render_template, session, make_response, Response, send_file,\
+    redirect, url_for
+from flask_jwt_extended import jwt_required
+from sqlalchemy.orm import joinedload
 
 from app import app, bcrypt, settings, db
 from lib.impact import surveys, get_impact_description
@@ -15,8 +17,17 @@ from models import User, Company, Product, Benchmark, ProductFacet,\
     ProductProperty, ProductPropertyAnswer, Impact, ImpactSdg, ImpactAnswer,\
     BreakEven, BreakEvenAnswer
 from lib.email import send_reset_password_email
+from lib.auth import create_user_access_token, get_current_user, get_current_benchmark,\
+    get_current_benchmark_id, get_current_company, claims_checked
+from lib.passwords import password_pool, PasswordPoolBusy
+from lib.blob_store import get_blob_store
+from lib.logos import store_logo, logo_content_type, LogoError
 
 import utils as utils
+import lib.query_profiles as query_profiles
+from lib.timing import span, timed
+from lib.database import read_replica
+from lib.json_provider import jsonify
 
 if settings.DEBUG:
     import ssl
@@ -125,17 +136,17 @@ def reset_password():
 
     if user:
         try:
+            # queued, the mail worker does the sending
             new_password = utils.random_uuid_code()
             send_reset_password_email(email, new_password)
             user.password = utils.new_bcrypt_password(new_password)
             db.session.commit()
             data['message'] = 'email sent'
         except Exception as e:
-            time.sleep(2)
+            db.session.rollback()
             data = {'status': 'error', 'message': 'error sending email'}
             print(e)
     else:
-        time.sleep(2)
         data = {'status': 'error', 'message': 'email not found'}
 
     return jsonify(data)
@@ -152,14 +163,27 @@ def login():
     if not email or not password:
         return jsonify({"message": "Missing username/password"})
 
-    user = User.query.filter_by(email=email).first()
-    if not user or not bcrypt.check_password_hash(user.password, password):
+    user = User.query.options(joinedload(User.company)).filter_by(email=email).first()
+    if not user:
         return jsonify({"message": "Invalid username/password"})
 
+    try:
+        matches, new_hash = password_pool.check(user.password, password)
+    except PasswordPoolBusy:
+        return jsonify({"message": "Too many logins right now, try again in a moment"}), 503, {'Retry-After': '5'}
+
+    if not matches:
+        return jsonify({"message": "Invalid username/password"})
+
+    if new_hash:
+        # BCRYPT_LOG_ROUNDS changed since this one was hashed
+        user.password = new_hash
+        db.session.commit()
+
     if (app == 'admin' and not user.admin) or (app == 'investor' and not user.investor):
         return jsonify({"message": "Incorrect permissions"})
 
-    access_token = create_access_token(identity=email)
+    access_token = create_user_access_token(user)
 
     res = {
         'access_token': access_token,
@@ -181,7 +205,7 @@ def login():
 @jwt_required
 def company_info():
     response = {'status': 'error', 'message': 'no company'}
-    user = User.query.filter_by(email=get_jwt_identity()).first()
+    user = get_current_user()
     company = user.company
     b = user.benchmark
 
@@ -200,13 +224,14 @@ def company_info():
                 'reporting_period': utils.reporting_period_format(b),
             }
         }
+        response['company'].update(company_logo_urls(company))
     return jsonify(response)
 
 
 @app.route('/user/welcome_complete', methods=['GET'])
 @jwt_required
 def welcome_complete():
-    user = User.query.filter_by(email=get_jwt_identity()).first()
+    user = get_current_user()
     user.welcome = True
     db.session.commit()
     return jsonify({'status': 'success'})
@@ -215,7 +240,7 @@ def welcome_complete():
 @app.route('/benchmark/status', methods=['GET'])
 @jwt_required
 def get_benchmark_status():
-    user = User.query.filter_by(email=get_jwt_identity()).first()
+    user = get_current_user()
 
     return jsonify({
         'status': 'success',
@@ -225,8 +250,9 @@ def get_benchmark_status():
 
 @app.route('/benchmark/status', methods=['POST'])
 @jwt_required
+@claims_checked
 def update_benchmark_status():
-    user = User.query.filter_by(email=get_jwt_identity()).first()
+    user = get_current_user()
     approved = request.json.get('approved', False)
     user.benchmark.approved = approved
     stamp = time.time()
@@ -242,8 +268,7 @@ def update_benchmark_status():
 @app.route('/user/profile', methods=['GET'])
 @jwt_required
 def get_profile():
-    email = get_jwt_identity()
-    user = User.query.filter_by(email=email).first()
+    user = get_current_user()
 
     return jsonify({
         'email': user.email,
@@ -254,12 +279,12 @@ def get_profile():
 
 @app.route('/user/profile', methods=['POST'])
 @jwt_required
+@claims_checked
 def update_profile():
-    email = get_jwt_identity()
     data = request.json.get('data')
     total_revenue = data.get('total_revenue')
 
-    user = User.query.filter_by(email=email).first()
+    user = get_current_user()
     user.email = data['email']
     user.first = data.get('first')
     user.last = data.get('last')
@@ -267,9 +292,15 @@ def update_profile():
     pw = data.get('password')
     new_pw = data.get('new_password')
     if pw and new_pw:
-        if bcrypt.check_password_hash(user.password, pw):
-            user.password = utils.new_bcrypt_password(new_pw)
-        else:
+        try:
+            matches, _ = password_pool.check(user.password, pw)
+            if matches:
+                user.password = password_pool.hash(new_pw)
+        except PasswordPoolBusy:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': ['Busy, try again in a moment']}), 503, {'Retry-After': '5'}
+
+        if not matches:
             return jsonify({'status': 'error', 'message': ['Wrong password']})
 
     db.session.commit()
@@ -280,8 +311,7 @@ def update_profile():
 @app.route('/company/profile', methods=['GET'])
 @jwt_required
 def get_benchmark():
-    email = get_jwt_identity()
-    user = User.query.filter_by(email=email).first()
+    user = get_current_user()
     warnings = []
     if user.benchmark.total_revenue == 0:
         warnings.append('Total revenue is 0')
@@ -308,10 +338,11 @@ def get_benchmark():
 
 @app.route('/company/profile', methods=['POST'])
 @jwt_required
+@claims_checked
 def update_benchmark():
     data = request.json.get('data')
     total_revenue = data.get('total_revenue')
-    user = User.query.filter_by(email=get_jwt_identity()).first()
+    user = get_current_user()
 
     company = user.company
     company.name = data['name']
@@ -335,25 +366,72 @@ def update_benchmark():
 @app.route('/company/db/img/<company_id>')
 def serve_db_company_image(company_id):
     """
-    stream a company db blob image to the browser
+    the current logo for a company (?thumb=true for the thumbnail), redirects
+    to the content addressed url, which is the one that can be cached
     """
-    company = Company.query.get(company_id)
+    company = db.session.query(Company.logo_hash, Company.logo_thumb_hash, Company.logo_file_extension).\
+        filter_by(id=company_id).first()
+
+    if not company or not company.logo_hash:
+        return jsonify({'status': 'error', 'message': 'no logo'}), 404
 
-    if not company.logo:
-        return
+    urls = company_logo_urls(company)
+    url = urls['logo_thumb_url'] if request.args.get('thumb') == 'true' else urls['logo_url']
+
+    response = redirect(url)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/company/logo/<key>.<extension>', methods=['GET'])
+def serve_company_logo(key, extension):
+    """
+    a logo by its hash, the bytes for a hash never change so it's cached for good
+    """
+    if not re.match('^[0-9a-f]{64}$', key):
+        return jsonify({'status': 'error', 'message': 'no logo'}), 404
+
+    if key in request.if_none_match:
+        response = Response(status=304)
+    else:
+        data = get_blob_store().get(key)
+        if data is None:
+            return jsonify({'status': 'error', 'message': 'no logo'}), 404
+        response = Response(data, mimetype=logo_content_type(extension))
+
+    response.set_etag(key)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    if extension == 'svg':
+        # no scripts when an svg is opened directly
+        response.headers['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'"
+    return response
+
+
+def company_logo_urls(company):
+    """
+    company is a Company or a row with the logo columns
+    """
+    urls = {'logo_url': None, 'logo_thumb_url': None}
+    if not company.logo_hash:
+        return urls
 
-    file_stream = s3_manager.get_file_stream(url)
-    file_stream.seek(0)
-    extension = image_file.rsplit('.', 1)[1].lower()
+    store = get_blob_store()
 
-    return send_file(company.logo, mimetype='image/%s' % company.logo_file_extension)
+    def url(key, extension):
+        return store.url(key) or url_for('serve_company_logo', key=key, extension=extension)
+
+    urls['logo_url'] = url(company.logo_hash, company.logo_file_extension)
+    # svgs (or no pillow) don't get a thumbnail, the logo is small enough
+    urls['logo_thumb_url'] = url(company.logo_thumb_hash, 'png') if company.logo_thumb_hash else urls['logo_url']
+    return urls
 
 
 @app.route('/company_intro', methods=['POST'])
 @jwt_required
+@claims_checked
 def update_company_info():
     # they (should) only do once
-    email = get_jwt_identity()
     response = {'status': 'success'}
 
     data = request.json.get('data')
@@ -378,7 +456,7 @@ def update_company_info():
     db.session.add(benchmark)
 
     # add company to user, there will be no company id before commiting
-    user = User.query.filter_by(email=email).first()
+    user = get_current_user()
     user.company = company
     user.benchmark = benchmark
 
@@ -389,52 +467,94 @@ def update_company_info():
 
 @app.route('/company/logo', methods=['POST'])
 @jwt_required
+@claims_checked
 def update_company_logo():
-    # they (should) only do once
-    response = {'status': 'success'}
-
-    # look for company - if not there add company to user, there will be no company id before commiting
-    user = User.query.filter_by(email=email).first()
-    user.company = company
-    user.benchmark = benchmark
-
-    data = request.json.get('data')
+    """
+    the logo for the users company, uploaded as 'file'
+    """
+    company = get_current_company()
+    if not company:
+        return jsonify({'status': 'error', 'message': 'no company'})
 
-    company = Company()
-    company.name = data['company_name']
-    company.description = data.get('company_description')
-    company.industry_type = data['industry_type']
-    company.business_model = data['business_model']
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'status': 'error', 'message': 'no file'})
 
-    # company.reason_of_use = data.get('reason_of_use')
-    company.intro_complete = True
-    db.session.add(company)
-
-    benchmark = Benchmark()
-    benchmark.year = data['year']
-    benchmark.month_start = data['month_start']
-    benchmark.month_end = data['month_end']
-    benchmark.total_revenue = data.get('total_revenue')
-    benchmark.total_expenses = data.get('total_expenses')
-    benchmark.company = company
-    db.session.add(benchmark)
+    extension = upload.filename.rsplit('.', 1)[1].lower() if '.' in upload.filename else ''
 
+    try:
+        # one byte over is enough to know it's too big
+        logo_hash, thumb_hash = store_logo(upload.read(settings.LOGO_MAX_BYTES + 1), extension)
+    except LogoError as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+    # the old blobs stay, another company could have the same logo
+    company.logo_hash = logo_hash
+    company.logo_thumb_hash = thumb_hash
+    company.logo_file_extension = extension
     db.session.commit()
 
+    response = {'status': 'success'}
+    response.update(company_logo_urls(company))
     return jsonify(response)
 
 
 @app.route('/survey/<name>', methods=['GET'])
 @jwt_required
 def get_action_survey(name):
-    lookup = {
-        'pp_action': surveys.pp_action,
-        'facets': surveys.facets,
-        'properties': surveys.properties,
-        'add_edit_product': surveys.add_edit_product,
-    }
-    return jsonify(lookup.get(name))
+    # lazy, the X tab options come from /survey/properties/<tab> instead
+    if name == 'properties' and request.args.get('lazy', False) == 'true':
+        name = 'properties/skeleton'
+
+    payload = surveys.payloads.get(name)
+    if not payload:
+        return jsonify(None)
+
+    return catalog_payload_response(payload)
+
+
+@app.route('/survey/properties/<tab>', methods=['GET'])
+@jwt_required
+def get_property_tab_survey(tab):
+    payload = surveys.payloads.get('properties/' + tab.upper())
+    if not payload:
+        return jsonify({'status': 'error', 'message': 'unknown property tab'}), 404
+
+    return catalog_payload_response(payload)
+
+
+def catalog_payload_response(payload):
+    """
+    serve a pre serialised catalog payload,
+    304 if the client already has it, otherwise the best encoding it accepts
+    """
+    matched = [x for x in payload.all_etags() if request.if_none_match.contains(x)]
+    if matched:
+        # the variant the client has, so its cache entry is the one refreshed
+        response = app.response_class(status=304)
+        response.set_etag(matched[0])
+    else:
+        encoding = None
+        for accepted in ['br', 'gzip']:
+            if accepted in payload.encodings and request.accept_encodings[accepted]:
+                encoding = accepted
+                break
+
+        if encoding:
+            response = app.response_class(payload.encodings[encoding], mimetype='application/json')
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response = app.response_class(payload.body, mimetype='application/json')
+        response.set_etag(payload.etag_for(encoding))
+
+    # only changes with the catalog, but check back each time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
 
+    return response
+
+@timed('be.get_be_percent_complete_stats')
 def get_be_percent_complete_stats(question_lookup, be):
     #run through the answers and see if we have answerd all that is visible - based on the answers
     answers = {}
@@ -444,10 +564,7 @@ def get_be_percent_complete_stats(question_lookup, be):
     percent_complete = 0
     be_questions = question_lookup[be.code]
 
-    current_answers = BreakEvenAnswer.query.filter_by(break_even_id=be.id).all()
-
-    for current_answer in current_answers:
-        answers[current_answer.code] = current_answer.data
+    answers = be.get_answers()
 
     for number in be_questions:
         question = be_questions[number]
@@ -495,7 +612,11 @@ def get_be_question_lookup():
 @app.route('/survey/be/<code>', methods=['GET'])
 @jwt_required
 def get_be_survey(code):
-    return jsonify(surveys.be[code])
+    payload = surveys.payloads.get('be/' + code)
+    if not payload:
+        return jsonify({'status': 'error', 'message': 'unknown break even'}), 404
+
+    return catalog_payload_response(payload)
 
 
 
@@ -505,8 +626,7 @@ def get_all_break_evens():
     break_evens = []
     categories = []
     # user = User.query.filter_by(email='tester@futurefitbusiness.org').first()
-    user = User.query.filter_by(email=get_jwt_identity()).first()
-    benchmark_id = user.benchmark.id
+    benchmark_id = get_current_benchmark_id()
     question_lookup = get_be_question_lookup()
 
     break_evens = BreakEven.query.filter_by(benchmark_id=benchmark_id).all()
@@ -526,15 +646,18 @@ def get_all_break_evens():
     for be in break_evens:
         lookup[be.code] = be
 
-    menu_items = surveys.be_text_lookup['menu_items']
+    # the catalog is shared, so build this users menu from copies
+    menu_items = []
 
-    for category in menu_items:
-        for item in category['items']:
-            be = lookup[item['code']]
+    for category in surveys.be_text_lookup['menu_items']:
+        items = []
+        for catalog_item in category['items']:
+            be = lookup[catalog_item['code']]
             scores = surveys.be[be.code]['scores']
 
             #do we want to start saving this?
             stats = get_be_percent_complete_stats(question_lookup, be)
+            item = dict(catalog_item)
             item.update({
                 'id': be.id,
                 'percent_complete': stats['percent_complete'],
@@ -542,9 +665,14 @@ def get_all_break_evens():
                 'awareness_unit': scores['awareness']['unit'],
                 'progress_score': be.progress_score,
                 'progress_unit': scores['progress']['unit'],
-                'complete': len(be.answers) > 0,
+                'complete': be.has_answers(),
                 'applicable': be.applicable,
             })
+            items.append(item)
+
+        category = dict(category)
+        category['items'] = items
+        menu_items.append(category)
 
     for category in menu_items:
         total = len(category['items'])
@@ -582,7 +710,7 @@ def get_be_json(be):
         'progress_unit': be_info['scores']['progress']['unit'],
         'awareness_score': be.awareness_score,
         'awareness_unit': be_info['scores']['progress']['unit'],
-        'complete': len(be.answers) > 0,
+        'complete': be.has_answers(),
         'applicable': be.applicable,
         'applicable_text': applicable_text,
 
@@ -592,11 +720,8 @@ def get_be_json(be):
 @app.route('/be/<int:id>', methods=['GET'])
 @jwt_required
 def get_be_answers(id):
-    res = {}
-    answers = BreakEvenAnswer.query.filter_by(break_even_id=id).all()
-
-    for answer in answers:
-        res[answer.code] = answer.data
+    be = BreakEven.query.get(id)
+    res = be.get_answers() if be else {}
 
     return jsonify({'answers': res})
 
@@ -614,15 +739,14 @@ def get_be_categories(id):
 def get_next_break_even():
     next_be = {}
 
-    user = User.query.filter_by(email=get_jwt_identity()).first()
-    benchmark_id = user.benchmark.id
+    benchmark_id = get_current_benchmark_id()
     break_evens = BreakEven.query.filter_by(benchmark_id=benchmark_id).all()
 
     ordering = surveys.be_text_lookup['be_order']
     break_evens = sorted(break_evens, key=lambda x: ordering[x.code])
 
     for be in break_evens:
-        if len(be.answers) == 0:
+        if not be.has_answers():
             next_be = get_be_json(be)
             break
 
@@ -633,20 +757,11 @@ def get_next_break_even():
 
 @app.route('/be/<int:id>', methods=['POST'])
 @jwt_required
+@claims_checked
 def save_be_answers(id):
     data = request.json.get('data')
     be = BreakEven.query.get(id)
-    current_answers = BreakEvenAnswer.query.filter_by(break_even_id=id).all()
-
-    for answer in current_answers:
-        db.session.delete(answer)
-
-    for key in data:
-        answer = BreakEvenAnswer()
-        answer.break_even_id = id
-        answer.code = key
-        answer.data = data[key]
-        db.session.add(answer)
+    be.set_answers(data)
 
     applicable = None
     for value in data.values():
@@ -674,6 +789,7 @@ def save_be_answers(id):
     })
 
 
+@timed('be.calculate_be_score')
 def calculate_be_score(formula, data):
     questions = extract_questions(formula)
     updated_formula = formula
@@ -807,6 +923,7 @@ def _get_intensity(answers):
 
 @app.route('/report/pp', methods=['GET'])
 @jwt_required
+@read_replica
 def get_positive_impact_report_data():
     for_pdf = request.args.get('forPDF', False) == 'true'
     benchmark = get_app_benchmark(request)
@@ -822,10 +939,12 @@ def get_positive_impact_report_data():
 
 @app.route('/report/be', methods=['GET'])
 @jwt_required
+@read_replica
 def get_break_even_report_data():
     for_pdf = request.args.get('forPDF', False) == 'true'
     benchmark = get_app_benchmark(request)
-    break_evens = benchmark.break_evens
+    with span('report.be.load'):
+        break_evens = benchmark.break_evens
 
     return jsonify({
         'data_table': be_data_table(break_evens),
@@ -834,6 +953,7 @@ def get_break_even_report_data():
     })
 
 
+@timed('report.be_data_table')
 def be_data_table(break_evens):
     return [get_be_json(be) for be in break_evens]
 
@@ -846,29 +966,35 @@ def get_app_benchmark(request):
         benchmark = Benchmark.query.filter_by(company_id=int(company_id)).first()
     else:
         # user = User.query.filter_by(email='tester@futurefitbusiness.org').first()
-        user = User.query.filter_by(email=get_jwt_identity()).first()
-        benchmark = user.benchmark
+        benchmark = get_current_benchmark()
 
     return benchmark
 
 
 @app.route('/report/download/csv', methods=['GET'])
 @jwt_required
+@read_replica
 def get_report_csv():
     benchmark = get_app_benchmark(request)
-    break_evens = benchmark.break_evens
+    with span('report.be.load'):
+        break_evens = benchmark.break_evens
     products = pre_load_products_and_impacts(benchmark)
     break_evens = be_data_table(break_evens)
     pp = get_chart_pp_data_table(products)
 
     filename = "{} {}".format(benchmark.company.name, utils.reporting_period_format(benchmark))
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Impact Benchmark Repot Data'])
-    writer.writerow([filename])
+    # everything's loaded by now, the rows are only formatted as they stream
+    res = Response(stream_csv(report_csv_rows(filename, pp, break_evens)), mimetype='text/csv')
+    res.headers["Content-Disposition"] = "attachment; filename={}.csv".format(filename)
+    return res
+
+
+def report_csv_rows(filename, pp, break_evens):
+    yield ['Impact Benchmark Repot Data']
+    yield [filename]
 
     # PP
-    writer.writerow(['Positive Impacts'])
+    yield ['Positive Impacts']
     pp_headers = [
         'Activity',
         'Impact',
@@ -885,7 +1011,7 @@ def get_report_csv():
         'Depth',
         'Depth Unit',
     ]
-    writer.writerow(pp_headers)
+    yield pp_headers
 
     for item in pp:
         row = [
@@ -904,10 +1030,10 @@ def get_report_csv():
             item['depth_value'],
             item['depth_unit'],
         ]
-        writer.writerow(row)
+        yield row
 
     # BE
-    writer.writerow(['ESG Risks'])
+    yield ['ESG Risks']
     be_headers = [
         'FF Goal',
         'Business Area',
@@ -917,7 +1043,7 @@ def get_report_csv():
         'Progress Indicator',
         'Progress Unit'
     ]
-    writer.writerow(be_headers)
+    yield be_headers
     for be in break_evens:
         row = [
             be['code'],
@@ -929,15 +1055,26 @@ def get_report_csv():
             be['progress_unit'] if be['applicable'] else '',
         ]
 
+        yield row
+
+
+def stream_csv(rows, chunk_size=16 * 1024):
+    """
+    the csv text of rows, in chunks of about chunk_size
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for row in rows:
         writer.writerow(row)
+        if output.tell() >= chunk_size:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
 
-    output.seek(0)
-    res = make_response(output.getvalue())
-    res.headers["Content-Disposition"] = "attachment; filename={}.csv".format(filename)
-    res.headers["Content-type"] = "text/csv"
-    return res
+    yield output.getvalue()
 
 
+@timed('report.pre_load_products_and_impacts')
 def pre_load_products_and_impacts(benchmark):
     products = []
 
@@ -947,6 +1084,7 @@ def pre_load_products_and_impacts(benchmark):
             relative_cost = product.cost / benchmark.total_expenses
 
         impacts = Impact.query.\
+            options(*query_profiles.impact_text).\
             filter_by(product_id=product.id, active=True).all()
         products.append({
             'product': product,
@@ -957,6 +1095,7 @@ def pre_load_products_and_impacts(benchmark):
     return products
 
 
+@timed('report.get_chart_pp_stacked')
 def get_chart_pp_stacked(products, for_pdf=False):
     # Y Axis = All 17 SDGs
     # X Axis = Scale value
@@ -988,8 +1127,7 @@ def get_chart_pp_stacked(products, for_pdf=False):
                 if sdg.sdg:
                     sdgs.append(sdg.sdg)
 
-            for answer in impact.answers:
-                answers[answer.number] = answer.data
+            answers = impact.answer_data()
 
             if stakeholder_name_question in answers:
                 stakeholder = get_stakeholder_name(answers)
@@ -1063,6 +1201,7 @@ def get_chart_pp_stacked(products, for_pdf=False):
     }
 
 
+@timed('report.get_chart_pp_chart_2')
 def get_chart_pp_chart_2(products, for_pdf=False):
     data = []
     for product_obj in products:
@@ -1070,7 +1209,7 @@ def get_chart_pp_chart_2(products, for_pdf=False):
 
         for impact in product_obj['impacts']:
             # should be one stakeholder per impact
-            if len(impact.answers) == 0:
+            if not impact.has_answers():
                 continue
 
             stakeholder = ''
@@ -1083,8 +1222,7 @@ def get_chart_pp_chart_2(products, for_pdf=False):
             for sdg in impact.sdgs:
                 sdgs.append(sdg.sdg)
 
-            for answer in impact.answers:
-                answers[answer.number] = answer.data
+            answers = impact.answer_data()
 
             stakeholder_option = answers.get(stakeholder_name_question)
 
@@ -1187,6 +1325,7 @@ def get_impact_value_answers(answers):
     }
 
 
+@timed('report.get_chart_investment')
 def get_chart_investment(products, for_pdf=False):
     data = []
     proposed_investment = 100000
@@ -1195,7 +1334,7 @@ def get_chart_investment(products, for_pdf=False):
         product = product_obj['product']
 
         for impact in product_obj['impacts']:
-            answers = {a.number: a.data for a in impact.answers}
+            answers = impact.answer_data()
 
             if stakeholder_name_question in answers:
                 stakeholder = get_stakeholder_name(answers)
@@ -1232,12 +1371,13 @@ def get_chart_investment(products, for_pdf=False):
     return res
 
 
+@timed('report.get_chart_pp_data_table')
 def get_chart_pp_data_table(products, for_pdf=False):
     res = []
     for product_obj in products:
         product = product_obj['product']
         for impact in product_obj['impacts']:
-            answers = {a.number: a.data for a in impact.answers}
+            answers = impact.answer_data()
             value_answers = get_impact_value_answers(answers)
 
             if stakeholder_name_question in answers:
@@ -1291,8 +1431,9 @@ def get_chart_pp_data_table(products, for_pdf=False):
     return res
 
 
+@timed('report.get_chart_be_best_and_worst')
 def get_chart_be_best_and_worst(break_evens):
-    filtered = [b for b in break_evens if len(b.answers) > 0 and b.applicable]
+    filtered = [b for b in break_evens if b.has_answers() and b.applicable]
     progress = sorted(filtered, key=lambda x: x.progress_score if x.progress_score is not None else 0, reverse=True)
     progress = progress[:5]
     awareness = sorted(filtered, key=lambda x: x.awareness_score if x.awareness_score is not None else 0)
@@ -1316,12 +1457,13 @@ def convert_best_and_worst_to_json(be):
         'awareness_unit': scores['awareness']['unit'],
         'progress_score': be.progress_score,
         'progress_unit': scores['progress']['unit'],
-        'complete': len(be.answers) > 0,
+        'complete': be.has_answers(),
         'applicable': be.applicable,
         'sdgs': surveys.be_sdgs[be.code]
     }
 
 
+@timed('report.get_chart_be_overview')
 def get_chart_be_overview(break_evens, for_pdf=False):
     data = []
     areas = surveys.be_text_lookup['menu_items']
@@ -1348,7 +1490,7 @@ def get_chart_be_overview(break_evens, for_pdf=False):
                 'awareness_unit': scores['awareness']['unit'],
                 'progress_score': be.progress_score,
                 'progress_unit': scores['progress']['unit'],
-                'complete': len(be.answers) > 0,
+                'complete': be.has_answers(),
                 'applicable': be.applicable,
             }
 
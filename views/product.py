@@ -4,18 +4,22 @@ import json
 import random
 from datetime import datetime
 
-from flask import jsonify, request, session
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import request, session
+from flask_jwt_extended import jwt_required
 
 from app import app, settings, db
 from models import User, Company, Product, Benchmark, ProductFacet,\
-    ProductProperty, ProductPropertyAnswer, Impact, ImpactSdg, ImpactAnswer
-from lib.impact import surveys, get_hidden_options, get_property_actions,\
+    ProductProperty, ProductPropertyAnswer, Impact, ImpactSdg, ImpactAnswer, CatalogImpact
+from lib.impact import surveys, get_hidden_property_options, get_property_actions,\
     merge_duplicate_impacts, merge_duplicate_impacts_as_list, assign_automatic_impacts,\
     get_impact_description, get_impact_description_from_dict, get_impact_percent_complete_stats,\
     get_impact_question_lookup
+from lib.auth import get_current_benchmark, get_current_benchmark_id, claims_checked
 
 import utils as utils
+import lib.query_profiles as query_profiles
+from lib.timing import timed
+from lib.json_provider import jsonify
 
 @app.route('/product', methods=['GET'])
 @jwt_required
@@ -25,17 +29,12 @@ def get_products():
     """
     # response = {'status': 'error', 'message': 'no products'}
     response = {}
-    user = User.query.filter_by(email=get_jwt_identity()).first()
-    benchmark = user.benchmark
+    benchmark = get_current_benchmark()
     reporting_period = "{}, {} to {}".format(benchmark.year, benchmark.month_start, benchmark.month_end)
 
     question_lookup = get_impact_question_lookup()
 
-    products = Product.query.\
-        join(Benchmark).\
-        join(User).\
-        join(Company).\
-        filter(User.email == get_jwt_identity()).all()
+    products = Product.query.options(*query_profiles.products).filter_by(benchmark_id=benchmark.id).all()
 
     if products:
         response = {
@@ -48,7 +47,7 @@ def get_products():
 
             has_facets = ProductFacet.query.filter_by(product_id=product.id).count() > 0
             has_properties = ProductProperty.query.filter_by(product_id=product.id).count() > 0
-            all_impacts = Impact.query.filter_by(product_id=product.id)
+            all_impacts = Impact.query.options(*query_profiles.impact_progress).filter_by(product_id=product.id)
             current_impacts = all_impacts.filter_by(active=1).all()
             total_impacts = len(current_impacts)
             na_impacts = all_impacts.count() - total_impacts
@@ -59,7 +58,7 @@ def get_products():
             total_answers = 0
 
             for impact in current_impacts:
-                stats = get_impact_percent_complete_stats(question_lookup, impact.id)
+                stats = get_impact_percent_complete_stats(question_lookup, impact)
                 total_questions += stats['visible_questions']
                 total_answers += stats['answered_questions']
                 if stats['percent_complete'] == 100:
@@ -132,16 +131,13 @@ def get_products():
 
 @app.route('/product', methods=['POST'])
 @jwt_required
+@claims_checked
 def add_new_product():
     data = request.json.get('data')
 
-    email = get_jwt_identity()
-    user = User.query.filter_by(email=get_jwt_identity()).first()
-    benchmark = user.benchmark
-
     product = Product()
     product.code = utils.random_uuid_code(13)
-    product.benchmark_id = benchmark.id
+    product.benchmark_id = get_current_benchmark_id()
     product.name = data['AE-1']
     product.description = data.get('AE-2')
     product.revenue_type = data.get('AE-3')
@@ -160,6 +156,7 @@ def add_new_product():
 
 @app.route('/product/<int:id>', methods=['POST'])
 @jwt_required
+@claims_checked
 def update_product(id):
     data = request.json.get('data')
 
@@ -179,7 +176,7 @@ def update_product(id):
 @app.route('/product/edit/<int:id>', methods=['GET'])
 @jwt_required
 def get_edit_product(id):
-    product = Product.query.get(id)
+    product = Product.query.options(*query_profiles.products).get(id)
     answers = {
         # because of how it parses csv
         # and until we have a better way..
@@ -227,20 +224,17 @@ def get_product_setup(setup_part, product_id):
 
     if setup_part == 2:
         survey = surveys.properties
+        if request.args.get('lazy', False) == 'true':
+            # fetch the X tabs from /survey/properties/<tab> as they're picked
+            survey = surveys.payloads.data('properties/skeleton')
         current_properties = ProductProperty.query.filter_by(product_id=product_id).all()
         for property in current_properties:
             checked_values.append(property.code)
             for answer in property.answers:
                 checked_values.append(answer.code)
 
-        selected_facets = ProductFacet.query.filter_by(product_id=product_id).all()
-        selected_facet_codes = [x.code for x in selected_facets]
-
-        questions = surveys.properties['questions'][1:]
-
-        for question in questions:
-            if question['type'] == 'checkbox':
-                hidden_options += get_hidden_options(question['options'], selected_facet_codes)
+        selected_facet_codes = [x.code for x in current_facets]
+        hidden_options = list(get_hidden_property_options(selected_facet_codes))
 
     response = {
         'status': 'success',
@@ -388,7 +382,7 @@ def preview_changes(setup_part, product_id):
                 changes['properties'].append(add_me)
 
     # great we have done this all, lets calculate the actions if it is the second setup
-    impact_changes = calculate_impacts(updated_facets, updated_properties, product_id)
+    impact_changes = calculate_impacts(updated_facets, updated_properties, product_id, save=False)
 
     return jsonify({
         'status': 'success',
@@ -402,6 +396,7 @@ def preview_changes(setup_part, product_id):
 
 @app.route('/product/<int:product_id>/setup/<int:setup_part>/', methods=['POST'])
 @jwt_required
+@claims_checked
 def save_setup(setup_part, product_id):
     data = request.json.get('data')
 
@@ -518,9 +513,11 @@ def get_parent_property(code):
 
 
 
-def calculate_impacts(facet_codes, properties, product_id):
+@timed('product.calculate_impacts')
+def calculate_impacts(facet_codes, properties, product_id, save=True):
     # Go through the answered surveys for the product and get the recommended actions
     # get current selected facets
+    # save=False is the preview, the changes only, nothing added to the session
     changes = {}
     impacts = []
 
@@ -532,14 +529,22 @@ def calculate_impacts(facet_codes, properties, product_id):
     impacts = assign_automatic_impacts(impacts, facet_codes)
     impacts = merge_duplicate_impacts(impacts)
 
+    # compared on the catalog impact ids from here on, a preview doesn't add
+    # the new ones, those keep their (pp, option text) key, so are all added
+    if save:
+        catalog_ids = CatalogImpact.intern(impacts.keys())
+    else:
+        catalog_ids = CatalogImpact.lookup(impacts.keys())
+    impacts = {catalog_ids.get(key, key): impact for key, impact in impacts.items()}
+
     # TODO: uhh be more efficent at deleting, only remove what has changed...
     # this is fastest for now!
-    current_impacts = Impact.query.filter_by(product_id=product_id).all()
-    existing_impacts = []
+    current_impacts = Impact.query.options(*query_profiles.impact_text).filter_by(product_id=product_id).all()
+    existing_impacts = set()
 
     for ci in current_impacts:
-        key = ci.option_text + ci.pp_action
-        existing_impacts.append(key)
+        key = ci.catalog_impact_id
+        existing_impacts.add(key)
 
         impact_info = {
             'property_code': ci.property_code,
@@ -567,7 +572,8 @@ def calculate_impacts(facet_codes, properties, product_id):
                 'sdgs': ', '.join([x.sdg for x in ci.sdgs])
             })
 
-            db.session.delete(ci)
+            if save:
+                db.session.delete(ci)
         else:
             modified = False
             updated_impact = impacts[key]
@@ -575,17 +581,19 @@ def calculate_impacts(facet_codes, properties, product_id):
             for sdg in ci.sdgs:
                 if sdg.sdg not in updated_impact['sdgs']:
                     modified = True
-                    db.session.delete(sdg)
+                    if save:
+                        db.session.delete(sdg)
                 else:
                     existing_sdgs.append(sdg.sdg)
 
             for sdg in updated_impact['sdgs']:
                 if sdg not in existing_sdgs:
                     modified = True
-                    sdg_add = ImpactSdg()
-                    sdg_add.sdg = sdg
-                    db.session.add(sdg_add)
-                    ci.sdgs.append(sdg_add)
+                    if save:
+                        sdg_add = ImpactSdg()
+                        sdg_add.sdg = sdg
+                        db.session.add(sdg_add)
+                        ci.sdgs.append(sdg_add)
 
             if modified:
                 changes[property]['modified'].append({
@@ -597,21 +605,22 @@ def calculate_impacts(facet_codes, properties, product_id):
     for key in impacts:
         if key not in existing_impacts:
             impact = impacts[key]
-            add = Impact()
-            add.property_code = impact['property_code']
-            add.option_text = impact['option_text']
-            add.option_code = impact['option_code']
-            add.pp_action = impact['pp']
-            add.product_id = product_id
-            db.session.add(add)
-
-            for sdg in impact['sdgs']:
-                if sdg:
-                    # get rid of blank ones
-                    sdg_add = ImpactSdg()
-                    sdg_add.sdg = sdg
-                    db.session.add(sdg_add)
-                    add.sdgs.append(sdg_add)
+            if save:
+                add = Impact()
+                add.property_code = impact['property_code']
+                add.catalog_impact_id = key
+                add.option_code = impact['option_code']
+                add.pp_action = impact['pp']
+                add.product_id = product_id
+                db.session.add(add)
+
+                for sdg in impact['sdgs']:
+                    if sdg:
+                        # get rid of blank ones
+                        sdg_add = ImpactSdg()
+                        sdg_add.sdg = sdg
+                        db.session.add(sdg_add)
+                        add.sdgs.append(sdg_add)
 
             property = get_parent_property(impact['property_code'])
 
@@ -652,7 +661,7 @@ def get_product_impacts(product_id):
     impacts = []
     question_lookup = get_impact_question_lookup()
 
-    current_impacts = Impact.query.filter_by(product_id=product_id).all()
+    current_impacts = Impact.query.options(*query_profiles.impact_text).filter_by(product_id=product_id).all()
 
     for i, current_impact in enumerate(current_impacts, 1):
         # # TODO: go through and add the full option list
@@ -661,7 +670,7 @@ def get_product_impacts(product_id):
         sdgs = sorted(sdgs, key=lambda x: utils.sdg_key(x))
         sdgs = ', '.join(sdgs)
 
-        completed_stats = get_impact_percent_complete_stats(question_lookup, current_impact.id)
+        completed_stats = get_impact_percent_complete_stats(question_lookup, current_impact)
 
         impacts.append({
             'number': i,
@@ -691,12 +700,12 @@ def get_product_impacts(product_id):
 @jwt_required
 def get_action_data(product_id, impact_id):
     # get the current answers for the action_id - what the name says!
+    impact = Impact.query.get(impact_id)
+    current_answers = impact.get_answers() if impact else {'data': {}, 'text': {}}
     answers = {}
-    external_answers = {}
 
-    current_answers = ImpactAnswer.query.filter_by(impact_id=impact_id).all()
-    for answer in current_answers:
-        answers[answer.number] = answer.text if answer.text else answer.data
+    for number, data in current_answers['data'].items():
+        answers[number] = current_answers['text'].get(number) or data
 
     return jsonify({
         'answers': answers,
@@ -705,28 +714,28 @@ def get_action_data(product_id, impact_id):
 
 @app.route('/product/<int:product_id>/impact/<int:impact_id>', methods=['POST'])
 @jwt_required
+@claims_checked
 def save_action_data(product_id, impact_id):
     data = request.json.get('data')
-    current_answers = ImpactAnswer.query.filter_by(impact_id=impact_id).all()
-    for current_answer in current_answers:
-        db.session.delete(current_answer)
+    impact = Impact.query.get(impact_id)
+    if not impact:
+        return jsonify({'success': False}), 404
+
+    answers = {}
+    text_answers = {}
 
     for key in data['answers'].keys():
         #only add if there is actual data
         if len(data['answers'][key]) > 0:
-            add = ImpactAnswer()
-            add.impact_id = impact_id
-            add.number = key
             # check the question type
             type = get_impact_question_type(key)
             if type == 'text area':
-                add.text = data['answers'][key]
-                pass
+                answers[key] = None
+                text_answers[key] = data['answers'][key]
             else:
-                add.data = data['answers'][key]
-
-            db.session.add(add)
+                answers[key] = data['answers'][key]
 
+    impact.set_answers(answers, text_answers)
     db.session.commit()
 
     return jsonify({
@@ -742,6 +751,7 @@ def get_impact_question_type(key):
 
 @app.route('/product/impact/<int:impact_id>/set_active/<active>', methods=['POST'])
 @jwt_required
+@claims_checked
 def toggle_impact_active(impact_id, active):
     impact = Impact.query.filter_by(id=impact_id).one()
     impact.active = (active == 'true')